@@ -1,49 +1,100 @@
 import os
-from flask import Flask, render_template, request, jsonify, redirect, url_for, flash
-import google.generativeai as genai
+import hashlib
+import json
+import math
+import shutil
+import threading
+import time
+import hmac
+import io
+import tempfile
+import uuid
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import partial
+from importlib import metadata
+from flask import Flask, Blueprint, Request, current_app, render_template, request, jsonify, redirect, url_for, flash, abort, Response, stream_with_context, g, has_request_context
 import logging
+import click
 from dotenv import load_dotenv
-from pypdf import PdfReader
-from PIL import Image
-try:
-    import pytesseract
-    TESSERACT_AVAILABLE = True
-    print("DEBUG: pytesseract imported successfully")
-except ImportError as e:
-    TESSERACT_AVAILABLE = False
-    print(f"DEBUG: Failed to import pytesseract: {e}")
-except Exception as e:
-    TESSERACT_AVAILABLE = False
-    print(f"DEBUG: Unexpected error importing pytesseract: {e}")
-from werkzeug.utils import secure_filename
+from config import load_config
+from jobs import JobRunner
+from lru import LRUCache
+from singleflight import LeaseStore, SingleFlight
+from logs import configure_logging
+import llm
+import metrics
+from chunking import split_into_chunks
+from condense import condense
+import dedup
+import quiz_bank
+import search
+import serving
+from questions import QuestionStreamParser, parse_questions, format_questions, merge_questions
+from uploads import detect_file_type, spool_upload, store_upload
+# extraction (pypdf), ocr (Pillow, pytesseract) and item_analysis (NumPy) are imported where
+# they are first used so a worker can start serving without loading them
 from werkzeug.security import generate_password_hash, check_password_hash
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event, exc
+from sqlalchemy.engine import Engine
 from flask_login import LoginManager, UserMixin, login_user, login_required, logout_user, current_user
 from flask_wtf import FlaskForm
 from wtforms import StringField, PasswordField, SubmitField
 from wtforms.validators import InputRequired, Length, ValidationError
-from datetime import datetime
+from datetime import datetime, timedelta
 
-app = Flask(__name__)
 load_dotenv()
 
-# Configuration
-app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL', 'sqlite:///quiz.db')
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-app.config['SECRET_KEY'] = os.getenv("SECRET_KEY", "dev-secret-key-change-in-production")
-app.config['UPLOAD_FOLDER'] = 'static/files'
-app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024
+db = SQLAlchemy()
+bp = Blueprint('main', __name__)
 
-# Handle PostgreSQL URL format for production
-if app.config['SQLALCHEMY_DATABASE_URI'].startswith('postgres://'):
-    app.config['SQLALCHEMY_DATABASE_URI'] = app.config['SQLALCHEMY_DATABASE_URI'].replace('postgres://', 'postgresql://', 1)
+# Per-request query counting. QUERY_COUNT_HEADER adds X-Query-Count to every response and
+# QUERY_WARN_THRESHOLD logs requests that run more queries than that.
+@event.listens_for(Engine, 'before_cursor_execute')
+def count_query(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context():
+        g.query_count = g.get('query_count', 0) + 1
 
-db = SQLAlchemy(app)
+@bp.after_app_request
+def report_query_count(response):
+    count = g.get('query_count', 0)
+    if current_app.config['QUERY_COUNT_HEADER']:
+        response.headers['X-Query-Count'] = str(count)
+    threshold = current_app.config['QUERY_WARN_THRESHOLD']
+    if threshold and count > threshold:
+        logging.warning(f"{request.method} {request.path} ran {count} queries (threshold {threshold})",
+                        extra={'queries': count, 'path': request.path})
+    return response
+
+# Request latency and concurrency for /metrics, labelled by route pattern rather than raw path
+@bp.before_app_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+    metrics.HTTP_REQUESTS_IN_FLIGHT.inc()
+
+@bp.after_app_request
+def record_request_time(response):
+    started = g.get('request_started')
+    if started is not None:
+        endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+        metrics.HTTP_REQUEST_SECONDS.observe(time.perf_counter() - started, endpoint=endpoint,
+                                             method=request.method, status=str(response.status_code))
+    return response
+
+@bp.teardown_app_request
+def finish_request_timer(error=None):
+    if g.pop('request_started', None) is not None:
+        metrics.HTTP_REQUESTS_IN_FLIGHT.dec()
+
+def timed_commit():
+    # Commits on the generation and save paths, timed as the db_commit stage
+    with metrics.span('db_commit'):
+        db.session.commit()
 
 # Flask-Login setup
 login_manager = LoginManager()
-login_manager.init_app(app)
-login_manager.login_view = 'login'
+login_manager.login_view = 'main.login'
 
 @login_manager.user_loader
 def load_user(user_id):
@@ -65,11 +116,18 @@ class Quiz(db.Model):
     title = db.Column(db.String(100), nullable=False)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Bumped whenever the quiz's questions change; part of the payload cache key and ETag
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
     
     # Relationships
     questions = db.relationship('Question', backref='quiz', lazy=True, cascade='all, delete-orphan')
     attempts = db.relationship('QuizAttempt', backref='quiz', lazy=True)
 
+    __table_args__ = (
+        # A user's quizzes in id order: /quizzes keyset pagination and the analytics dropdown
+        db.Index('ix_quiz_user_id_id', 'user_id', 'id'),
+    )
+
 class Question(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     quiz_id = db.Column(db.Integer, db.ForeignKey('quiz.id'), nullable=False)
@@ -80,6 +138,22 @@ class Question(db.Model):
     option_d = db.Column(db.String(200), nullable=False)
     correct_answer = db.Column(db.String(1), nullable=False)  # A, B, C, or D
 
+    __table_args__ = (
+        db.Index('ix_question_quiz_id_id', 'quiz_id', 'id'),
+    )
+
+class QuestionBand(db.Model):
+    # Near-duplicate index: the LSH bucket keys (see dedup.py) of every saved question, per user.
+    # Questions that share a bucket with a new one are the only ones compared against it.
+    question_id = db.Column(db.Integer, db.ForeignKey('question.id'), primary_key=True)
+    band = db.Column(db.SmallInteger, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    bucket = db.Column(db.BigInteger, nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_question_band_user_bucket', 'user_id', 'bucket'),
+    )
+
 class QuizAttempt(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
@@ -87,6 +161,62 @@ class QuizAttempt(db.Model):
     score = db.Column(db.Integer, nullable=False)
     total_questions = db.Column(db.Integer, nullable=False)
     completed_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # One byte per question in question id order: chosen option 0-3 or 255 (see item_analysis)
+    responses = db.Column(db.LargeBinary, nullable=True)
+
+    __table_args__ = (
+        # Analytics for one quiz and per-quiz aggregates on /quizzes
+        db.Index('ix_quiz_attempt_user_quiz_completed', 'user_id', 'quiz_id', 'completed_at'),
+        # Analytics across all of a user's quizzes
+        db.Index('ix_quiz_attempt_user_completed', 'user_id', 'completed_at'),
+    )
+
+class QuizAttemptRollup(db.Model):
+    # Running per-user, per-quiz totals maintained by submit_quiz so analytics never rescans attempts
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    quiz_id = db.Column(db.Integer, db.ForeignKey('quiz.id'), primary_key=True)
+    attempt_count = db.Column(db.Integer, nullable=False, default=0)
+    percent_sum = db.Column(db.Float, nullable=False, default=0.0)  # sum of per-attempt percentages
+    best_percent = db.Column(db.Float, nullable=False, default=0.0)
+    last_attempt_at = db.Column(db.DateTime)
+
+class ExtractionCache(db.Model):
+    # Text extracted from an uploaded file, keyed by the SHA-256 of its bytes
+    id = db.Column(db.Integer, primary_key=True)
+    content_hash = db.Column(db.String(64), nullable=False)
+    extractor_version = db.Column(db.String(40), nullable=False)
+    text = db.Column(db.Text, nullable=False)
+    size_bytes = db.Column(db.Integer, nullable=False)
+    extract_seconds = db.Column(db.Float, nullable=False, default=0.0)
+    hit_count = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    last_used_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+    __table_args__ = (
+        db.UniqueConstraint('content_hash', 'extractor_version', name='uq_extraction_cache_key'),
+    )
+
+class GenerationCache(db.Model):
+    # Gemini output keyed by a hash of (normalized study text, prompt template, model name)
+    id = db.Column(db.Integer, primary_key=True)
+    cache_key = db.Column(db.String(64), nullable=False, unique=True)
+    model_name = db.Column(db.String(60), nullable=False)
+    ai_response = db.Column(db.Text, nullable=False)
+    hit_count = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+    last_used_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+class GenerationJob(db.Model):
+    # Background /generate-questions request; status moves queued -> extracting -> generating -> done/failed
+    id = db.Column(db.String(32), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
+    status = db.Column(db.String(20), nullable=False, default='queued')
+    ai_response = db.Column(db.Text)
+    cached = db.Column(db.Boolean, nullable=False, default=False)
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
 
 # Forms
 class RegisterForm(FlaskForm):
@@ -104,77 +234,146 @@ class LoginForm(FlaskForm):
     password = PasswordField(validators=[InputRequired(), Length(min=8, max=20)], render_kw={"placeholder": "Password"})
     submit = SubmitField('Login')
 
-with app.app_context():
-    db.create_all()
+def attempt_percent():
+    return QuizAttempt.score * 100.0 / QuizAttempt.total_questions
 
-# AI Client setup
-api_key = os.getenv("GEMINI_API_KEY")
-if not api_key:
-    print("WARNING: GEMINI_API_KEY not found in environment variables")
-else:
-    print(f"DEBUG: GEMINI_API_KEY configured (length: {len(api_key)})")
-genai.configure(api_key=api_key)
+def backfill_attempt_rollups():
+    # Build rollups for attempts recorded before the rollup table existed
+    if QuizAttemptRollup.query.first() or not QuizAttempt.query.first():
+        return
+    totals = db.select(
+        QuizAttempt.user_id,
+        QuizAttempt.quiz_id,
+        db.func.count(QuizAttempt.id),
+        db.func.sum(attempt_percent()),
+        db.func.max(attempt_percent()),
+        db.func.max(QuizAttempt.completed_at)
+    ).group_by(QuizAttempt.user_id, QuizAttempt.quiz_id)
+    db.session.execute(db.insert(QuizAttemptRollup).from_select(
+        ['user_id', 'quiz_id', 'attempt_count', 'percent_sum', 'best_percent', 'last_attempt_at'], totals
+    ))
+    db.session.commit()
 
-os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+def add_missing_columns():
+    # db.create_all() doesn't alter existing tables; add columns declared since. Only columns
+    # that are nullable or have a server default can be added to a table that already has rows.
+    inspector = db.inspect(db.engine)
+    for table in db.metadata.sorted_tables:
+        existing = {column['name'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            definition = f'{column.name} {column.type.compile(dialect=db.engine.dialect)}'
+            if column.server_default is not None:
+                definition += f' NOT NULL DEFAULT {column.server_default.arg}'
+            elif not column.nullable:
+                logging.error(f"Cannot add NOT NULL column {table.name}.{column.name} without a server default")
+                continue
+            logging.info(f"Adding column {table.name}.{column.name}")
+            with db.engine.begin() as connection:
+                connection.execute(db.text(f'ALTER TABLE {table.name} ADD COLUMN {definition}'))
 
-# Configure tesseract if available
-if TESSERACT_AVAILABLE:
-    import shutil
-    
-    print(f"DEBUG: TESSERACT_AVAILABLE: {TESSERACT_AVAILABLE}")
-    
-    # Try to find tesseract automatically (should work with default installation)
-    tesseract_path = shutil.which('tesseract')
-    print(f"DEBUG: shutil.which('tesseract'): {tesseract_path}")
-    
-    if tesseract_path:
-        print(f"DEBUG: Successfully found tesseract at: {tesseract_path}")
-        logging.info(f"Tesseract configured at: {tesseract_path}")
-    else:
-        print(f"DEBUG: No tesseract found in PATH - disabling image text extraction")
-        logging.warning("Tesseract executable not found - image text extraction will not be available")
-        TESSERACT_AVAILABLE = False
+def create_missing_indexes():
+    # db.create_all() skips tables that already exist, so indexes declared after a database was
+    # created are added here. On a large Postgres table, create them beforehand with
+    # CREATE INDEX CONCURRENTLY under the same name and this step leaves them alone.
+    inspector = db.inspect(db.engine)
+    for table in db.metadata.sorted_tables:
+        existing = {index['name'] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing:
+                logging.info(f"Creating index {index.name}")
+                index.create(db.engine)
 
-print(f"DEBUG: Final TESSERACT_AVAILABLE status: {TESSERACT_AVAILABLE}")
-if TESSERACT_AVAILABLE:
-    print(f"DEBUG: Final tesseract command: {pytesseract.pytesseract.tesseract_cmd}")
-    
-    # Test tesseract functionality
-    try:
-        from PIL import Image as PILImage
-        import io
-        
-        # Create a simple test image with white background
-        test_img = PILImage.new('RGB', (200, 50), color='white')
-        # Note: This is just a basic test - in production we'd need to add text to the image
-        print("DEBUG: Created test image successfully")
-        print("DEBUG: Tesseract basic setup appears to be working")
-    except Exception as e:
-        print(f"DEBUG: Error during tesseract test: {e}")
-        globals()['TESSERACT_AVAILABLE'] = False
+def init_db():
+    # Create tables, then bring databases created by older versions up to date
+    db.create_all()
+    add_missing_columns()
+    create_missing_indexes()
+    backfill_attempt_rollups()
+    backfill_question_bands()
+    backfill_search_index()
+
+_tesseract_available = None
+
+def tesseract_available():
+    # Checked on the first image upload rather than at startup
+    global _tesseract_available
+    if _tesseract_available is None:
+        try:
+            import pytesseract
+        except ImportError as e:
+            logging.warning(f"pytesseract not installed - image text extraction will not be available: {e}")
+            _tesseract_available = False
+        else:
+            tesseract_path = shutil.which(pytesseract.pytesseract.tesseract_cmd)
+            if tesseract_path:
+                logging.info(f"Tesseract configured at: {tesseract_path}")
+            else:
+                logging.warning("Tesseract executable not found - image text extraction will not be available")
+            _tesseract_available = bool(tesseract_path)
+    return _tesseract_available
+
+def extract_text_from_pdf(source, page_range=None, max_chars=None):
+    # source is a path or a seekable binary file object
+    from extraction import read_pdf_text, read_pdf_text_in_pool
 
-def extract_text_from_pdf(pdf_path):
-    print(f"In the PDF extraction function")
-    print(f"Extracting text from PDF: {pdf_path}")
+    logging.debug(f"Extracting text from PDF: {getattr(source, 'name', source)}")
+    first_page, last_page = page_range or (None, None)
+    if max_chars is None:
+        max_chars = current_app.config['EXTRACTION_MAX_CHARS']
     try:
-        reader = PdfReader(pdf_path)
-        text = ""
-        for page in reader.pages:
-            text += page.extract_text() + "\n"
-        return text.strip()
+        if serving.cooperative():
+            # A gevent worker keeps serving its other requests while a pool process parses
+            text, pages = read_pdf_text_in_pool(source, first_page, last_page, max_chars,
+                                                max_workers=current_app.config['EXTRACTION_WORKERS'])
+        else:
+            text, pages = read_pdf_text(
+                source, first_page, last_page, max_chars,
+                parallel_min_pages=current_app.config['PDF_PARALLEL_MIN_PAGES'],
+                batch_size=current_app.config['PDF_PAGES_PER_BATCH'],
+                max_workers=current_app.config['EXTRACTION_WORKERS']
+            )
+        metrics.annotate(pages=pages)
+        return text
     except Exception as e:
         logging.error(f"Error extracting text from PDF: {e}")
         return None
+
+def parse_page_range(value):
+    # Accepts "10-25", "10–25", "7" or "12-"; returns (first, last) with None for an open end
+    value = (value or "").strip().replace("\u2013", "-").replace("\u2014", "-")
+    if not value:
+        return None
+    first, sep, last = value.partition("-")
+    try:
+        first_page = int(first) if first.strip() else 1
+        last_page = int(last) if last.strip() else None
+    except ValueError:
+        raise ValueError(f"Invalid page range: {value}")
+    if not sep:
+        last_page = first_page
+    if first_page < 1 or (last_page is not None and last_page < first_page):
+        raise ValueError(f"Invalid page range: {value}")
+    return first_page, last_page
     
-def extract_text_from_image(image_path):
-    print(f"Extracting text from image: {image_path}")
-    if not TESSERACT_AVAILABLE:
+def extract_text_from_image(source):
+    logging.debug(f"Extracting text from image: {getattr(source, 'name', source)}")
+    if not tesseract_available():
         logging.warning("Tesseract not available - cannot extract text from images")
         raise Exception("Image text extraction not available in this deployment. Please use PDF files or copy/paste text directly.")
     
+    import ocr
+
     try:
-        image = Image.open(image_path)
-        text = pytesseract.image_to_string(image)
+        text = ocr.image_to_text(
+            source,
+            timeout=current_app.config['OCR_TIMEOUT_SECONDS'],
+            queue_timeout=current_app.config['OCR_QUEUE_TIMEOUT_SECONDS'],
+            max_workers=current_app.config['OCR_MAX_CONCURRENCY'],
+            target_dpi=current_app.config['OCR_TARGET_DPI'],
+            max_dimension=current_app.config['OCR_MAX_DIMENSION']
+        )
         extracted_text = text.strip()
         if not extracted_text:
             raise Exception("No text could be extracted from the image. Please ensure the image contains readable text or try a different image.")
@@ -183,20 +382,351 @@ def extract_text_from_image(image_path):
         logging.error(f"Error extracting text from image: {e}")
         raise e
 
+# ============ EXTRACTION CACHE ============
+
+# Bump the trailing number whenever extraction output changes so stale entries stop matching
+def package_version(name):
+    # Read from package metadata so building a cache key doesn't import the package
+    try:
+        return metadata.version(name)
+    except metadata.PackageNotFoundError:
+        return "unknown"
+
+def pdf_extractor_version(page_range=None):
+    # Page range and text budget change the extracted text, so they are part of the cache key
+    first_page, last_page = page_range or (None, None)
+    variant = f":p{first_page or ''}-{last_page or ''}" if page_range else ""
+    return f"pypdf-{package_version('pypdf')}/2{variant}:c{current_app.config['EXTRACTION_MAX_CHARS']}"
+
+def image_extractor_version():
+    return f"pytesseract-{package_version('pytesseract')}/2"
+
+# Per-process counters, reset when the worker restarts
+extraction_cache_stats = {'hits': 0, 'misses': 0, 'seconds_saved': 0.0}
+extraction_cache_lock = threading.Lock()
+# Bytes this process has stored since it last summed the cache table (see evict_extraction_cache)
+extraction_cache_unchecked = {'bytes': 0}
+
+def extract_with_cache(content_hash, extractor_version, extract):
+    # Reuse the text of a previous upload with identical bytes (content_hash is their SHA-256),
+    # otherwise run extract() and remember the result. Identical uploads arriving together share
+    # one extraction.
+    entry = ExtractionCache.query.filter_by(content_hash=content_hash, extractor_version=extractor_version).first()
+    if entry:
+        entry.hit_count += 1
+        entry.last_used_at = datetime.utcnow()
+        timed_commit()
+        metrics.annotate(outcome='cached')
+        with extraction_cache_lock:
+            extraction_cache_stats['hits'] += 1
+            extraction_cache_stats['seconds_saved'] += entry.extract_seconds
+        return entry.text
+
+    def extract_and_store():
+        with extraction_cache_lock:
+            extraction_cache_stats['misses'] += 1
+
+        started = time.perf_counter()
+        text = extract()
+        elapsed = time.perf_counter() - started
+
+        # Failed or empty extractions are not cached so a fixed extractor gets another try
+        if text:
+            db.session.add(ExtractionCache(
+                content_hash=content_hash,
+                extractor_version=extractor_version,
+                text=text,
+                size_bytes=len(text.encode('utf-8')),
+                extract_seconds=elapsed
+            ))
+            try:
+                timed_commit()
+            except exc.IntegrityError:
+                # Another worker stored the same upload first
+                db.session.rollback()
+            else:
+                evict_extraction_cache(len(text.encode('utf-8')))
+        return text
+
+    release_db_connection()
+    text, shared = coalesced(f"extract:{content_hash}:{extractor_version}", extract_and_store)
+    if shared:
+        metrics.annotate(outcome='coalesced')
+    return text
+
+def evict_extraction_cache(added_bytes):
+    # Drop least recently used entries until the cache fits in EXTRACTION_CACHE_MAX_BYTES.
+    # Summing the whole table is only worth it once this process has stored a tenth of the
+    # limit since its last check, so the cache can overrun by that much per server process.
+    limit = current_app.config['EXTRACTION_CACHE_MAX_BYTES']
+    with extraction_cache_lock:
+        extraction_cache_unchecked['bytes'] += added_bytes
+        if extraction_cache_unchecked['bytes'] < limit // 10:
+            return
+        extraction_cache_unchecked['bytes'] = 0
+
+    total = db.session.query(db.func.coalesce(db.func.sum(ExtractionCache.size_bytes), 0)).scalar()
+    if total <= limit:
+        return
+
+    stale_ids = []
+    entries = db.session.query(ExtractionCache.id, ExtractionCache.size_bytes).order_by(ExtractionCache.last_used_at.asc())
+    for entry_id, size_bytes in entries:
+        if total <= limit:
+            break
+        stale_ids.append(entry_id)
+        total -= size_bytes
+
+    ExtractionCache.query.filter(ExtractionCache.id.in_(stale_ids)).delete(synchronize_session=False)
+    db.session.commit()
+
+# ============ QUESTION GENERATION ============
+
+QUESTION_PROMPT_TEMPLATE = """Create quiz questions from the study material below. Follow these EXACT formatting rules:
+
+                RULES:
+                1. Generate {count} multiple choice questions
+                2. Each question must have EXACTLY 4 answer choices
+                3. Mark the correct answer with an asterisk (*) at the END
+                4. Use this EXACT format: Question? ; answer1, answer2, answer3*, answer4
+                5. Separate questions with the pipe symbol: |
+                6. NO letter labels (A, B, C, D)
+                7. NO numbering
+                8. NO extra text or explanations
+
+                EXAMPLE FORMAT:
+                What is the capital of France? ; London, Berlin, Paris*, Rome | What is 2+2? ; 3, 4*, 5, 6
+
+                STUDY MATERIAL:
+                """
+
+QUESTION_PROMPT = QUESTION_PROMPT_TEMPLATE.format(count="4-5")
+
+def question_prompt(count=None):
+    return QUESTION_PROMPT_TEMPLATE.format(count=count) if count else QUESTION_PROMPT
+
+# Per-process counters, reset when the worker restarts
+generation_cache_stats = {'hits': 0, 'misses': 0}
+# Entries this process has stored since it last evicted (see store_generation)
+generation_cache_unchecked = {'stores': 0}
+generation_cache_lock = threading.Lock()
+
+llm_client_lock = threading.Lock()
+
+def llm_client():
+    # The app's shared client: rate limiting, in-flight cap and retries live there. Built on
+    # first use so a worker starts without importing the provider SDK.
+    extensions = current_app.extensions
+    if extensions['llm_client'] is None:
+        with llm_client_lock:
+            if extensions['llm_client'] is None:
+                extensions['llm_client'] = llm.create_client(current_app.config)
+    return extensions['llm_client']
+
+def release_db_connection():
+    # Hand the pooled connection back while this request waits on Gemini, the extraction pool or
+    # another request doing the same work; a gevent worker has far more requests in flight than
+    # the pool has connections. Closing rolls back anything uncommitted: writes meant to last
+    # are committed where they are made (cache hits, stores), never as a side effect of this.
+    db.session.close()
+
+def generation_cache_key(study_text, prompt=QUESTION_PROMPT, model_name=None):
+    # Whitespace differences (re-extracted PDFs, pasted text) should not defeat the cache.
+    # The model name comes from the configured provider so stub output never answers real requests.
+    model_name = model_name or llm.configured_model_name(current_app.config)
+    normalized = " ".join(study_text.split())
+    digest = hashlib.sha256()
+    for part in (model_name, prompt, normalized):
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+def lookup_generation(cache_key, fresh=False):
+    # Return the cached response for cache_key, or None on a miss; fresh=True always misses
+    now = datetime.utcnow()
+    entry = GenerationCache.query.filter_by(cache_key=cache_key).first()
+    if entry and not fresh and entry.expires_at > now:
+        entry.hit_count += 1
+        entry.last_used_at = now
+        timed_commit()
+        with generation_cache_lock:
+            generation_cache_stats['hits'] += 1
+        return entry.ai_response
+
+    with generation_cache_lock:
+        generation_cache_stats['misses'] += 1
+    return None
+
+def store_generation(cache_key, ai_response):
+    # Insert or refresh the entry for cache_key
+    now = datetime.utcnow()
+    expires_at = now + timedelta(seconds=current_app.config['GENERATION_CACHE_TTL_SECONDS'])
+    entry = GenerationCache.query.filter_by(cache_key=cache_key).first()
+    if entry:
+        entry.ai_response = ai_response
+        entry.created_at = now
+        entry.expires_at = expires_at
+        entry.last_used_at = now
+    else:
+        db.session.add(GenerationCache(
+            cache_key=cache_key,
+            model_name=llm.configured_model_name(current_app.config),
+            ai_response=ai_response,
+            expires_at=expires_at,
+            last_used_at=now
+        ))
+    # Counting the table is only worth it once this process has stored a tenth of
+    # GENERATION_CACHE_MAX_ENTRIES since its last eviction; the eviction then commits with the store
+    with generation_cache_lock:
+        generation_cache_unchecked['stores'] += 1
+        due = generation_cache_unchecked['stores'] >= max(current_app.config['GENERATION_CACHE_MAX_ENTRIES'] // 10, 1)
+        if due:
+            generation_cache_unchecked['stores'] = 0
+    if due:
+        evict_generation_cache()
+    try:
+        timed_commit()
+    except exc.IntegrityError:
+        # Another worker cached the same material first (an eviction in this transaction waits for the next turn)
+        db.session.rollback()
+
+def generate_with_cache(study_text, fresh=False, prompt=QUESTION_PROMPT):
+    # Return (ai_response, cached); fresh=True skips the lookup but still refreshes the stored
+    # entry. Identical misses in flight together share one Gemini call.
+    with metrics.span('prompt', characters=len(study_text)):
+        cache_key = generation_cache_key(study_text, prompt)
+        full_prompt = prompt + study_text
+    ai_response = lookup_generation(cache_key, fresh)
+    if ai_response is not None:
+        return ai_response, True
+
+    def call_llm():
+        with metrics.span('llm', characters=len(full_prompt)) as stage:
+            ai_response = llm_client().generate(full_prompt)
+            if not ai_response:
+                stage['outcome'] = 'empty'
+        if ai_response:
+            store_generation(cache_key, ai_response)
+        return ai_response
+
+    # A fresh request wants a response of its own
+    release_db_connection()
+    ai_response = call_llm() if fresh else coalesced(f"generate:{cache_key}", call_llm)[0]
+    if not ai_response:
+        return "No response from AI", False
+    return ai_response, False
+
+def stream_generation(study_text, fresh=False, prompt=QUESTION_PROMPT):
+    # Yield each validated question as soon as its text is complete, then a final "done" event.
+    # A cache hit replays the stored response; a miss streams from Gemini and caches the result.
+    parser = QuestionStreamParser()
+    with metrics.span('prompt', characters=len(study_text)):
+        cache_key = generation_cache_key(study_text, prompt)
+        full_prompt = prompt + study_text
+    ai_response = lookup_generation(cache_key, fresh)
+    cached = ai_response is not None
+
+    if not cached:
+        release_db_connection()
+
+    # An identical stream already running elsewhere is waited for and replayed like a cache hit
+    flights = current_app.extensions['single_flight']
+    ticket = flights.begin(f"generate:{cache_key}") if flights and not cached and not fresh else None
+    if ticket and not ticket.leading:
+        ai_response = ticket.wait()
+    shared = ticket is not None and not ticket.leading
+
+    if cached or shared:
+        if shared:
+            metrics.COALESCED.inc(stage='generate')
+        questions = parser.feed(ai_response or "") + parser.close()
+        for question in questions:
+            yield {"type": "question", **question}
+    else:
+        parts = []
+        try:
+            # Includes the time spent handing each question to the client
+            with metrics.span('llm', characters=len(full_prompt)) as stage:
+                for text in llm_client().stream(full_prompt):
+                    parts.append(text)
+                    for question in parser.feed(text):
+                        yield {"type": "question", **question}
+                for question in parser.close():
+                    yield {"type": "question", **question}
+                if not parser.accepted:
+                    stage['outcome'] = 'empty'
+            ai_response = "".join(parts)
+            if parser.accepted:
+                store_generation(cache_key, ai_response)
+        except Exception as e:
+            if ticket:
+                ticket.fail(e)
+            raise
+        except BaseException:
+            # The client went away mid-stream: someone waiting on this one streams it instead
+            if ticket:
+                ticket.abandon()
+            raise
+        if ticket:
+            ticket.finish(ai_response if parser.accepted else None)
+
+    yield {"type": "done", "count": parser.accepted, "rejected": parser.rejected, "cached": cached}
+
+def generate_chunked(study_text, total, fresh=False):
+    # Map: ask for a share of the questions from each overlapping chunk, GENERATION_CONCURRENCY
+    # calls at a time. Reduce: merge round-robin across chunks and drop near-duplicates.
+    chunks = split_into_chunks(study_text, current_app.config['CHUNK_CHARS'], current_app.config['CHUNK_OVERLAP_CHARS'])
+    if len(chunks) <= 1:
+        return generate_with_cache(study_text, fresh=fresh, prompt=question_prompt(total))
+
+    # Over-ask a little so duplicates and malformed questions can be dropped
+    per_chunk = max(2, math.ceil(total / len(chunks)) + 1)
+    prompt = question_prompt(per_chunk)
+    logging.debug(f"Chunked generation: {len(chunks)} chunks, {per_chunk} questions each",
+                  extra={'chunks': len(chunks), 'per_chunk': per_chunk})
+
+    app = current_app._get_current_object()
+
+    def generate_chunk(chunk):
+        with app.app_context():
+            try:
+                return generate_with_cache(chunk, fresh=fresh, prompt=prompt)
+            finally:
+                db.session.remove()
+
+    with ThreadPoolExecutor(max_workers=current_app.config['GENERATION_CONCURRENCY']) as pool:
+        results = list(pool.map(generate_chunk, chunks))
+
+    question_lists = [parse_questions(ai_response) for ai_response, _ in results]
+    merged = merge_questions(question_lists, total, current_app.config['DUPLICATE_THRESHOLD'])
+    if not merged:
+        return "No response from AI", False
+    return format_questions(merged), all(cached for _, cached in results)
+
+def evict_generation_cache():
+    # Expired entries go first, then least recently used ones beyond GENERATION_CACHE_MAX_ENTRIES.
+    # Runs in the caller's transaction.
+    GenerationCache.query.filter(GenerationCache.expires_at <= datetime.utcnow()).delete(synchronize_session=False)
+    overflow = GenerationCache.query.count() - current_app.config['GENERATION_CACHE_MAX_ENTRIES']
+    if overflow > 0:
+        stale_ids = [entry_id for (entry_id,) in db.session.query(GenerationCache.id)
+                     .order_by(GenerationCache.last_used_at.asc()).limit(overflow)]
+        GenerationCache.query.filter(GenerationCache.id.in_(stale_ids)).delete(synchronize_session=False)
+
 # ============ AUTHENTICATION ROUTES ============
 
-@app.route('/login', methods=['GET', 'POST'])
+@bp.route('/login', methods=['GET', 'POST'])
 def login():
     form = LoginForm()
     if form.validate_on_submit():
         user = User.query.filter_by(username=form.username.data).first()
         if user and check_password_hash(user.password, form.password.data):
             login_user(user)
-            return redirect(url_for('home'))
+            return redirect(url_for('main.home'))
         flash('Invalid username or password')
     return render_template('auth/login.html', form=form)
 
-@app.route('/register', methods=['GET', 'POST'])
+@bp.route('/register', methods=['GET', 'POST'])
 def register():
     form = RegisterForm()
     if form.validate_on_submit():
@@ -205,23 +735,23 @@ def register():
         db.session.add(new_user)
         db.session.commit()
         login_user(new_user)
-        return redirect(url_for('home'))
+        return redirect(url_for('main.home'))
     return render_template('auth/register.html', form=form)
 
-@app.route('/logout')
+@bp.route('/logout')
 @login_required
 def logout():
     logout_user()
-    return redirect(url_for('index'))
+    return redirect(url_for('main.index'))
 
 # ============ MAIN PAGES ============
 
-@app.route('/')
+@bp.route('/')
 def index():
     # Guest mode - current quiz generation functionality
     return render_template('guest/index.html')
 
-@app.route('/home')
+@bp.route('/home')
 @login_required
 def home():
     # Authenticated home - question generation + selection
@@ -229,14 +759,52 @@ def home():
 
 # ============ QUIZ MANAGEMENT ROUTES ============
 
-@app.route('/quizzes')
+def quiz_summaries(user_id):
+    # The user's quizzes in id order, each with its question and attempt aggregates as correlated
+    # subqueries instead of lazy-loading them per quiz
+    question_count = db.select(db.func.count(Question.id)).where(Question.quiz_id == Quiz.id).scalar_subquery()
+    # user_id is redundant (only the owner can attempt a quiz) but lets the composite index serve it
+    attempt_filter = db.and_(QuizAttempt.user_id == user_id, QuizAttempt.quiz_id == Quiz.id)
+    attempt_count = db.select(db.func.count(QuizAttempt.id)).where(attempt_filter).scalar_subquery()
+    best_score = db.select(db.func.max(QuizAttempt.score)).where(attempt_filter).scalar_subquery()
+    best_total = db.select(db.func.max(QuizAttempt.total_questions)).where(attempt_filter).scalar_subquery()
+
+    return db.session.query(Quiz, question_count, attempt_count, best_score, best_total) \
+        .filter(Quiz.user_id == user_id).order_by(Quiz.id)
+
+def quiz_summary(row):
+    quiz, questions, attempts, best, total = row
+    return {
+        'quiz': quiz,
+        'question_count': questions,
+        'attempt_count': attempts,
+        'best_score': best,
+        'best_total': total
+    }
+
+def quiz_page(user_id):
+    # One keyset-paginated page (?after=<last id>&limit=) of quiz_summaries
+    after = request.args.get('after', type=int)
+    limit = request.args.get('limit', type=int) or current_app.config['QUIZZES_PAGE_SIZE']
+    limit = max(1, min(limit, current_app.config['QUIZZES_MAX_PAGE_SIZE']))
+
+    query = quiz_summaries(user_id)
+    if after:
+        query = query.filter(Quiz.id > after)
+    rows = query.limit(limit + 1).all()
+
+    next_after = rows[limit - 1][0].id if len(rows) > limit else None
+    return [quiz_summary(row) for row in rows[:limit]], next_after
+
+@bp.route('/quizzes')
 @login_required
 def quizzes():
     # User's saved quizzes
-    user_quizzes = Quiz.query.filter_by(user_id=current_user.id).all()
-    return render_template('quizzes.html', quizzes=user_quizzes)
+    page, next_after = quiz_page(current_user.id)
+    return render_template('quizzes.html', quizzes=page, next_after=next_after,
+                           after=request.args.get('after', type=int))
 
-@app.route('/create-quiz', methods=['POST'])
+@bp.route('/create-quiz', methods=['POST'])
 @login_required
 def create_quiz():
     # Create a new quiz
@@ -245,31 +813,41 @@ def create_quiz():
         if request.headers.get('Content-Type') == 'application/x-www-form-urlencoded':
             return jsonify({"status": "error", "message": "Quiz title is required"}), 400
         flash('Quiz title is required')
-        return redirect(url_for('quizzes'))
+        return redirect(url_for('main.quizzes'))
     
     new_quiz = Quiz(title=title, user_id=current_user.id)
     db.session.add(new_quiz)
+    db.session.flush()
+    index_search_documents([quiz_document(new_quiz)])
     db.session.commit()
     
     if request.headers.get('Content-Type') == 'application/x-www-form-urlencoded':
         return jsonify({"status": "success", "message": "Quiz created successfully!", "quiz_id": new_quiz.id})
     
     flash('Quiz created successfully!')
-    return redirect(url_for('quizzes'))
+    return redirect(url_for('main.quizzes'))
 
-@app.route('/delete-quiz/<int:quiz_id>', methods=['POST'])
+@bp.route('/delete-quiz/<int:quiz_id>', methods=['POST'])
 @login_required
 def delete_quiz(quiz_id):
     # Delete a quiz and all its questions
     quiz = Quiz.query.filter_by(id=quiz_id, user_id=current_user.id).first_or_404()
     
+    QuizAttemptRollup.query.filter_by(user_id=current_user.id, quiz_id=quiz.id).delete()
+    QuestionBand.query.filter(
+        QuestionBand.question_id.in_(db.select(Question.id).filter_by(quiz_id=quiz.id))
+    ).delete(synchronize_session=False)
+    question_ids = db.session.scalars(db.select(Question.id).filter_by(quiz_id=quiz.id)).all()
+    remove_search_documents([search.question_doc_id(question_id) for question_id in question_ids]
+                            + [search.quiz_doc_id(quiz.id)])
     db.session.delete(quiz)
     db.session.commit()
+    quiz_payload_cache().pop(quiz.id)
     
     flash('Quiz deleted successfully!')
-    return redirect(url_for('quizzes'))
+    return redirect(url_for('main.quizzes'))
 
-@app.route('/take-quiz/<int:quiz_id>')
+@bp.route('/take-quiz/<int:quiz_id>')
 @login_required
 def take_quiz(quiz_id):
     # Load a quiz for the user to take
@@ -277,46 +855,102 @@ def take_quiz(quiz_id):
     
     return render_template('take_quiz.html', quiz=quiz)
 
-@app.route('/api/quiz/<int:quiz_id>')
-@login_required
-def get_quiz_data(quiz_id):
-    # API endpoint to get quiz data
-    quiz = Quiz.query.filter_by(id=quiz_id, user_id=current_user.id).first_or_404()
-    questions = Question.query.filter_by(quiz_id=quiz_id).all()
-    
-    if not questions:
-        return jsonify({"error": "This quiz has no questions yet!"}), 404
-    
-    formatted_questions = []
-    for q in questions:
-        formatted_questions.append({
+def quiz_payload_cache():
+    # Serialized /api/quiz payloads and answer keys, keyed by quiz id and checked against the quiz's
+    # version so an edit made through another server process is never served stale
+    return current_app.extensions['quiz_payload_cache']
+
+def quiz_payload(quiz_id):
+    # Cache entry for one of current_user's quizzes, or None if they don't own it. A hit costs
+    # one primary-key lookup for the ownership check and version; a miss also loads the questions.
+    row = db.session.execute(
+        db.select(Quiz.title, Quiz.version, Quiz.created_at).filter_by(id=quiz_id, user_id=current_user.id)
+    ).first()
+    if row is None:
+        return None
+    title, version, created_at = row
+    # created_at guards against SQLite reusing the id of a deleted quiz
+    etag = f"quiz-{quiz_id}-v{version}-{int(created_at.timestamp()) if created_at else 0}"
+
+    entry = quiz_payload_cache().get(quiz_id, lambda cached: cached['etag'] == etag)
+    if entry:
+        return entry
+
+    questions = db.session.execute(
+        db.select(Question.id, Question.question_text, Question.option_a, Question.option_b,
+                  Question.option_c, Question.option_d, Question.correct_answer)
+        .where(Question.quiz_id == quiz_id).order_by(Question.id)
+    ).all()
+    answer_key = tuple(ord(q.correct_answer) - 65 for q in questions)  # Convert A,B,C,D to 0,1,2,3
+    body = json.dumps({
+        "quiz_id": quiz_id,
+        "title": title,
+        "questions": [{
             "id": q.id,
             "question_text": q.question_text,
             "options": [q.option_a, q.option_b, q.option_c, q.option_d],
-            "correct_answer": ord(q.correct_answer) - 65  # Convert A,B,C,D to 0,1,2,3
-        })
-    
-    return jsonify({
-        "quiz_id": quiz.id,
-        "title": quiz.title,
-        "questions": formatted_questions
+            "correct_answer": correct
+        } for q, correct in zip(questions, answer_key)]
     })
+    entry = {'etag': etag, 'body': body, 'answer_key': answer_key}
+    quiz_payload_cache().put(quiz_id, entry)
+    return entry
+
+def bump_quiz_version(quiz_id):
+    # Call inside the transaction that changes the quiz's questions
+    db.session.execute(db.update(Quiz).where(Quiz.id == quiz_id).values(version=Quiz.version + 1))
+    quiz_payload_cache().pop(quiz_id)
+
+@bp.route('/api/quiz/<int:quiz_id>')
+@login_required
+def get_quiz_data(quiz_id):
+    # API endpoint to get quiz data; answers 304 when the browser's ETag is still current
+    entry = quiz_payload(quiz_id)
+    if entry is None:
+        abort(404)
+    if not entry['answer_key']:
+        return jsonify({"error": "This quiz has no questions yet!"}), 404
 
-@app.route('/api/quizzes')
+    response = Response(entry['body'], mimetype='application/json')
+    response.set_etag(entry['etag'])
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response.make_conditional(request)
+
+@bp.route('/api/quiz-cache/stats')
+def quiz_cache_stats_api():
+    # Hit/miss counters for this worker's quiz payload cache
+    require_metrics_access()
+    return jsonify(quiz_payload_cache().stats())
+
+def quiz_list_item(row):
+    return {
+        'id': row['quiz'].id,
+        'title': row['quiz'].title,
+        'question_count': row['question_count']
+    }
+
+@bp.route('/api/quizzes')
 @login_required
 def get_quizzes():
-    user_quizzes = Quiz.query.filter_by(user_id=current_user.id).all()
-    quizzes_data = []
-    for quiz in user_quizzes:
-        question_count = Question.query.filter_by(quiz_id=quiz.id).count()
-        quizzes_data.append({
-            'id': quiz.id, 
-            'title': quiz.title,
-            'question_count': question_count
-        })
-    return jsonify(quizzes_data)
-
-@app.route('/submit_quiz', methods=['POST'])
+    # The body stays a plain list; the cursor for the next page is in X-Next-After / Link
+    page, next_after = quiz_page(current_user.id)
+    response = jsonify([quiz_list_item(row) for row in page])
+    if next_after:
+        next_url = url_for('main.get_quizzes', after=next_after, limit=request.args.get('limit', type=int))
+        response.headers['X-Next-After'] = str(next_after)
+        response.headers['Link'] = f'<{next_url}>; rel="next"'
+    return response
+
+@bp.route('/api/quizzes/<int:quiz_id>')
+@login_required
+def get_quiz_summary(quiz_id):
+    # One entry of /api/quizzes, so a client can refresh the quiz it just changed
+    row = quiz_summaries(current_user.id).filter(Quiz.id == quiz_id).first()
+    if row is None:
+        return jsonify({"status": "error", "message": "Quiz not found"}), 404
+    return jsonify(quiz_list_item(quiz_summary(row)))
+
+@bp.route('/submit_quiz', methods=['POST'])
 @login_required
 def submit_quiz():
     # Save quiz attempt results
@@ -324,21 +958,23 @@ def submit_quiz():
     quiz_id = data.get('quiz_id')
     answers = data.get('answers')
     
-    # Validate quiz belongs to user
-    quiz = Quiz.query.filter_by(id=quiz_id, user_id=current_user.id).first_or_404()
-    questions = Question.query.filter_by(quiz_id=quiz_id).all()
+    from item_analysis import pack_responses
+
+    # Validate quiz belongs to user; the answer key comes from the quiz payload cache
+    entry = quiz_payload(quiz_id)
+    if entry is None:
+        abort(404)
+    answer_key = entry['answer_key']
     
-    if not questions:
+    if not answer_key:
         return jsonify({"error": "This quiz has no questions"}), 404
     
     # Calculate score
     score = 0
-    for i, question in enumerate(questions):
+    for i, correct_answer in enumerate(answer_key):
         # Skip unanswered questions
         if i < len(answers) and answers[i] is not None:
-            user_answer = answers[i]
-            correct_answer = ord(question.correct_answer) - 65  # Convert A,B,C,D to 0,1,2,3
-            if user_answer == correct_answer:
+            if answers[i] == correct_answer:
                 score += 1
     
     # Create attempt record
@@ -346,87 +982,166 @@ def submit_quiz():
         user_id=current_user.id,
         quiz_id=quiz_id,
         score=score,
-        total_questions=len(questions)
+        total_questions=len(answer_key),
+        responses=pack_responses(answers, len(answer_key))
     )
     
     db.session.add(new_attempt)
-    db.session.commit()
+    db.session.flush()
+    record_attempt_rollup(new_attempt)
+    timed_commit()
     
     return jsonify({
         "status": "success", 
         "message": "Quiz results saved!",
         "score": score,
-        "total": len(questions)
+        "total": len(answer_key)
     })
 
-@app.route('/analytics')
+@bp.route('/api/quiz/<int:quiz_id>/item-stats')
+@login_required
+def quiz_item_stats(quiz_id):
+    # Per-question difficulty, option frequencies and discrimination over every recorded attempt.
+    # Two queries: the answer key and the packed responses, which are analysed as one matrix.
+    from item_analysis import item_statistics
+
+    quiz = Quiz.query.filter_by(id=quiz_id, user_id=current_user.id).first_or_404()
+    key_rows = db.session.execute(
+        db.select(Question.id, Question.question_text, Question.correct_answer)
+        .where(Question.quiz_id == quiz.id).order_by(Question.id)
+    ).all()
+    responses = db.session.scalars(
+        db.select(QuizAttempt.responses).where(QuizAttempt.quiz_id == quiz.id, QuizAttempt.responses.is_not(None))
+    ).all()
+
+    items = item_statistics(responses, [ord(correct) - 65 for _, _, correct in key_rows])
+    for (question_id, question_text, correct), item in zip(key_rows, items):
+        item.update({'question_id': question_id, 'question_text': question_text, 'correct_index': ord(correct) - 65})
+    return jsonify({"quiz_id": quiz.id, "title": quiz.title, "attempts": len(responses), "items": items})
+
+def upsert(model):
+    # INSERT ... ON CONFLICT for the database in use (SQLite or PostgreSQL)
+    if db.engine.dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(model)
+
+def record_attempt_rollup(attempt):
+    # Fold one attempt into its rollup row inside the caller's transaction. A single upsert, with
+    # the increments in SQL, so concurrent submissions neither lose updates nor race to insert
+    # the first row.
+    percent = attempt.score * 100.0 / attempt.total_questions
+    rollup = QuizAttemptRollup.__table__
+    statement = upsert(rollup).values(
+        user_id=attempt.user_id,
+        quiz_id=attempt.quiz_id,
+        attempt_count=1,
+        percent_sum=percent,
+        best_percent=percent,
+        last_attempt_at=attempt.completed_at
+    )
+    db.session.execute(statement.on_conflict_do_update(
+        index_elements=[rollup.c.user_id, rollup.c.quiz_id],
+        set_={
+            'attempt_count': rollup.c.attempt_count + 1,
+            'percent_sum': rollup.c.percent_sum + percent,
+            'best_percent': db.case((rollup.c.best_percent < percent, percent), else_=rollup.c.best_percent),
+            'last_attempt_at': attempt.completed_at
+        }
+    ))
+
+# Score bands shown in the performance distribution chart, highest first
+SCORE_BANDS = [
+    ('Excellent (90-100%)', 90),
+    ('Good (80-89%)', 80),
+    ('Average (70-79%)', 70),
+    ('Below Average (60-69%)', 60),
+    ('Poor (<60%)', None),
+]
+
+def score_distribution(attempt_filter):
+    percent = attempt_percent()
+    band = db.case(*[(percent >= floor, label) for label, floor in SCORE_BANDS if floor is not None],
+                   else_=SCORE_BANDS[-1][0])
+    counts = dict(db.session.query(band, db.func.count(QuizAttempt.id)).filter(*attempt_filter).group_by(band))
+    return {label: counts.get(label, 0) for label, _ in SCORE_BANDS}
+
+def progress_series(attempt_filter, total_attempts):
+    # Chart.js time series: one point per attempt, or daily averages once there are more than
+    # ANALYTICS_MAX_POINTS attempts so the payload stays bounded
+    if total_attempts <= current_app.config['ANALYTICS_MAX_POINTS']:
+        rows = db.session.query(QuizAttempt.completed_at, QuizAttempt.score, QuizAttempt.total_questions, Quiz.title) \
+            .join(Quiz, Quiz.id == QuizAttempt.quiz_id) \
+            .filter(*attempt_filter).order_by(QuizAttempt.completed_at.asc())
+        return [{
+            'date': completed_at.strftime('%Y-%m-%d'),
+            'score': round((score / total) * 100, 2),
+            'quiz_name': title,
+            'raw_score': f"{score}/{total}"
+        } for completed_at, score, total, title in rows]
+
+    day = db.func.date(QuizAttempt.completed_at)
+    rows = db.session.query(day, db.func.avg(attempt_percent()), db.func.count(QuizAttempt.id)) \
+        .filter(*attempt_filter).group_by(day).order_by(day)
+    return [{
+        'date': str(date),
+        'score': round(average, 2),
+        'quiz_name': f"{count} attempt{'s' if count != 1 else ''}",
+        'raw_score': f"daily average of {count}"
+    } for date, average, count in rows]
+
+@bp.route('/analytics')
 @login_required
 def analytics():
     # Get selected quiz filter from query parameter
     selected_quiz_id = request.args.get('quiz_id', type=int)
     
     # Get all user's quizzes for the dropdown
-    user_quizzes = Quiz.query.filter_by(user_id=current_user.id).all()
-    
-    # Filter attempts based on selected quiz
+    user_quizzes = db.session.query(Quiz.id, Quiz.title).filter_by(user_id=current_user.id).order_by(Quiz.id).all()
+
+    rollup_filter = [QuizAttemptRollup.user_id == current_user.id]
+    attempt_filter = [QuizAttempt.user_id == current_user.id]
     if selected_quiz_id:
-        attempts = QuizAttempt.query.filter_by(
-            user_id=current_user.id, 
-            quiz_id=selected_quiz_id
-        ).order_by(QuizAttempt.completed_at.asc()).all()
-        selected_quiz = Quiz.query.get(selected_quiz_id)
-        filter_title = selected_quiz.title if selected_quiz else f"Quiz {selected_quiz_id}"
+        rollup_filter.append(QuizAttemptRollup.quiz_id == selected_quiz_id)
+        attempt_filter.append(QuizAttempt.quiz_id == selected_quiz_id)
+        selected_title = next((title for quiz_id, title in user_quizzes if quiz_id == selected_quiz_id), None)
+        filter_title = selected_title or f"Quiz {selected_quiz_id}"
     else:
-        # Show all attempts
-        attempts = QuizAttempt.query.filter_by(user_id=current_user.id).order_by(QuizAttempt.completed_at.asc()).all()
         filter_title = "All Quizzes"
-    
-    # Prepare data for Chart.js
-    chart_data = []
-    quiz_names = {}
-    
-    # Get quiz names
-    for attempt in attempts:
-        if attempt.quiz_id not in quiz_names:
-            quiz = Quiz.query.get(attempt.quiz_id)
-            quiz_names[attempt.quiz_id] = quiz.title if quiz else f"Quiz {attempt.quiz_id}"
-    
-    # Prepare time series data
-    for attempt in attempts:
-        chart_data.append({
-            'date': attempt.completed_at.strftime('%Y-%m-%d'),
-            'score': round((attempt.score / attempt.total_questions) * 100, 2),
-            'quiz_name': quiz_names[attempt.quiz_id],
-            'raw_score': f"{attempt.score}/{attempt.total_questions}"
-        })
-    
-    # Calculate statistics
-    total_attempts = len(attempts)
-    if total_attempts > 0:
-        avg_score = sum(attempt.score / attempt.total_questions for attempt in attempts) / total_attempts * 100
-        best_score = max(attempt.score / attempt.total_questions for attempt in attempts) * 100
-        recent_attempts = attempts[-5:] if len(attempts) >= 5 else attempts
-    else:
-        avg_score = 0
-        best_score = 0
-        recent_attempts = []
-    
+
+    # Headline numbers come from the rollups: one row per quiz, however many attempts there are
+    total_attempts, percent_sum, best_score = db.session.query(
+        db.func.coalesce(db.func.sum(QuizAttemptRollup.attempt_count), 0),
+        db.func.coalesce(db.func.sum(QuizAttemptRollup.percent_sum), 0.0),
+        db.func.coalesce(db.func.max(QuizAttemptRollup.best_percent), 0.0)
+    ).filter(*rollup_filter).one()
+    avg_score = percent_sum / total_attempts if total_attempts else 0
+
+    recent_attempts = db.session.query(QuizAttempt.completed_at, QuizAttempt.score, QuizAttempt.total_questions, Quiz.title) \
+        .join(Quiz, Quiz.id == QuizAttempt.quiz_id) \
+        .filter(*attempt_filter).order_by(QuizAttempt.completed_at.desc()).limit(10).all()
+
+    chart_data = progress_series(attempt_filter, total_attempts) if total_attempts else []
+    distribution = score_distribution(attempt_filter) if total_attempts else {}
+
     stats = {
         'total_attempts': total_attempts,
         'avg_score': round(avg_score, 2),
         'best_score': round(best_score, 2),
-        'recent_attempts': recent_attempts
+        'recent_attempts': recent_attempts[:5]
     }
     
     return render_template('analytics.html', 
-                         attempts=attempts, 
+                         recent_attempts=recent_attempts, 
                          chart_data=chart_data, 
+                         distribution=distribution, 
                          stats=stats,
                          user_quizzes=user_quizzes,
                          selected_quiz_id=selected_quiz_id,
                          filter_title=filter_title)
 
-@app.route('/settings')
+@bp.route('/settings')
 @login_required
 def settings():
     # User account settings
@@ -434,129 +1149,1001 @@ def settings():
 
 # ============ API ROUTES ============
 
-@app.route('/generate-questions', methods=['POST'])
+@bp.route('/generate-questions', methods=['POST'])
 def generate_questions():
-    try:
-        print("DEBUG: Starting generate_questions route")
-        # Question generation API (works for both guest and authenticated users)
-        user_input = None
-        
-        if 'file' in request.files:
-            print("DEBUG: File upload detected")
-            file = request.files['file']
-            if file.filename != '':
-                file_ext = file.filename.split('.')[1].lower()
-                print(f"DEBUG: File extension: {file_ext}")
-                if file_ext == 'pdf':
-                    filename = secure_filename(file.filename)
-                    file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-                    file.save(file_path)
-                    print(f"DEBUG: Extracting text from PDF: {file_path}")
-                    user_input = extract_text_from_pdf(file_path)
-                elif file_ext in ['png', 'jpg', 'jpeg']:
-                    filename = secure_filename(file.filename)
-                    file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-                    file.save(file_path)
-                    print(f"DEBUG: Extracting text from image: {file_path}")
-                    try:
-                        user_input = extract_text_from_image(file_path)
-                        print(f"DEBUG: Extracted text length: {len(user_input) if user_input else 0}")
-                    except Exception as e:
-                        print(f"DEBUG: Image text extraction failed: {e}")
-                        return jsonify({"status": "error", "message": str(e)}), 400
-                else:
-                    print(f"DEBUG: Unsupported file type: {file_ext}")
-                    return jsonify({"status": "error", "message": "Unsupported file type"}), 400
+    # Question generation API (works for both guest and authenticated users)
+    return handle_generation(allow_jobs=True)
+
+class GenerationInputError(Exception):
+    # Problems with the submitted material, reported to the user as a 400
+    pass
+
+def parse_generation_request():
+    # Validate the form up front and capture everything generation needs, so the work
+    # can run later on a job thread without the request object
+    spec = {
+        'kind': 'text',
+        'fresh': form_flag('fresh'),
+        'chunked': form_flag('chunked'),
+        'question_count': parse_question_count(request.form.get('question_count')),
+        # Signed-in users don't get back questions they have already saved
+        'user_id': current_user.id if current_user.is_authenticated else None
+    }
+    file = request.files.get('file')
+    if file and file.filename != '':
+        page_range = parse_page_range(request.form.get('pages'))
+        with metrics.span('upload') as stage:
+            upload, content_hash, size, head = spool_upload(file.stream, current_app.config['UPLOAD_SPOOL_MAX_BYTES'])
+            file_type = detect_file_type(file.filename, head)
+            stage.update({'kind': file_type or 'unsupported', 'bytes': size})
+        # Taken over from the request, which closes its files when it ends, so a job thread can
+        # still read it; close_upload closes it instead
+        file.stream = io.BytesIO()
+        logging.debug(f"Upload: {file_type} ({size} bytes)", extra={'file_type': file_type, 'bytes': size})
+        if not size:
+            # The extension alone would send it on to the extractor, which can only fail
+            upload.close()
+            raise GenerationInputError("The uploaded file is empty")
+        if file_type == 'pdf':
+            spec['kind'] = 'pdf'
+            spec['page_range'] = page_range
+        elif file_type in ('png', 'jpeg'):
+            spec['kind'] = 'image'
         else:
-            print("DEBUG: No file upload, checking form data")
-            user_input = request.form.get("study_material")
-            print(f"DEBUG: Form data length: {len(user_input) if user_input else 0}")
+            upload.close()
+            raise GenerationInputError("Unsupported file type")
+        spec.update({'file_type': file_type, 'upload': upload, 'content_hash': content_hash})
+    else:
+        spec['text'] = request.form.get("study_material")
+    return spec
+
+def form_flag(name):
+    return request.form.get(name, '').lower() in ('1', 'true', 'on', 'yes')
+
+def parse_question_count(value):
+    if not value:
+        return None
+    try:
+        count = int(value)
+    except ValueError:
+        raise ValueError(f"Invalid question count: {value}")
+    if not 1 <= count <= current_app.config['MAX_QUESTION_COUNT']:
+        raise ValueError(f"Question count must be between 1 and {current_app.config['MAX_QUESTION_COUNT']}")
+    return count
+
+def close_upload(spec):
+    upload = spec.get('upload')
+    if upload is not None:
+        upload.close()
+
+def extract_input(spec):
+    if spec['kind'] == 'text':
+        return spec['text']
+
+    upload = spec['upload']
+    try:
+        if current_app.config['UPLOAD_STORE_DIR']:
+            store_upload(current_app.config['UPLOAD_STORE_DIR'], spec['content_hash'], spec['file_type'], upload)
 
+        with metrics.span('extract', kind=spec['kind']) as stage:
+            if spec['kind'] == 'pdf':
+                user_input = extract_with_cache(spec['content_hash'], pdf_extractor_version(spec['page_range']),
+                                                lambda: extract_text_from_pdf(upload, page_range=spec['page_range']))
+            else:
+                try:
+                    user_input = extract_with_cache(spec['content_hash'], image_extractor_version(),
+                                                    lambda: extract_text_from_image(upload))
+                except Exception as e:
+                    logging.info(f"Image text extraction failed: {e}")
+                    raise GenerationInputError(str(e))
+            stage['characters'] = len(user_input or '')
+            if not user_input:
+                stage['outcome'] = 'empty'
+            return user_input
+    finally:
+        # The upload is read exactly once, by whichever path runs the generation
+        close_upload(spec)
+
+def condense_input(spec, user_input):
+    # Strip repeated headers/footers and near-empty pages, then fit single-prompt generation to
+    # PROMPT_TOKEN_BUDGET; chunked generation exists to cover long material, so it gets no budget
+    if not current_app.config['CONDENSE_INPUT']:
+        return user_input
+    budget = 0 if spec['chunked'] else current_app.config['PROMPT_TOKEN_BUDGET']
+    with metrics.span('condense', kind=spec['kind'], characters=len(user_input)):
+        condensed, report = condense(user_input, budget)
+    metrics.PROMPT_TOKENS.observe(report['tokens_before'], kind=spec['kind'], phase='before')
+    metrics.PROMPT_TOKENS.observe(report['tokens_after'], kind=spec['kind'], phase='after')
+    logging.info(f"Study material condensed from {report['tokens_before']} to {report['tokens_after']} tokens",
+                 extra={'kind': spec['kind'], 'budget_tokens': budget, **report})
+    spec['input_tokens'] = {'before': report['tokens_before'], 'after': report['tokens_after']}
+    return condensed
+
+def coalesced(key, fn):
+    # fn() run once for every concurrent caller of key, in this worker and (SINGLE_FLIGHT=host)
+    # the others on the host; see singleflight.py. Returns (result, shared).
+    flights = current_app.extensions['single_flight']
+    if flights is None:
+        return fn(), False
+    result, shared = flights.do(key, fn)
+    if shared:
+        metrics.COALESCED.inc(stage=key.partition(':')[0])
+    return result, shared
+
+@contextmanager
+def generation_span(kind):
+    # One whole extract + generate run: the 'total' stage, counted in quizifai_generations_total
+    with metrics.span('total', kind=kind) as stage:
+        try:
+            yield stage
+        except GenerationInputError:
+            stage['outcome'] = 'invalid'
+            raise
+        except llm.LLMBusyError:
+            stage['outcome'] = 'busy'
+            raise
+        except GeneratorExit:
+            stage['outcome'] = 'cancelled'
+            raise
+        except Exception:
+            stage['outcome'] = 'error'
+            raise
+        finally:
+            metrics.GENERATIONS.inc(kind=kind, outcome=stage['outcome'])
+
+def run_generation(spec, progress=None):
+    # Extract and generate; progress(stage) is called as the work moves between stages.
+    # Returns (ai_response, cached, number of near-duplicates of saved questions removed).
+    progress = progress or (lambda stage: None)
+    with generation_span(spec['kind']) as stage:
+        progress('extracting')
+        user_input = extract_input(spec)
         if not user_input:
-            print("DEBUG: No input provided")
-            return jsonify({"status": "error", "message": "No input provided"}), 400
+            raise GenerationInputError("No input provided")
+        stage['characters'] = len(user_input)
+        user_input = condense_input(spec, user_input)
 
-        print("DEBUG: Calling Gemini AI")
-        model = genai.GenerativeModel("gemini-2.5-flash-lite")
-        response = model.generate_content("""Create quiz questions from the study material below. Follow these EXACT formatting rules:
+        progress('generating')
+        if spec['chunked']:
+            result = generate_chunked(user_input, spec['question_count'] or current_app.config['DEFAULT_QUESTION_COUNT'], fresh=spec['fresh'])
+        else:
+            result = generate_with_cache(user_input, fresh=spec['fresh'], prompt=question_prompt(spec['question_count']))
+        ai_response, cached = result
+        stage['outcome'] = 'cached' if cached else 'ok'
 
-                RULES:
-                1. Generate 4-5 multiple choice questions
-                2. Each question must have EXACTLY 4 answer choices
-                3. Mark the correct answer with an asterisk (*) at the END
-                4. Use this EXACT format: Question? ; answer1, answer2, answer3*, answer4
-                5. Separate questions with the pipe symbol: |
-                6. NO letter labels (A, B, C, D)
-                7. NO numbering
-                8. NO extra text or explanations
+    removed = 0
+    if spec.get('user_id'):
+        # After the cache: cached responses are shared between users, question banks are not
+        ai_response, removed = drop_known_questions(spec['user_id'], ai_response)
+    return ai_response, cached, removed
 
-                EXAMPLE FORMAT:
-                What is the capital of France? ; London, Berlin, Paris*, Rome | What is 2+2? ; 3, 4*, 5, 6
+def handle_generation(allow_jobs):
+    try:
+        try:
+            spec = parse_generation_request()
+        except ValueError as e:
+            raise GenerationInputError(str(e))
 
-                STUDY MATERIAL:
-                """ + user_input)
-        
-        print("DEBUG: AI response received")
-        ai_response = response.text if response and hasattr(response, 'text') else "No response from AI"
-        print(f"DEBUG: Returning success response")
-        return jsonify({"status": "success", "ai_response": ai_response})
-        
+        # Jobs belong to the user who started them; guests always get the synchronous response
+        if allow_jobs and request.values.get('mode') == 'job' and current_user.is_authenticated:
+            return enqueue_generation_job(spec)
+
+        ai_response, cached, removed = run_generation(spec)
+        return jsonify({"status": "success", "ai_response": ai_response, "cached": cached,
+                        "duplicates_removed": removed, "input_tokens": spec.get('input_tokens')})
+
+    except GenerationInputError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+    except llm.LLMBusyError as e:
+        return jsonify({"status": "error", "message": str(e)}), 503
     except Exception as e:
-        print(f"DEBUG: Exception in generate_questions: {e}")
-        import traceback
-        traceback.print_exc()
-        logging.error(f"Error generating questions: {e}")
+        logging.exception(f"Error generating questions: {e}")
         return jsonify({"status": "error", "message": f"Failed to generate questions: {str(e)}"}), 500
 
-@app.route('/save-question', methods=['POST'])
+@bp.route('/generate-questions/stream', methods=['POST'])
+def generate_questions_stream():
+    # Same input as /generate-questions, answered as NDJSON: stage events, one line per
+    # validated question as soon as Gemini finishes writing it, then a done (or error) line
+    try:
+        spec = parse_generation_request()
+    except (ValueError, GenerationInputError) as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+
+    def events():
+        try:
+            with generation_span(spec['kind']) as stage:
+                yield {"type": "stage", "stage": "extracting"}
+                user_input = extract_input(spec)
+                if not user_input:
+                    raise GenerationInputError("No input provided")
+                stage['characters'] = len(user_input)
+                user_input = condense_input(spec, user_input)
+
+                yield {"type": "stage", "stage": "generating"}
+                if spec['chunked']:
+                    # Chunks are merged at the end, so there is nothing to stream before that
+                    total = spec['question_count'] or current_app.config['DEFAULT_QUESTION_COUNT']
+                    ai_response, cached = generate_chunked(user_input, total, fresh=spec['fresh'])
+                    generated = [{"type": "question", **question} for question in parse_questions(ai_response)]
+                    generated.append({"type": "done", "count": len(generated), "rejected": 0, "cached": cached})
+                else:
+                    generated = stream_generation(user_input, fresh=spec['fresh'], prompt=question_prompt(spec['question_count']))
+
+                # Questions the user has already saved are dropped as they arrive
+                sent = []
+                removed = 0
+                for event in generated:
+                    if event["type"] == "done":
+                        done = {**event, "count": event["count"] - removed, "duplicates_removed": removed,
+                                "input_tokens": spec.get('input_tokens')}
+                        continue
+                    if spec['user_id']:
+                        fingerprint = parsed_fingerprint(event)
+                        if find_similar_questions(spec['user_id'], [fingerprint], earlier=sent)[0]:
+                            removed += 1
+                            continue
+                        sent.append(fingerprint)
+                    yield event
+                if done["cached"]:
+                    stage['outcome'] = 'cached'
+            yield done
+        except GenerationInputError as e:
+            yield {"type": "error", "message": str(e)}
+        except Exception as e:
+            logging.error(f"Error streaming questions: {e}")
+            yield {"type": "error", "message": f"Failed to generate questions: {str(e)}"}
+
+    def ndjson():
+        for event in events():
+            yield json.dumps(event) + "\n"
+
+    response = Response(stream_with_context(ndjson()), mimetype='application/x-ndjson',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    # Also covers a client that disconnects before extraction starts
+    response.call_on_close(lambda: close_upload(spec))
+    return response
+
+# ============ GENERATION JOBS ============
+
+JOB_FINISHED_STAGES = ('done', 'failed')
+JOB_INTERRUPTED_MESSAGE = "The server restarted before this job finished, please try again"
+
+def run_generation_job(app, job_id, spec):
+    # Runs on a job worker thread
+    with app.app_context():
+        try:
+            def progress(stage):
+                update_generation_job(job_id, status=stage)
+
+            try:
+                ai_response, cached, _ = run_generation(spec, progress)
+                update_generation_job(job_id, status='done', ai_response=ai_response, cached=cached)
+            except Exception as e:
+                db.session.rollback()
+                logging.error(f"Generation job {job_id} failed: {e}")
+                message = str(e) if isinstance(e, GenerationInputError) else f"Failed to generate questions: {str(e)}"
+                update_generation_job(job_id, status='failed', error=message)
+        finally:
+            db.session.remove()
+
+def update_generation_job(job_id, **fields):
+    fields['updated_at'] = datetime.utcnow()
+    GenerationJob.query.filter_by(id=job_id).update(fields)
+    timed_commit()
+
+def job_stale_cutoff():
+    # Runners touch their unfinished jobs every JOB_HEARTBEAT_SECONDS (see jobs.JobRunner);
+    # three missed beats mean the process running the job is gone
+    return datetime.utcnow() - timedelta(seconds=3 * current_app.config['JOB_HEARTBEAT_SECONDS'])
+
+def fail_interrupted_jobs(job_id=None):
+    # Fail unfinished jobs nobody is running any more, so pollers and event streams stop
+    # waiting on them. Returns how many were failed.
+    query = GenerationJob.query.filter(GenerationJob.status.notin_(JOB_FINISHED_STAGES),
+                                       GenerationJob.updated_at < job_stale_cutoff())
+    if job_id is not None:
+        query = query.filter(GenerationJob.id == job_id)
+    failed = query.update({'status': 'failed', 'error': JOB_INTERRUPTED_MESSAGE, 'updated_at': datetime.utcnow()},
+                          synchronize_session=False)
+    db.session.commit()
+    return failed
+
+def recover_generation_jobs(app):
+    # Runs when a process's job runner starts: jobs left behind by a crashed or restarted worker
+    with app.app_context():
+        try:
+            failed = fail_interrupted_jobs()
+            if failed:
+                logging.warning(f"Marked {failed} interrupted generation jobs as failed")
+        finally:
+            db.session.remove()
+
+def touch_generation_jobs(app, job_ids):
+    # Runner heartbeat: these jobs are still queued or running in this process
+    with app.app_context():
+        try:
+            GenerationJob.query.filter(GenerationJob.id.in_(job_ids), GenerationJob.status.notin_(JOB_FINISHED_STAGES)) \
+                .update({'updated_at': datetime.utcnow()}, synchronize_session=False)
+            db.session.commit()
+        finally:
+            db.session.remove()
+
+def enqueue_generation_job(spec):
+    # Old jobs are only kept long enough for their owner to pick the result up
+    cutoff = datetime.utcnow() - timedelta(seconds=current_app.config['JOB_RETENTION_SECONDS'])
+    GenerationJob.query.filter(GenerationJob.created_at < cutoff).delete(synchronize_session=False)
+
+    job = GenerationJob(id=uuid.uuid4().hex, user_id=current_user.id)
+    db.session.add(job)
+    db.session.commit()
+
+    if not current_app.extensions['generation_jobs'].submit(job.id, spec):
+        close_upload(spec)
+        update_generation_job(job.id, status='failed', error="Server is busy, please try again shortly")
+        return jsonify({"status": "error", "message": "Server is busy, please try again shortly"}), 503
+
+    return jsonify({
+        "status": "queued",
+        "job_id": job.id,
+        "status_url": url_for('main.job_status', job_id=job.id),
+        "events_url": url_for('main.job_events', job_id=job.id)
+    }), 202
+
+def serialize_job(job):
+    data = {"job_id": job.id, "stage": job.status}
+    if job.status == 'done':
+        data.update({"status": "success", "ai_response": job.ai_response, "cached": job.cached})
+    elif job.status == 'failed':
+        data.update({"status": "error", "message": job.error})
+    else:
+        data["status"] = "pending"
+    return data
+
+def owned_generation_job(job_id):
+    # The job if the signed-in user started it, else None; both cases answer 404
+    job = db.session.get(GenerationJob, job_id)
+    return job if job is not None and job.user_id == current_user.id else None
+
+def check_interrupted(job):
+    # An unfinished job whose runner went quiet is failed now rather than at the client's timeout
+    if job.status not in JOB_FINISHED_STAGES and job.updated_at < job_stale_cutoff() and fail_interrupted_jobs(job.id):
+        db.session.refresh(job)
+    return job
+
+@bp.route('/jobs/<job_id>')
+@login_required
+def job_status(job_id):
+    job = owned_generation_job(job_id)
+    if job is None:
+        return jsonify({"status": "error", "message": "Job not found"}), 404
+    return jsonify(serialize_job(check_interrupted(job)))
+
+@bp.route('/jobs/<job_id>/events')
+@login_required
+def job_events(job_id):
+    # Server-Sent Events stream of stage changes, closed once the job finishes
+    if owned_generation_job(job_id) is None:
+        return jsonify({"status": "error", "message": "Job not found"}), 404
+
+    def stream():
+        last_stage = None
+        waited = 0.0
+        poll = current_app.config['JOB_EVENTS_POLL_SECONDS']
+        while waited < current_app.config['JOB_EVENTS_TIMEOUT_SECONDS']:
+            job = db.session.get(GenerationJob, job_id, populate_existing=True)
+            if job is not None:
+                check_interrupted(job)
+            db.session.commit()
+            if job is None:
+                break
+            if job.status != last_stage:
+                last_stage = job.status
+                yield f"event: {job.status}\ndata: {json.dumps(serialize_job(job))}\n\n"
+                if job.status in JOB_FINISHED_STAGES:
+                    return
+            else:
+                yield ": keep-alive\n\n"
+            time.sleep(poll)
+            waited += poll
+        yield "event: timeout\ndata: {}\n\n"
+
+    return Response(stream_with_context(stream()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@bp.route('/api/extraction-cache/stats')
+def extraction_cache_stats_api():
+    # Hit/miss counters for this worker plus totals for the shared cache table
+    require_metrics_access()
+    with extraction_cache_lock:
+        stats = dict(extraction_cache_stats)
+    lookups = stats['hits'] + stats['misses']
+    entries, total_bytes, total_hits = db.session.query(
+        db.func.count(ExtractionCache.id),
+        db.func.coalesce(db.func.sum(ExtractionCache.size_bytes), 0),
+        db.func.coalesce(db.func.sum(ExtractionCache.hit_count), 0)
+    ).one()
+
+    return jsonify({
+        "hits": stats['hits'],
+        "misses": stats['misses'],
+        "hit_ratio": round(stats['hits'] / lookups, 4) if lookups else 0.0,
+        "seconds_saved": round(stats['seconds_saved'], 3),
+        "entries": entries,
+        "total_bytes": total_bytes,
+        "max_bytes": current_app.config['EXTRACTION_CACHE_MAX_BYTES'],
+        "total_hits": total_hits
+    })
+
+@bp.route('/api/generation-cache/stats')
+def generation_cache_stats_api():
+    # Hit/miss counters for this worker plus totals for the shared cache table
+    require_metrics_access()
+    with generation_cache_lock:
+        stats = dict(generation_cache_stats)
+    lookups = stats['hits'] + stats['misses']
+    entries, total_hits = db.session.query(
+        db.func.count(GenerationCache.id),
+        db.func.coalesce(db.func.sum(GenerationCache.hit_count), 0)
+    ).one()
+
+    return jsonify({
+        "hits": stats['hits'],
+        "misses": stats['misses'],
+        "hit_ratio": round(stats['hits'] / lookups, 4) if lookups else 0.0,
+        "entries": entries,
+        "max_entries": current_app.config['GENERATION_CACHE_MAX_ENTRIES'],
+        "ttl_seconds": current_app.config['GENERATION_CACHE_TTL_SECONDS'],
+        "total_hits": total_hits
+    })
+
+# ============ DUPLICATE DETECTION ============
+
+def question_fingerprint(question_text, correct_answer):
+    return dedup.fingerprint(question_text, correct_answer)
+
+def row_fingerprint(row):
+    # Question column values (as built by question_row) -> fingerprint
+    return question_fingerprint(row['question_text'], row['option_' + row['correct_answer'].lower()])
+
+def parsed_fingerprint(question):
+    # {"question", "answers", "correct_index"} -> fingerprint
+    return question_fingerprint(question['question'], question['answers'][question['correct_index']])
+
+def band_rows(user_id, question_id, bucket_keys):
+    return [{"question_id": question_id, "band": band, "user_id": user_id, "bucket": bucket}
+            for band, bucket in enumerate(bucket_keys)]
+
+def find_similar_questions(user_id, fingerprints, earlier=()):
+    # For each fingerprint: the closest match at or above DUPLICATE_THRESHOLD among user_id's saved
+    # questions ({"question_id", "quiz_id", "similarity"}), or among the fingerprints before it and
+    # in earlier ({"position", "similarity"}; 1-based positions, earlier ones first), else None.
+    # One indexed query fetches every saved question sharing a bucket with any of them.
+    threshold = current_app.config['DUPLICATE_THRESHOLD']
+    if not threshold or not fingerprints:
+        return [None] * len(fingerprints)
+
+    wanted = {bucket for _, bucket_keys in fingerprints for bucket in bucket_keys}
+    buckets = {}
+    saved = {}
+    if wanted:
+        candidates = db.session.execute(
+            db.select(QuestionBand.bucket, Question.id, Question.quiz_id, Question.question_text,
+                      Question.option_a, Question.option_b, Question.option_c, Question.option_d,
+                      Question.correct_answer)
+            .join(Question, Question.id == QuestionBand.question_id)
+            .where(QuestionBand.user_id == user_id, QuestionBand.bucket.in_(wanted))
+        ).mappings()
+        for row in candidates:
+            buckets.setdefault(row['bucket'], set()).add(row['id'])
+            if row['id'] not in saved:
+                saved[row['id']] = (row['quiz_id'], row_fingerprint(row)[0])
+
+    previous = list(earlier)
+    matches = []
+    for shingles, bucket_keys in fingerprints:
+        best = None
+        candidate_ids = set().union(*(buckets.get(bucket, ()) for bucket in bucket_keys))
+        for question_id in candidate_ids:
+            quiz_id, other = saved[question_id]
+            similarity = dedup.jaccard(shingles, other)
+            if similarity >= threshold and (best is None or similarity > best['similarity']):
+                best = {"question_id": question_id, "quiz_id": quiz_id, "similarity": round(similarity, 3)}
+        if best is None:
+            for position, (other, _) in enumerate(previous, start=1):
+                similarity = dedup.jaccard(shingles, other)
+                if similarity >= threshold and (best is None or similarity > best['similarity']):
+                    best = {"position": position, "similarity": round(similarity, 3)}
+        matches.append(best)
+        previous.append((shingles, bucket_keys))
+    return matches
+
+def drop_known_questions(user_id, ai_response):
+    # Remove generated questions user_id already has (or that repeat each other).
+    # Returns (ai_response, number removed); the response is untouched when nothing matched.
+    questions = parse_questions(ai_response)
+    if not questions:
+        return ai_response, 0
+    matches = find_similar_questions(user_id, [parsed_fingerprint(question) for question in questions])
+    kept = [question for question, match in zip(questions, matches) if match is None]
+    removed = len(questions) - len(kept)
+    if not removed:
+        return ai_response, 0
+    return format_questions(kept), removed
+
+def backfill_question_bands():
+    # Index questions saved before the near-duplicate index existed
+    missing = db.session.execute(
+        db.select(Question.id, Quiz.user_id, Question.question_text, Question.option_a, Question.option_b,
+                  Question.option_c, Question.option_d, Question.correct_answer)
+        .join(Quiz, Quiz.id == Question.quiz_id)
+        .where(~db.exists().where(QuestionBand.question_id == Question.id))
+    ).mappings().all()
+    if not missing:
+        return
+    logging.info(f"Indexing {len(missing)} questions for duplicate detection")
+    rows = []
+    for row in missing:
+        rows.extend(band_rows(row['user_id'], row['id'], row_fingerprint(row)[1]))
+    for start in range(0, len(rows), 5000):
+        db.session.execute(db.insert(QuestionBand), rows[start:start + 5000])
+    db.session.commit()
+
+# ============ SEARCH ============
+
+def search_backend():
+    # FTS5 on SQLite, tsvector on Postgres (see search.py); None without full-text support
+    return search.backend_for(db.engine.dialect.name)
+
+def quiz_document(quiz):
+    return {"doc_id": search.quiz_doc_id(quiz.id), "user_id": quiz.user_id,
+            "title": quiz.title, "question": "", "options": ""}
+
+def question_document(question_id, user_id, row):
+    # row holds Question column values, as built by question_row
+    options = " ".join(row[f'option_{letter}'] for letter in 'abcd')
+    return {"doc_id": search.question_doc_id(question_id), "user_id": user_id,
+            "title": "", "question": row['question_text'], "options": options}
+
+def index_search_documents(documents):
+    # Written in the caller's transaction, so the index commits (or rolls back) with the rows
+    backend = search_backend()
+    if backend and documents:
+        backend.add(db.session, documents)
+
+def remove_search_documents(doc_ids):
+    backend = search_backend()
+    if backend and doc_ids:
+        backend.remove(db.session, doc_ids)
+
+def drop_search_index():
+    # The index is not a model table, so db.drop_all() leaves it (and its stale documents) behind
+    backend = search_backend()
+    if backend is not None:
+        backend.drop(db.session)
+        db.session.commit()
+
+def backfill_search_index():
+    # Create the index, then fill it if it is empty: new databases, and quizzes saved before search existed
+    backend = search_backend()
+    if backend is None:
+        return
+    backend.create(db.session)
+    db.session.commit()
+    if not backend.is_empty(db.session) or not Quiz.query.first():
+        return
+
+    logging.info("Building the search index")
+    quizzes = db.session.execute(db.select(Quiz.id, Quiz.user_id, Quiz.title)).all()
+    index_search_documents([quiz_document(quiz) for quiz in quizzes])
+    batch = []
+    questions = db.session.execute(
+        db.select(Question.id, Quiz.user_id, Question.question_text, Question.option_a, Question.option_b,
+                  Question.option_c, Question.option_d)
+        .join(Quiz, Quiz.id == Question.quiz_id)
+        .execution_options(yield_per=5000)
+    ).mappings()
+    for row in questions:
+        batch.append(question_document(row['id'], row['user_id'], row))
+        if len(batch) >= 5000:
+            index_search_documents(batch)
+            batch = []
+    index_search_documents(batch)
+    db.session.commit()
+
+@bp.route('/api/search')
+@login_required
+def search_library():
+    # ?q=<words>&page=<1-based>&limit=: the user's quizzes (by title) and questions (by text and
+    # options) matching every word, the last one as a prefix, best match first
+    backend = search_backend()
+    if backend is None:
+        return jsonify({"status": "error", "message": "Search is not available on this database"}), 501
+
+    query = request.args.get('q', '')
+    page = max(1, request.args.get('page', 1, type=int))
+    limit = request.args.get('limit', type=int) or current_app.config['SEARCH_PAGE_SIZE']
+    limit = max(1, min(limit, current_app.config['SEARCH_MAX_PAGE_SIZE']))
+    terms = search.query_terms(query)
+    if not terms:
+        return jsonify({"query": query, "page": page, "has_more": False, "results": []})
+
+    hits = backend.search(db.session, current_user.id, terms, limit + 1, (page - 1) * limit)
+    has_more = len(hits) > limit
+    matches = [search.split_doc_id(doc_id) for doc_id, _ in hits[:limit]]
+
+    # The index only returns ids; the rows come from the tables (and owner is checked again)
+    question_ids = [row_id for kind, row_id in matches if kind == 'question']
+    quiz_ids = [row_id for kind, row_id in matches if kind == 'quiz']
+    questions = {}
+    if question_ids:
+        rows = db.session.execute(
+            db.select(Question, Quiz.title).join(Quiz, Quiz.id == Question.quiz_id)
+            .where(Question.id.in_(question_ids), Quiz.user_id == current_user.id)
+        )
+        questions = {question.id: (question, title) for question, title in rows}
+    quizzes = {}
+    if quiz_ids:
+        quizzes = {quiz.id: quiz for quiz in Quiz.query.filter(Quiz.id.in_(quiz_ids), Quiz.user_id == current_user.id)}
+
+    results = []
+    for kind, row_id in matches:
+        if kind == 'quiz' and row_id in quizzes:
+            results.append({"type": "quiz", "quiz_id": row_id, "title": quizzes[row_id].title})
+        elif kind == 'question' and row_id in questions:
+            question, title = questions[row_id]
+            results.append({
+                "type": "question",
+                "question_id": question.id,
+                "quiz_id": question.quiz_id,
+                "quiz_title": title,
+                "question_text": question.question_text,
+                "options": [question.option_a, question.option_b, question.option_c, question.option_d]
+            })
+    return jsonify({"query": query, "page": page, "has_more": has_more, "results": results})
+
+# ============ SAVING QUESTIONS ============
+
+def owned_quiz_id(quiz_id):
+    # The quiz questions should go into: quiz_id if current_user owns it, else None. Without a
+    # quiz_id the user's "My Questions" quiz is used, created on first save.
+    if quiz_id:
+        return db.session.scalar(db.select(Quiz.id).filter_by(id=quiz_id, user_id=current_user.id))
+
+    default_quiz = Quiz.query.filter_by(user_id=current_user.id, title='My Questions').first()
+    if not default_quiz:
+        default_quiz = Quiz(title='My Questions', user_id=current_user.id)
+        db.session.add(default_quiz)
+        db.session.flush()
+        index_search_documents([quiz_document(default_quiz)])
+    return default_quiz.id
+
+def question_row(quiz_id, item):
+    # Column values for one {"question", "answers", "correct_index"} payload, or None if malformed
+    if not isinstance(item, dict):
+        return None
+    question_text = item.get('question')
+    answers = item.get('answers')
+    correct_index = item.get('correct_index')
+    if not isinstance(question_text, str) or not question_text.strip():
+        return None
+    if not isinstance(answers, list) or len(answers) != 4:
+        return None
+    if not all(isinstance(answer, str) and answer.strip() and len(answer) <= 200 for answer in answers):
+        return None
+    if not isinstance(correct_index, int) or isinstance(correct_index, bool) or not 0 <= correct_index <= 3:
+        return None
+    return {
+        "quiz_id": quiz_id,
+        "question_text": question_text.strip(),
+        "option_a": answers[0],
+        "option_b": answers[1],
+        "option_c": answers[2],
+        "option_d": answers[3],
+        "correct_answer": chr(65 + correct_index)  # Convert 0,1,2,3 to A,B,C,D
+    }
+
+def insert_questions(user_id, rows, fingerprints):
+    # Insert validated question rows with their near-duplicate buckets and search documents;
+    # the caller commits. Returns the new question ids in row order.
+    # A single multi-row INSERT ... RETURNING. Rows get ascending ids in VALUES order, so sorting
+    # the returned ids lines them up with the request (sort_by_parameter_order would make
+    # SQLAlchemy fall back to one INSERT per row on SQLite).
+    result = db.session.execute(db.insert(Question).returning(Question.id), rows)
+    question_ids = sorted(result.scalars())
+    bands = [band for question_id, (_, bucket_keys) in zip(question_ids, fingerprints)
+             for band in band_rows(user_id, question_id, bucket_keys)]
+    if bands:
+        db.session.execute(db.insert(QuestionBand), bands)
+    index_search_documents([question_document(question_id, user_id, row)
+                            for question_id, row in zip(question_ids, rows)])
+    return question_ids
+
+def save_question_batch(quiz_id, items):
+    # Validate, check ownership once, then one multi-row INSERT and one commit.
+    # Returns (response, status code).
+    if not isinstance(items, list) or not items:
+        return {"status": "error", "message": "No questions to save"}, 400
+    if len(items) > current_app.config['SAVE_QUESTIONS_MAX_BATCH']:
+        return {"status": "error", "message": f"At most {current_app.config['SAVE_QUESTIONS_MAX_BATCH']} questions can be saved at once"}, 400
+
+    target_id = owned_quiz_id(quiz_id)
+    if target_id is None:
+        return {"status": "error", "message": "Quiz not found"}, 404
+
+    rows = [question_row(target_id, item) for item in items]
+    invalid = [index for index, row in enumerate(rows) if row is None]
+    if invalid:
+        db.session.rollback()
+        return {"status": "error", "message": f"Invalid question at position {invalid[0] + 1}"}, 400
+
+    # Near-duplicates are saved anyway but reported, so the user can decide what to keep
+    fingerprints = [row_fingerprint(row) for row in rows]
+    matches = find_similar_questions(current_user.id, fingerprints)
+
+    question_ids = insert_questions(current_user.id, rows, fingerprints)
+    bump_quiz_version(target_id)
+    timed_commit()
+
+    message = "Question saved!" if len(question_ids) == 1 else f"{len(question_ids)} questions saved!"
+    body = {"status": "success", "message": message, "quiz_id": target_id, "question_ids": question_ids}
+    duplicates = [{"position": index + 1, "similar_to": match}
+                  for index, match in enumerate(matches) if match is not None]
+    if duplicates:
+        body["duplicates"] = duplicates
+        body["warning"] = ("This question looks like one you already have" if len(items) == 1
+                           else f"{len(duplicates)} of these questions look like ones you already have")
+    return body, 200
+
+@bp.route('/save-question', methods=['POST'])
 @login_required
 def save_question():
-    # Save a selected question to user's default quiz
-    data = request.get_json()
-    quiz_id = data.get('quiz_id')
-    question_text = data.get('question')
-    answers = data.get('answers')
-    correct_index = data.get('correct_index')
-    
-    # Get or create user's default quiz
-    if not quiz_id:
-        default_quiz = Quiz.query.filter_by(user_id=current_user.id, title='My Questions').first()
-        if not default_quiz:
-            default_quiz = Quiz(title='My Questions', user_id=current_user.id)
-            db.session.add(default_quiz)
-            db.session.flush()
-        quiz_id = default_quiz.id
-    
-    # Create question
-    new_question = Question(
-        quiz_id=quiz_id,
-        question_text=question_text,
-        option_a=answers[0],
-        option_b=answers[1],
-        option_c=answers[2],
-        option_d=answers[3],
-        correct_answer=chr(65 + correct_index)  # Convert 0,1,2,3 to A,B,C,D
-    )
-    
-    db.session.add(new_question)
+    # Save a selected question to one of the user's quizzes, or their default quiz
+    data = request.get_json(silent=True) or {}
+    body, status = save_question_batch(data.get('quiz_id'), [data])
+    return jsonify(body), status
+
+@bp.route('/save-questions', methods=['POST'])
+@login_required
+def save_questions():
+    # Save a list of generated questions in a single transaction
+    data = request.get_json(silent=True) or {}
+    body, status = save_question_batch(data.get('quiz_id'), data.get('questions'))
+    return jsonify(body), status
+
+@bp.route('/jobs/<job_id>/save', methods=['POST'])
+@login_required
+def save_job_questions(job_id):
+    # Save every question from a finished generation job without sending them back from the browser
+    job = owned_generation_job(job_id)
+    if job is None:
+        return jsonify({"status": "error", "message": "Job not found"}), 404
+    if job.status != 'done':
+        return jsonify({"status": "error", "message": "Job has not finished"}), 409
+
+    data = request.get_json(silent=True) or {}
+    body, status = save_question_batch(data.get('quiz_id'), parse_questions(job.ai_response or ""))
+    return jsonify(body), status
+
+# ============ QUIZ BANK BUILDER ============
+
+def quiz_bank_title(path):
+    # "14a_Glaciers1_LectureSlides.pdf" -> "14a Glaciers1 LectureSlides"
+    return os.path.splitext(os.path.basename(path))[0].replace('_', ' ').strip()[:100] or "Quiz bank"
+
+def pooled_pdf_text(future, path):
+    # Text from an extraction submitted to the process pool; a broken pool falls back to in-process
+    try:
+        text, pages = future.result()
+        metrics.annotate(pages=pages)
+        return text
+    except Exception as e:
+        logging.warning(f"Pooled extraction of {path} failed ({e}), extracting in-process")
+        return extract_text_from_pdf(path)
+
+def generate_quiz_bank_file(app, source, extraction, question_count):
+    # Runs on a builder thread: extract (through the extraction cache), condense, generate.
+    # extraction is the process-pool future for an uncached PDF, else None.
+    with app.app_context():
+        try:
+            path = source['path']
+            kind = 'pdf' if source['file_type'] == 'pdf' else 'image'
+            with metrics.span('extract', kind=kind) as stage:
+                if kind == 'pdf':
+                    extract = partial(pooled_pdf_text, extraction, path) if extraction else partial(extract_text_from_pdf, path)
+                    text = extract_with_cache(source['content_hash'], pdf_extractor_version(), extract)
+                else:
+                    text = extract_with_cache(source['content_hash'], image_extractor_version(),
+                                              partial(extract_text_from_image, path))
+                stage['characters'] = len(text or '')
+            if not text:
+                raise GenerationInputError("No text could be extracted")
+            text = condense_input({'kind': kind, 'chunked': True}, text)
+            ai_response, _ = generate_chunked(text, question_count)
+            return ai_response
+        finally:
+            db.session.remove()
+
+def save_quiz_bank_file(user_id, source, ai_response):
+    # One quiz per source file, its questions in one multi-row INSERT. Questions the user already
+    # has (from earlier files too: saves run one at a time) are left out.
+    # Returns (quiz id or None when every question was a duplicate, questions saved, duplicates removed).
+    ai_response, removed = drop_known_questions(user_id, ai_response)
+    questions = parse_questions(ai_response)
+    if not questions:
+        if removed:
+            return None, 0, removed
+        raise GenerationInputError("No valid questions were generated")
+
+    quiz = Quiz(title=quiz_bank_title(source['path']), user_id=user_id)
+    db.session.add(quiz)
+    db.session.flush()
+    index_search_documents([quiz_document(quiz)])
+    rows = [row for row in (question_row(quiz.id, question) for question in questions) if row is not None]
+    question_ids = insert_questions(user_id, rows, [row_fingerprint(row) for row in rows])
+    timed_commit()
+    return quiz.id, len(question_ids), removed
+
+@bp.cli.command('build-quiz-bank')
+@click.argument('directory', type=click.Path(exists=True, file_okay=False))
+@click.option('--user', 'username', required=True, help="Owner of the generated quizzes")
+@click.option('--questions', 'question_count', type=click.IntRange(1), default=None,
+              help="Questions per file (default: DEFAULT_QUESTION_COUNT)")
+@click.option('--manifest', 'manifest_path', type=click.Path(dir_okay=False), default=None,
+              help="Build manifest (default: instance/quiz-bank-<user>.json)")
+@click.option('--workers', type=click.IntRange(1), default=None,
+              help="Extraction processes (default: EXTRACTION_WORKERS or the CPU count)")
+@click.option('--concurrency', type=click.IntRange(1), default=None,
+              help="Files generating at once (default: GENERATION_CONCURRENCY)")
+def build_quiz_bank_command(directory, username, question_count, manifest_path, workers, concurrency):
+    # flask --app app build-quiz-bank static/files --user alice: one quiz per PDF or image.
+    # PDFs are extracted in the process pool while earlier files are already generating; LLM
+    # calls also stay under the client's LLM_MAX_IN_FLIGHT cap. Rerun to resume.
+    import extraction
+
+    user = User.query.filter_by(username=username).first()
+    if user is None:
+        raise click.ClickException(f"No user named {username}")
+    config = current_app.config
+    question_count = question_count or config['DEFAULT_QUESTION_COUNT']
+    manifest = quiz_bank.Manifest(manifest_path or os.path.join(current_app.instance_path, f"quiz-bank-{username}.json"))
+
+    sources = quiz_bank.find_sources(directory)
+    pending = [source for source in sources if not manifest.is_done(source['content_hash'])]
+    click.echo(f"{len(sources)} files, {len(sources) - len(pending)} already built, {len(pending)} to build")
+    if not pending:
+        return
+
+    # Only PDFs without cached text go to the pool
+    pdf_hashes = [source['content_hash'] for source in pending if source['file_type'] == 'pdf']
+    cached = set(db.session.scalars(db.select(ExtractionCache.content_hash).where(
+        ExtractionCache.content_hash.in_(pdf_hashes),
+        ExtractionCache.extractor_version == pdf_extractor_version()
+    )))
     db.session.commit()
-    
-    return jsonify({"status": "success", "message": "Question saved!"})
+    pool = extraction.get_pool(workers or config['EXTRACTION_WORKERS'])
+    extractions = {
+        source['content_hash']: pool.submit(extraction.read_pdf_text, source['path'], max_chars=config['EXTRACTION_MAX_CHARS'])
+        for source in pending if source['file_type'] == 'pdf' and source['content_hash'] not in cached
+    }
+
+    app = current_app._get_current_object()
+    started = time.perf_counter()
+    failed = 0
+    with ThreadPoolExecutor(max_workers=concurrency or config['GENERATION_CONCURRENCY']) as threads:
+        running = {
+            threads.submit(generate_quiz_bank_file, app, source, extractions.get(source['content_hash']), question_count): source
+            for source in pending
+        }
+        try:
+            for number, future in enumerate(as_completed(running), 1):
+                source = running[future]
+                name = os.path.basename(source['path'])
+                try:
+                    quiz_id, saved, removed = save_quiz_bank_file(user.id, source, future.result())
+                except Exception as e:
+                    db.session.rollback()
+                    failed += 1
+                    manifest.record(source['content_hash'], path=source['path'], status='failed', error=str(e))
+                    click.echo(f"[{number}/{len(pending)}] failed {name}: {e}", err=True)
+                    continue
+                manifest.record(source['content_hash'], path=source['path'], status='done', quiz_id=quiz_id,
+                                questions=saved, duplicates_removed=removed)
+                if quiz_id is None:
+                    click.echo(f"[{number}/{len(pending)}] {name}: every question is already in the bank")
+                else:
+                    click.echo(f"[{number}/{len(pending)}] {name}: {saved} questions (quiz {quiz_id}), {removed} duplicates left out")
+        finally:
+            # Interrupted: drop work nobody will save; the manifest already has every finished file
+            for future in list(running) + list(extractions.values()):
+                future.cancel()
+
+    click.echo(f"Built {len(pending) - failed} of {len(pending)} files in {time.perf_counter() - started:.1f}s")
+    if failed:
+        raise SystemExit(1)
+
+# ============ METRICS ============
+
+def require_metrics_access():
+    # /metrics and the cache stats endpoints: hidden when metrics are off, and behind
+    # METRICS_TOKEN when one is set
+    if not current_app.config['METRICS_ENABLED']:
+        abort(404)
+    token = current_app.config['METRICS_TOKEN']
+    if token and not hmac.compare_digest(request.headers.get('Authorization', ''), f"Bearer {token}"):
+        abort(401)
+
+@bp.route('/metrics')
+def metrics_endpoint():
+    # Prometheus text format for this worker: request latency, generation stage timings and
+    # outcomes. Stages: upload, extract, condense, prompt, llm, db_commit and total per generation.
+    require_metrics_access()
+    metrics.JOB_QUEUE_DEPTH.set(current_app.extensions['generation_jobs'].pending())
+    return Response(metrics.REGISTRY.render(), mimetype='text/plain; version=0.0.4')
 
 # ============ LEGACY ROUTE (for backward compatibility) ============
 
-@app.route("/upload", methods=["POST", "GET"])
+@bp.route("/upload", methods=["POST", "GET"])
 def upload():
-    # Redirect old upload route to generate-questions API
+    # Redirect old upload route to generate-questions API (always synchronous)
     if request.method == "POST":
-        return generate_questions()
-    return redirect(url_for('index'))
+        return handle_generation(allow_jobs=False)
+    return redirect(url_for('main.index'))
+
+# ============ APP FACTORY ============
+
+@bp.cli.command('init-db')
+def init_db_command():
+    # flask --app app init-db: run once per deploy, before the web workers start
+    init_db()
+    click.echo("Database is up to date")
+
+def create_single_flight(app):
+    # The lease file is only opened on first use, so starting a worker touches nothing on disk
+    mode = app.config['SINGLE_FLIGHT']
+    if mode == 'off':
+        return None
+    store = None
+    if mode == 'host':
+        store = LeaseStore(app.config['SINGLE_FLIGHT_STORE'] or os.path.join(app.instance_path, 'singleflight.db'),
+                           lease_seconds=app.config['SINGLE_FLIGHT_LEASE_SECONDS'])
+    return SingleFlight(store, reraise=(llm.LLMBusyError, GenerationInputError))
+
+class SpooledUploadRequest(Request):
+    # Werkzeug spools uploaded files itself, 500 KB in memory at most; hold UPLOAD_SPOOL_MAX_BYTES
+    # instead so its stream can be used as is (see uploads.spool_upload)
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return tempfile.SpooledTemporaryFile(max_size=current_app.config['UPLOAD_SPOOL_MAX_BYTES'], mode='rb+')
+
+def create_app(overrides=None):
+    # gunicorn "app:create_app()"; overrides replace settings from the environment (e.g. in tests)
+    app = Flask(__name__)
+    app.request_class = SpooledUploadRequest
+    load_config(app, overrides)
+    configure_logging(app.config['LOG_LEVEL'], app.config['LOG_FORMAT'])
+
+    db.init_app(app)
+    login_manager.init_app(app)
+    app.register_blueprint(bp, cli_group=None)
+
+    app.extensions['quiz_payload_cache'] = LRUCache(app.config['QUIZ_CACHE_MAX_ENTRIES'])
+    app.extensions['llm_client'] = None  # see llm_client()
+    app.extensions['single_flight'] = create_single_flight(app)
+    app.extensions['generation_jobs'] = JobRunner(
+        partial(run_generation_job, app),
+        workers=app.config['JOB_WORKERS'],
+        max_queue=app.config['JOB_QUEUE_SIZE'],
+        recover=partial(recover_generation_jobs, app),
+        heartbeat=partial(touch_generation_jobs, app),
+        heartbeat_seconds=app.config['JOB_HEARTBEAT_SECONDS']
+    )
+    return app
 
 if __name__ == "__main__":
+    app = create_app()
     # Create tables if they don't exist
     with app.app_context():
-        db.create_all()
+        init_db()
     
     # Run in development mode
     port = int(os.environ.get('PORT', 5000))
-    app.run(host='0.0.0.0', port=port, debug=os.getenv('FLASK_ENV') == 'development')
\ No newline at end of file
+    app.run(host='0.0.0.0', port=port, debug=os.getenv('FLASK_ENV') == 'development')
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Measure how long a fresh worker takes to import app.py and build the app (python -X importtime).
+
+Usage: python benchmarks/bench_import_time.py [--repeat N] [--top N] [--max-ms MS] [--output results.json]
+
+Exits non-zero when a module that should load on first use is imported at startup, or when the
+median startup time exceeds --max-ms.
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+from results import write_results
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Heavy modules that must stay out of worker startup
+LAZY_MODULES = ('pypdf', 'PIL', 'pytesseract', 'numpy', 'google.generativeai', 'extraction', 'ocr', 'item_analysis')
+
+STARTUP = "import app; app.create_app()"
+
+def import_profile():
+    # One cold interpreter: returns ({module: (self us, cumulative us)}, total us for app)
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE='1')
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', STARTUP],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True
+    )
+    modules = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        modules[name.strip()] = (int(self_us), int(cumulative_us))
+    return modules, modules.get('app', (0, 0))[1]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--top', type=int, default=15)
+    parser.add_argument('--max-ms', type=float, default=0, help="fail above this median (0 = no limit)")
+    parser.add_argument('--output', help="write JSON results to this path ('-' for stdout)")
+    args = parser.parse_args()
+
+    totals = []
+    for _ in range(args.repeat):
+        modules, total_us = import_profile()
+        totals.append(total_us / 1000)
+    median_ms = statistics.median(totals)
+
+    print(f"import app: median {median_ms:.1f} ms, min {min(totals):.1f} ms over {args.repeat} runs")
+    print(f"\n{'module':<50} {'self ms':>9} {'cumul ms':>9}")
+    slowest = sorted(modules.items(), key=lambda item: item[1][0], reverse=True)[:args.top]
+    for name, (self_us, cumulative_us) in slowest:
+        print(f"{name:<50} {self_us / 1000:>9.1f} {cumulative_us / 1000:>9.1f}")
+
+    if args.output:
+        results = {"startup": {"median_ms": round(median_ms, 1), "min_ms": round(min(totals), 1)},
+                   "eager_lazy_modules": [name for name in LAZY_MODULES if name in modules]}
+        write_results(args.output, "import_time", {"repeat": args.repeat}, results)
+
+    failed = False
+    eager = [name for name in LAZY_MODULES if name in modules]
+    if eager:
+        print(f"\nImported at startup but should load on first use: {', '.join(eager)}")
+        failed = True
+    if args.max_ms and median_ms > args.max_ms:
+        print(f"\nStartup {median_ms:.1f} ms is over the {args.max_ms:.1f} ms budget")
+        failed = True
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
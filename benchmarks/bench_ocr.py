@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Time OCR preprocessing and recognition over the images in the bundled corpus.
+
+Usage: python benchmarks/bench_ocr.py [--dir static/files] [--repeat N] [--output results.json]
+
+Recognition is skipped (and reported as such) when the tesseract binary is not installed.
+"""
+
+import argparse
+import glob
+import os
+import shutil
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image
+
+import ocr
+from results import write_results
+
+IMAGE_PATTERNS = ('*.png', '*.PNG', '*.jpg', '*.JPG', '*.jpeg', '*.JPEG')
+
+def best_time(fn, repeat):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+def preprocess(path):
+    with Image.open(path) as image:
+        return ocr.preprocess_image(image)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--dir', default='static/files')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', help="write JSON results to this path ('-' for stdout)")
+    args = parser.parse_args()
+
+    images = sorted({path for pattern in IMAGE_PATTERNS for path in glob.glob(os.path.join(args.dir, pattern))})
+    if not images:
+        print(f"No images found in {args.dir}")
+        return 1
+    recognise = ocr.pytesseract is not None and shutil.which('tesseract') is not None
+
+    print(f"{len(images)} images, best of {args.repeat}" + ("" if recognise else " (tesseract not installed: preprocessing only)"))
+    print(f"{'file':<35} {'pixels':>10} {'prep s':>8} {'ocr s':>8} {'chars':>7}")
+    results = {}
+    for path in images:
+        with Image.open(path) as image:
+            pixels = image.width * image.height
+        prep_seconds, prepared = best_time(lambda: preprocess(path), args.repeat)
+        row = {"pixels": pixels, "prepared_pixels": prepared.width * prepared.height,
+               "preprocess_seconds": round(prep_seconds, 4)}
+        if recognise:
+            ocr_seconds, text = best_time(lambda: ocr.image_to_text(path), args.repeat)
+            row.update({"ocr_seconds": round(ocr_seconds, 4), "chars": len(text.strip())})
+        results[os.path.basename(path)] = row
+        print(f"{os.path.basename(path):<35} {pixels:>10} {prep_seconds:>8.3f} "
+              f"{row.get('ocr_seconds', float('nan')):>8.3f} {row.get('chars', 0):>7}")
+
+    results["TOTAL"] = {
+        "preprocess_seconds": round(sum(row["preprocess_seconds"] for row in results.values()), 4)
+    }
+    if recognise:
+        results["TOTAL"]["ocr_seconds"] = round(sum(row["ocr_seconds"] for name, row in results.items() if name != "TOTAL"), 4)
+
+    if args.output:
+        write_results(args.output, "ocr", {"dir": args.dir, "repeat": args.repeat, "recognise": recognise}, results)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Compare serial and process-pool PDF text extraction over the bundled corpus.
+
+Usage: python benchmarks/bench_pdf_extraction.py [--dir static/files] [--workers N] [--batch-size N] [--repeat N]
+       [--output results.json]
+"""
+
+import argparse
+import glob
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from extraction import default_workers, get_pool, iter_pdf_pages, shutdown_pool
+from results import write_results
+
+def extract(pdf_path, parallel_min_pages, batch_size, workers):
+    pages = iter_pdf_pages(pdf_path, parallel_min_pages=parallel_min_pages, batch_size=batch_size, max_workers=workers)
+    return "\n".join(text for _, text in pages)
+
+def best_time(fn, repeat):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--dir', default='static/files')
+    parser.add_argument('--workers', type=int, default=default_workers())
+    parser.add_argument('--batch-size', type=int, default=2)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', help="write JSON results to this path ('-' for stdout)")
+    args = parser.parse_args()
+
+    pdfs = sorted(glob.glob(os.path.join(args.dir, '*.pdf')))
+    if not pdfs:
+        print(f"No PDFs found in {args.dir}")
+        return 1
+
+    # Start the workers up front so process spawn time is not charged to the first file
+    pool = get_pool(args.workers)
+    list(pool.map(abs, range(args.workers)))
+
+    print(f"{len(pdfs)} PDFs, {args.workers} workers, {args.batch_size} pages per batch, best of {args.repeat}")
+    print(f"{'file':<45} {'serial s':>9} {'pool s':>9} {'speedup':>8}")
+    serial_total = parallel_total = 0.0
+    results = {}
+    for pdf_path in pdfs:
+        serial, serial_text = best_time(lambda: extract(pdf_path, 0, args.batch_size, args.workers), args.repeat)
+        parallel, parallel_text = best_time(lambda: extract(pdf_path, 1, args.batch_size, args.workers), args.repeat)
+        if serial_text != parallel_text:
+            print(f"Output mismatch for {pdf_path}")
+            return 1
+        serial_total += serial
+        parallel_total += parallel
+        results[os.path.basename(pdf_path)] = {"serial_seconds": round(serial, 4), "pool_seconds": round(parallel, 4),
+                                               "speedup": round(serial / parallel, 3), "chars": len(serial_text)}
+        print(f"{os.path.basename(pdf_path):<45} {serial:>9.3f} {parallel:>9.3f} {serial / parallel:>7.2f}x")
+
+    print(f"{'TOTAL':<45} {serial_total:>9.3f} {parallel_total:>9.3f} {serial_total / parallel_total:>7.2f}x")
+    shutdown_pool()
+
+    results["TOTAL"] = {"serial_seconds": round(serial_total, 4), "pool_seconds": round(parallel_total, 4),
+                        "speedup": round(serial_total / parallel_total, 3)}
+    if args.output:
+        params = {"dir": args.dir, "workers": args.workers, "batch_size": args.batch_size, "repeat": args.repeat}
+        write_results(args.output, "pdf_extraction", params, results)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Measure how many concurrent generations one gunicorn worker sustains with each worker class.
+
+Usage: python benchmarks/bench_serving.py [--modes sync,gthread,gevent] [--concurrency 1,8,32,128,256]
+       [--stub-latency S] [--rounds N] [--threads N] [--output results.json]
+
+Each mode gets one gunicorn worker, configured through gunicorn.conf.py, on a scratch SQLite
+database with the stub LLM provider and no rate limit or in-flight cap. N clients each post
+--rounds pieces of distinct study material to /generate-questions, so every request calls the
+stub. concurrent_generations is throughput x stub latency, the number of LLM calls in flight on
+average. A level counts as sustained when nothing failed and the median latency stays within
+1.5x the stub latency. Higher levels are skipped for a mode once it stops keeping up.
+"""
+
+import argparse
+import http.client
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from results import ROOT, summarize_latencies, write_results
+
+MODES = ('sync', 'gthread', 'gevent')
+MATERIAL = "Glaciers carve valleys while rivers deposit sediment across wide floodplains. " * 25
+
+def free_port():
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        return probe.getsockname()[1]
+
+def server_env(args, database, mode):
+    env = dict(os.environ)
+    env.update({
+        'DATABASE_URL': database,
+        'SINGLE_FLIGHT_STORE': os.path.join(os.path.dirname(database[len('sqlite:///'):]), 'leases.db'),
+        'WEB_WORKER_CLASS': mode,
+        'WEB_CONCURRENCY': '1',
+        # gunicorn runs a sync worker as gthread when it has more than one thread
+        'WEB_THREADS': str(args.threads) if mode == 'gthread' else '1',
+        'LLM_PROVIDER': 'stub',
+        'LLM_STUB_LATENCY_SECONDS': str(args.stub_latency),
+        'LLM_RATE_PER_SECOND': '0',
+        'LLM_MAX_IN_FLIGHT': '100000',
+        'LOG_LEVEL': 'WARNING',
+    })
+    return env
+
+class Server:
+    # One gunicorn worker for one mode, stopped on exit
+    def __init__(self, args, database, mode):
+        self.port = free_port()
+        self.process = subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', '--bind', f'127.0.0.1:{self.port}', 'app:create_app()'],
+            cwd=ROOT, env=server_env(args, database, mode)
+        )
+
+    def __enter__(self):
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"gunicorn exited with status {self.process.returncode}")
+            try:
+                connection = http.client.HTTPConnection('127.0.0.1', self.port, timeout=5)
+                connection.request('GET', '/login')
+                connection.getresponse().read()
+                connection.close()
+                return self
+            except OSError:
+                time.sleep(0.2)
+        self.__exit__()
+        raise RuntimeError("gunicorn did not start within 30s")
+
+    def __exit__(self, *exc_info):
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+
+def generate(port, text):
+    # A fresh connection per request: sync workers close every connection anyway
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=300)
+    try:
+        connection.request('POST', '/generate-questions', urllib.parse.urlencode({'study_material': text}),
+                           {'Content-Type': 'application/x-www-form-urlencoded'})
+        response = connection.getresponse()
+        response.read()
+        return response.status
+    finally:
+        connection.close()
+
+def run_level(port, label, clients, rounds):
+    latencies, errors = [], []
+    lock = threading.Lock()
+
+    def client(number):
+        for round_number in range(rounds):
+            # Distinct text per request so nothing is answered from the cache or shared
+            text = f"{label} client {number} round {round_number}. {MATERIAL}"
+            started = time.perf_counter()
+            try:
+                status = generate(port, text)
+            except (http.client.HTTPException, OSError):
+                status = None
+            elapsed = time.perf_counter() - started
+            with lock:
+                if status == 200:
+                    latencies.append(elapsed)
+                else:
+                    errors.append(status)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        list(pool.map(client, range(clients)))
+    return summarize_latencies(latencies, errors=len(errors), wall_seconds=time.perf_counter() - started)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--modes', default=','.join(MODES), help="comma-separated gunicorn worker classes")
+    parser.add_argument('--concurrency', default='1,8,32,128,256', help="comma-separated client counts")
+    parser.add_argument('--stub-latency', type=float, default=1.0, help="seconds per stub LLM call")
+    parser.add_argument('--rounds', type=int, default=3, help="requests per client at each level")
+    parser.add_argument('--threads', type=int, default=8, help="threads per gthread worker")
+    parser.add_argument('--output', help="write JSON results to this path ('-' for stdout)")
+    args = parser.parse_args()
+    modes = [mode.strip() for mode in args.modes.split(',') if mode.strip()]
+    levels = sorted(int(level) for level in args.concurrency.split(','))
+
+    scratch = tempfile.mkdtemp(prefix='bench-serving-')
+    database = 'sqlite:///' + os.path.join(scratch, 'serving.db')
+    results = {}
+    try:
+        subprocess.run([sys.executable, '-m', 'flask', '--app', 'app', 'init-db'], cwd=ROOT, check=True,
+                       env={**os.environ, 'DATABASE_URL': database}, stdout=subprocess.DEVNULL)
+
+        print(f"Stub latency {args.stub_latency}s, {args.rounds} requests per client, one worker per mode")
+        print(f"{'mode':<8} {'clients':>7} {'ok':>6} {'errors':>6} {'p50 ms':>9} {'p95 ms':>9} {'req/s':>8} {'in flight':>9}")
+        for mode in modes:
+            sustained = 0
+            with Server(args, database, mode) as server:
+                for clients in levels:
+                    summary = run_level(server.port, f"{mode}-{clients}", clients, args.rounds)
+                    summary['clients'] = clients
+                    summary['concurrent_generations'] = round(summary.get('throughput_rps', 0) * args.stub_latency, 1)
+                    results[f"{mode}/{clients}"] = summary
+                    print(f"{mode:<8} {clients:>7} {summary['requests'] - summary['errors']:>6} {summary['errors']:>6} "
+                          f"{summary.get('p50_ms', 0):>9.1f} {summary.get('p95_ms', 0):>9.1f} "
+                          f"{summary.get('throughput_rps', 0):>8.1f} {summary['concurrent_generations']:>9.1f}")
+                    if summary['errors'] or summary.get('p50_ms', 0) > args.stub_latency * 1500:
+                        break
+                    sustained = clients
+            results[mode] = {'max_sustained_clients': sustained}
+            print(f"{mode:<8} sustains {sustained or 'none'} of the tested client counts")
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+    if args.output:
+        params = {"modes": modes, "concurrency": levels, "stub_latency": args.stub_latency,
+                  "rounds": args.rounds, "threads": args.threads}
+        write_results(args.output, "serving", params, results)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Compare two benchmark result files and flag regressions.
+
+Usage: python benchmarks/compare.py baseline.json candidate.json [--threshold PERCENT]
+
+Times (*_ms, *_seconds) regress when they grow; throughput and speedups regress when they shrink.
+Exits 1 when any metric moves the wrong way by more than --threshold percent.
+"""
+
+import argparse
+import json
+import sys
+
+LOWER_IS_BETTER = ('_ms', '_seconds')
+HIGHER_IS_BETTER = ('_rps', 'speedup')
+
+def direction(metric):
+    if metric.endswith(LOWER_IS_BETTER):
+        return -1
+    if metric.endswith(HIGHER_IS_BETTER):
+        return 1
+    return 0  # counts and sizes are shown but never judged
+
+def load(path):
+    with open(path) as f:
+        return json.load(f)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('baseline')
+    parser.add_argument('candidate')
+    parser.add_argument('--threshold', type=float, default=10.0, help="allowed change in percent")
+    args = parser.parse_args()
+
+    baseline, candidate = load(args.baseline), load(args.candidate)
+    if baseline['benchmark'] != candidate['benchmark']:
+        print(f"Cannot compare {baseline['benchmark']} results with {candidate['benchmark']} results")
+        return 2
+    if baseline['params'] != candidate['params']:
+        print(f"Warning: parameters differ\n  {baseline['params']}\n  {candidate['params']}")
+
+    print(f"{baseline['benchmark']}: {baseline.get('commit')} -> {candidate.get('commit')}")
+    print(f"{'case':<30} {'metric':<20} {'baseline':>12} {'candidate':>12} {'change':>9}")
+    regressions = []
+    for case, metrics in baseline['results'].items():
+        if not isinstance(metrics, dict) or not isinstance(candidate['results'].get(case), dict):
+            continue
+        for metric, old in metrics.items():
+            new = candidate['results'][case].get(metric)
+            if not isinstance(old, (int, float)) or not isinstance(new, (int, float)):
+                continue
+            change = (new - old) / old * 100 if old else 0.0
+            worse = direction(metric) * change < -args.threshold
+            if worse:
+                regressions.append((case, metric))
+            print(f"{case:<30} {metric:<20} {old:>12.3f} {new:>12.3f} {change:>+8.1f}%" + ("  REGRESSION" if worse else ""))
+
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) beyond {args.threshold:.0f}%")
+        return 1
+    print(f"\nNo regressions beyond {args.threshold:.0f}%")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+Drive concurrent traffic at the main endpoints and report latency percentiles and throughput.
+
+Usage: python benchmarks/load_test.py [--database sqlite:///benchmarks/bench.db] [--url http://host:port]
+       [--scenario all|generate|api_quiz|submit|analytics] [--requests N] [--concurrency N]
+       [--stub-latency S] [--output results.json]
+
+Seed the database first with benchmarks/seed_db.py. Without --url the app is served in-process
+(threaded werkzeug, stub LLM provider); with --url the server under test must use the same data.
+"""
+
+import argparse
+import http.client
+import json
+import os
+import re
+import sys
+import threading
+import time
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from results import summarize_latencies, write_results
+from seed_db import DEFAULT_DATABASE, PASSWORD, username
+
+SCENARIOS = ('generate', 'api_quiz', 'submit', 'analytics')
+CSRF_FIELD = re.compile(r'name="csrf_token"[^>]*value="([^"]+)"')
+
+class Session:
+    # One keep-alive connection and cookie jar per worker thread, logged in as one seeded user
+
+    def __init__(self, base_url):
+        parts = urllib.parse.urlsplit(base_url)
+        self.host, self.port = parts.hostname, parts.port or 80
+        self.connection = http.client.HTTPConnection(self.host, self.port, timeout=120)
+        self.cookies = {}
+
+    def request(self, method, path, body=None, headers=None):
+        headers = dict(headers or {})
+        if self.cookies:
+            headers['Cookie'] = '; '.join(f"{name}={value}" for name, value in self.cookies.items())
+        try:
+            self.connection.request(method, path, body=body, headers=headers)
+            response = self.connection.getresponse()
+        except (http.client.HTTPException, OSError):
+            # The server closed the keep-alive connection; retry once on a fresh one
+            self.connection.close()
+            self.connection = http.client.HTTPConnection(self.host, self.port, timeout=120)
+            self.connection.request(method, path, body=body, headers=headers)
+            response = self.connection.getresponse()
+        data = response.read()
+        for header in response.headers.get_all('Set-Cookie') or []:
+            name, _, value = header.split(';', 1)[0].partition('=')
+            self.cookies[name.strip()] = value.strip()
+        return response.status, data
+
+    def post_form(self, path, fields):
+        return self.request('POST', path, urllib.parse.urlencode(fields),
+                            {'Content-Type': 'application/x-www-form-urlencoded'})
+
+    def post_json(self, path, payload):
+        return self.request('POST', path, json.dumps(payload), {'Content-Type': 'application/json'})
+
+    def login(self, name):
+        status, page = self.request('GET', '/login')
+        match = CSRF_FIELD.search(page.decode('utf-8', 'replace'))
+        fields = {'username': name, 'password': PASSWORD}
+        if match:
+            fields['csrf_token'] = match.group(1)
+        status, _ = self.post_form('/login', fields)
+        if status != 302:
+            raise RuntimeError(f"Login as {name} failed with HTTP {status}; is the database seeded?")
+
+class Worker:
+    def __init__(self, base_url, number):
+        self.session = Session(base_url)
+        self.session.login(username(number))
+        status, body = self.session.request('GET', '/api/quizzes')
+        self.quiz_ids = [quiz['id'] for quiz in json.loads(body) if quiz['question_count']] if status == 200 else []
+        if not self.quiz_ids:
+            raise RuntimeError(f"{username(number)} has no quizzes to load-test against")
+        self.question_counts = {}
+        self.calls = 0
+
+    def quiz_id(self):
+        self.calls += 1
+        return self.quiz_ids[self.calls % len(self.quiz_ids)]
+
+    def generate(self):
+        # Unique text per call so every request misses the generation cache
+        self.calls += 1
+        text = f"Load test material {threading.get_ident()}-{self.calls}. " + "Glaciers carve valleys over time. " * 20
+        return self.session.post_form('/generate-questions', {'study_material': text, 'question_count': 5})
+
+    def api_quiz(self):
+        return self.session.request('GET', f"/api/quiz/{self.quiz_id()}")
+
+    def submit(self):
+        quiz_id = self.quiz_id()
+        if quiz_id not in self.question_counts:
+            status, body = self.session.request('GET', f"/api/quiz/{quiz_id}")
+            self.question_counts[quiz_id] = len(json.loads(body)['questions']) if status == 200 else 0
+        answers = [self.calls % 4] * self.question_counts[quiz_id]
+        return self.session.post_json('/submit_quiz', {'quiz_id': quiz_id, 'answers': answers})
+
+    def analytics(self):
+        return self.session.request('GET', '/analytics')
+
+def run_scenario(workers, scenario, total_requests):
+    latencies, errors = [], []
+    lock = threading.Lock()
+    counter = iter(range(total_requests))
+
+    def drive(worker):
+        call = getattr(worker, scenario)
+        while True:
+            with lock:
+                if next(counter, None) is None:
+                    return
+            started = time.perf_counter()
+            try:
+                status, _ = call()
+            except (http.client.HTTPException, OSError):
+                status = None
+            elapsed = time.perf_counter() - started
+            with lock:
+                if status is not None and status < 400:
+                    latencies.append(elapsed)
+                else:
+                    errors.append(status)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=len(workers)) as pool:
+        list(pool.map(drive, workers))
+    return summarize_latencies(latencies, errors=len(errors), wall_seconds=time.perf_counter() - started)
+
+def serve_in_process(args):
+    from werkzeug.serving import WSGIRequestHandler, make_server
+
+    import app as quiz_app
+
+    app = quiz_app.create_app({
+        'SQLALCHEMY_DATABASE_URI': args.database,
+        'LLM_PROVIDER': 'stub',
+        'LLM_STUB_LATENCY_SECONDS': args.stub_latency,
+        'LLM_RATE_PER_SECOND': 0,
+    })
+    class QuietHandler(WSGIRequestHandler):
+        def log_request(self, *args, **kwargs):
+            pass
+
+    server = make_server('127.0.0.1', 0, app, threaded=True, request_handler=QuietHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--database', default=DEFAULT_DATABASE)
+    parser.add_argument('--url', help="load-test a running server instead of an in-process one")
+    parser.add_argument('--scenario', default='all', choices=('all',) + SCENARIOS)
+    parser.add_argument('--requests', type=int, default=500, help="requests per scenario")
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--stub-latency', type=float, default=0.2, help="seconds per stub LLM call (in-process only)")
+    parser.add_argument('--output', help="write JSON results to this path ('-' for stdout)")
+    args = parser.parse_args()
+
+    server = None
+    base_url = args.url
+    if not base_url:
+        server, base_url = serve_in_process(args)
+
+    scenarios = SCENARIOS if args.scenario == 'all' else (args.scenario,)
+    try:
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            workers = list(pool.map(lambda number: Worker(base_url, number), range(1, args.concurrency + 1)))
+
+        print(f"{base_url}: {args.requests} requests per scenario, {args.concurrency} concurrent users")
+        print(f"{'scenario':<12} {'ok':>6} {'errors':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'req/s':>8}")
+        results = {}
+        for scenario in scenarios:
+            summary = run_scenario(workers, scenario, args.requests)
+            results[scenario] = summary
+            print(f"{scenario:<12} {summary['requests'] - summary['errors']:>6} {summary['errors']:>6} "
+                  f"{summary.get('p50_ms', 0):>9.1f} {summary.get('p95_ms', 0):>9.1f} "
+                  f"{summary.get('p99_ms', 0):>9.1f} {summary.get('throughput_rps', 0):>8.1f}")
+    finally:
+        if server:
+            server.shutdown()
+
+    if args.output:
+        params = {"url": args.url, "database": None if args.url else args.database, "requests": args.requests,
+                  "concurrency": args.concurrency, "stub_latency": None if args.url else args.stub_latency}
+        write_results(args.output, "load_test", params, results)
+    return 1 if any(summary['errors'] for summary in results.values()) else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
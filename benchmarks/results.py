@@ -0,0 +1,59 @@
+"""
+Shared helpers for the benchmark scripts: latency summaries and the JSON result format that
+compare.py reads.
+"""
+
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def summarize_latencies(seconds, errors=0, wall_seconds=None):
+    # Milliseconds percentiles for a list of per-request durations in seconds
+    summary = {"requests": len(seconds) + errors, "errors": errors}
+    if seconds:
+        ordered = sorted(seconds)
+        cuts = statistics.quantiles(ordered, n=100, method='inclusive') if len(ordered) > 1 else ordered * 99
+        summary.update({
+            "mean_ms": round(statistics.fmean(ordered) * 1000, 3),
+            "p50_ms": round(cuts[49] * 1000, 3),
+            "p95_ms": round(cuts[94] * 1000, 3),
+            "p99_ms": round(cuts[98] * 1000, 3),
+            "max_ms": round(ordered[-1] * 1000, 3),
+        })
+    if wall_seconds:
+        summary["throughput_rps"] = round(len(seconds) / wall_seconds, 2)
+    return summary
+
+def write_results(path, benchmark, params, results):
+    # One JSON document per run; compare.py diffs two of them
+    document = {
+        "benchmark": benchmark,
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "params": params,
+        "results": results,
+    }
+    if path == '-':
+        json.dump(document, sys.stdout, indent=2)
+        print()
+        return
+    with open(path, 'w') as f:
+        json.dump(document, f, indent=2)
+        f.write("\n")
+    print(f"Results written to {path}")
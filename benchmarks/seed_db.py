@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Seed a database with deterministic, realistically sized data for the benchmarks.
+
+Usage: python benchmarks/seed_db.py [--database sqlite:///benchmarks/bench.db] [--users 2000]
+       [--quizzes-per-user 5] [--questions-per-quiz 10] [--attempts-per-user 60] [--seed 1] [--reset]
+
+Every user is named bench00001, bench00002, ... with the password in PASSWORD. The same
+arguments always produce the same rows.
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from werkzeug.security import generate_password_hash
+
+import app as quiz_app
+from item_analysis import pack_responses
+
+PASSWORD = 'benchmark-password'
+DEFAULT_DATABASE = 'sqlite:///' + os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bench.db')
+BATCH_ROWS = 5000
+# Fixed so attempt timestamps (and the analytics charts built from them) are reproducible
+EPOCH = datetime(2025, 1, 1)
+
+WORDS = ("erosion sediment glacier magma basalt granite mantle crust tectonic aquifer delta estuary "
+         "mineral quartz feldspar fault fold strata fossil weathering permafrost moraine lava igneous").split()
+
+def username(number):
+    return f"bench{number:05d}"
+
+def insert_rows(model, rows):
+    for start in range(0, len(rows), BATCH_ROWS):
+        quiz_app.db.session.execute(quiz_app.db.insert(model), rows[start:start + BATCH_ROWS])
+
+def reset_sequences():
+    # Rows are inserted with explicit ids; move Postgres sequences past them
+    db = quiz_app.db
+    if db.engine.dialect.name != 'postgresql':
+        return
+    for table in ('user', 'quiz', 'question', 'quiz_attempt'):
+        db.session.execute(db.text(
+            f"SELECT setval(pg_get_serial_sequence('\"{table}\"', 'id'), COALESCE((SELECT MAX(id) FROM \"{table}\"), 1))"
+        ))
+
+def seed(args):
+    rng = random.Random(args.seed)
+    db = quiz_app.db
+    password_hash = generate_password_hash(PASSWORD)  # hashing is slow, so every user shares one
+
+    users, quizzes, questions, attempts = [], [], [], []
+    quiz_id = question_id = attempt_id = 0
+    for user_id in range(1, args.users + 1):
+        users.append({"id": user_id, "username": username(user_id), "password": password_hash,
+                      "created_at": EPOCH})
+        skill = rng.uniform(0.3, 0.95)
+        user_quizzes = []
+        for number in range(args.quizzes_per_user):
+            quiz_id += 1
+            quizzes.append({"id": quiz_id, "title": f"{rng.choice(WORDS).title()} review {number + 1}",
+                            "user_id": user_id, "created_at": EPOCH, "version": 1})
+            key = []
+            for _ in range(args.questions_per_quiz):
+                question_id += 1
+                correct = rng.randrange(4)
+                key.append(correct)
+                options = rng.sample(WORDS, 4)
+                questions.append({
+                    "id": question_id, "quiz_id": quiz_id,
+                    "question_text": f"Which term best describes {' '.join(rng.sample(WORDS, 3))}?",
+                    "option_a": options[0], "option_b": options[1], "option_c": options[2], "option_d": options[3],
+                    "correct_answer": "ABCD"[correct]
+                })
+            user_quizzes.append((quiz_id, key))
+
+        for _ in range(args.attempts_per_user):
+            attempt_id += 1
+            attempt_quiz, key = rng.choice(user_quizzes)
+            answers = [correct if rng.random() < skill else rng.randrange(4) for correct in key]
+            attempts.append({
+                "id": attempt_id, "user_id": user_id, "quiz_id": attempt_quiz,
+                "score": sum(answer == correct for answer, correct in zip(answers, key)),
+                "total_questions": len(key),
+                "completed_at": EPOCH + timedelta(minutes=rng.randrange(180 * 24 * 60)),
+                "responses": pack_responses(answers, len(key))
+            })
+
+    insert_rows(quiz_app.User, users)
+    insert_rows(quiz_app.Quiz, quizzes)
+    insert_rows(quiz_app.Question, questions)
+    insert_rows(quiz_app.QuizAttempt, attempts)
+    reset_sequences()
+    db.session.commit()
+    # Rows went in without the app's per-save work: build the rollups and both indexes from them
+    quiz_app.backfill_attempt_rollups()
+    quiz_app.backfill_question_bands()
+    quiz_app.backfill_search_index()
+    return {"users": len(users), "quizzes": len(quizzes), "questions": len(questions), "attempts": len(attempts)}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--database', default=DEFAULT_DATABASE)
+    parser.add_argument('--users', type=int, default=2000)
+    parser.add_argument('--quizzes-per-user', type=int, default=5)
+    parser.add_argument('--questions-per-quiz', type=int, default=10)
+    parser.add_argument('--attempts-per-user', type=int, default=60)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--reset', action='store_true', help="drop all tables and the search index first")
+    args = parser.parse_args()
+
+    app = quiz_app.create_app({'SQLALCHEMY_DATABASE_URI': args.database})
+    with app.app_context():
+        if args.reset:
+            quiz_app.drop_search_index()
+            quiz_app.db.drop_all()
+        quiz_app.init_db()
+        if quiz_app.User.query.first():
+            print(f"{args.database} already has users; pass --reset to reseed")
+            return 1
+
+        started = time.perf_counter()
+        counts = seed(args)
+        elapsed = time.perf_counter() - started
+
+    print(", ".join(f"{count} {name}" for name, count in counts.items()) + f" seeded in {elapsed:.1f}s")
+    print(f"Log in as {username(1)}..{username(args.users)} with password '{PASSWORD}'")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
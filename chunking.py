@@ -0,0 +1,35 @@
+import re
+
+# extract_text_from_pdf separates pages with a form feed so they can be recovered here
+PAGE_BREAK = "\f"
+
+def split_pages(text):
+    pages = [page.strip() for page in text.split(PAGE_BREAK)]
+    if len(pages) == 1:
+        # Pasted text or OCR output has no pages; fall back to paragraphs
+        pages = [paragraph.strip() for paragraph in re.split(r"\n\s*\n", text)]
+    return [page for page in pages if page]
+
+def split_into_chunks(text, chunk_chars=8000, overlap_chars=800):
+    # Group consecutive pages into chunks of roughly chunk_chars. Each chunk starts with the
+    # tail of the previous one so questions about content spanning a boundary still work.
+    # Pages longer than chunk_chars are cut into chunk_chars pieces.
+    pieces = []
+    for page in split_pages(text):
+        for start in range(0, len(page), chunk_chars):
+            pieces.append(page[start:start + chunk_chars])
+
+    chunks = []
+    current = []
+    size = 0
+    for piece in pieces:
+        if current and size + len(piece) > chunk_chars:
+            chunks.append("\n".join(current))
+            tail = chunks[-1][-overlap_chars:] if overlap_chars else ""
+            current = [tail] if tail else []
+            size = len(tail)
+        current.append(piece)
+        size += len(piece) + 1
+    if current:
+        chunks.append("\n".join(current))
+    return chunks
@@ -0,0 +1,147 @@
+import heapq
+import math
+import re
+
+from chunking import PAGE_BREAK
+
+# Shrinks extracted study material before it goes into the prompt. Slide decks repeat their
+# header, footer, course code and page number on every page, so lines found on most pages are
+# kept only where they first appear; whitespace is collapsed and pages left with next to nothing are removed. What remains
+# is fitted to a token budget by choosing the pages that add the most new content, kept in
+# document order, instead of cutting the text off at the end.
+
+CHARS_PER_TOKEN = 4
+# A line on at least this share of the pages (and on BOILERPLATE_MIN_PAGES of them) is boilerplate
+BOILERPLATE_SHARE = 0.5
+BOILERPLATE_MIN_PAGES = 3
+# Headers and footers sit in the first or last few lines of a page; slide numbers in a handout
+# also sit between slides, but those lines have no letters
+EDGE_LINES = 3
+MIN_PAGE_WORDS = 5
+
+WORD = re.compile(r"[^\W\d_]{3,}")
+LETTER = re.compile(r"[^\W\d_]")
+DIGITS = re.compile(r"\d+")
+SPACES = re.compile(r"[ \t\u00a0]+")
+
+def estimate_tokens(text):
+    # Gemini averages about four characters per token on English prose; close enough for a
+    # budget and a report, and free, unlike a countTokens round trip
+    return math.ceil(len(text) / CHARS_PER_TOKEN) if text else 0
+
+def line_key(line):
+    # For a cleaned line: "Page 3 of 40" and "Page 4 of 40" are the same footer
+    return DIGITS.sub("#", line.lower())
+
+def clean_lines(page):
+    lines = (SPACES.sub(" ", line).strip() for line in page.splitlines())
+    return [line for line in lines if line]
+
+def candidates(lines):
+    # [(index, key)] of the lines that could be boilerplate. Body text is left out, so a common
+    # word on a line of its own (some PDFs extract one word per line) never counts.
+    found = []
+    for index, line in enumerate(lines):
+        edge = index < EDGE_LINES or index >= len(lines) - EDGE_LINES
+        if edge or not LETTER.search(line):
+            found.append((index, line_key(line)))
+    return found
+
+def boilerplate_keys(page_candidates):
+    # Keys of candidate lines that show up on most pages; needs enough pages to tell
+    if len(page_candidates) < BOILERPLATE_MIN_PAGES:
+        return set()
+    seen = {}
+    for found in page_candidates:
+        for key in {key for _, key in found}:
+            seen[key] = seen.get(key, 0) + 1
+    threshold = max(BOILERPLATE_MIN_PAGES, math.ceil(len(page_candidates) * BOILERPLATE_SHARE))
+    return {key for key, count in seen.items() if count >= threshold}
+
+def page_terms(page):
+    return set(WORD.findall(page.lower()))
+
+def select_pages(pages, budget_tokens):
+    # Indexes of the pages to keep, in document order. Greedy coverage: each step takes the page
+    # whose not-yet-covered words (weighted by how rare they are in the document) are worth the
+    # most per token. Gains only shrink as words get covered, so stale heap entries are rescored
+    # lazily instead of rescoring every page after every pick.
+    terms = [page_terms(page) for page in pages]
+    frequency = {}
+    for page_words in terms:
+        for term in page_words:
+            frequency[term] = frequency.get(term, 0) + 1
+    weight = {term: math.log(1 + len(pages) / count) for term, count in frequency.items()}
+    costs = [max(estimate_tokens(page), 1) for page in pages]
+
+    covered = set()
+    def gain(index):
+        return sum(weight[term] for term in terms[index] - covered) / costs[index]
+
+    heap = [(-gain(index), index) for index in range(len(pages))]
+    heapq.heapify(heap)
+    chosen = []
+    remaining = budget_tokens
+    while heap and remaining > 0:
+        _, index = heapq.heappop(heap)
+        if costs[index] > remaining:
+            continue
+        current = gain(index)
+        if heap and current < -heap[0][0]:
+            heapq.heappush(heap, (-current, index))
+            continue
+        chosen.append(index)
+        covered |= terms[index]
+        remaining -= costs[index] + 1
+    return sorted(chosen)
+
+def condense(text, budget_tokens=0):
+    # -> (condensed text, report). budget_tokens=0 strips boilerplate without a budget. Text
+    # without page breaks (pasted or OCR) is treated as paragraphs, which are never boilerplate.
+    paged = PAGE_BREAK in text
+    raw_pages = text.split(PAGE_BREAK) if paged else re.split(r"\n\s*\n", text)
+    pages = [clean_lines(page) for page in raw_pages]
+    page_candidates = [candidates(lines) for lines in pages] if paged else [[] for _ in pages]
+
+    repeated = boilerplate_keys(page_candidates) if paged else set()
+    removed_lines = 0
+    shown = set()
+    kept = []
+    for lines, found in zip(pages, page_candidates):
+        dropped = set()
+        for index, key in found:
+            if key in repeated:
+                # The first copy stays: a running title or a prompt repeated on every page is
+                # still worth reading once; a bare page number is not
+                if key in shown or not LETTER.search(key):
+                    dropped.add(index)
+                shown.add(key)
+        content = [line for index, line in enumerate(lines) if index not in dropped]
+        removed_lines += len(lines) - len(content)
+        page = "\n".join(content)
+        # A pasted paragraph may be a heading; a slide with only a title or a logo is not worth its tokens
+        if content and (not paged or len(WORD.findall(page)) >= MIN_PAGE_WORDS):
+            kept.append(page)
+    # Nothing substantial anywhere (a one-line paste): keep what there is rather than nothing
+    if not kept:
+        kept = ["\n".join(lines) for lines in pages if lines]
+
+    joiner = "\n" + PAGE_BREAK if paged else "\n\n"
+    cleaned_tokens = estimate_tokens(joiner.join(kept))
+    selected = kept
+    if budget_tokens and cleaned_tokens > budget_tokens:
+        selected = [kept[index] for index in select_pages(kept, budget_tokens)]
+        if not selected:
+            # Every page is bigger than the whole budget: fall back to the start of the first one
+            selected = [kept[0][:budget_tokens * CHARS_PER_TOKEN]]
+
+    condensed = joiner.join(selected)
+    return condensed, {
+        'tokens_before': estimate_tokens(text),
+        'tokens_after': estimate_tokens(condensed),
+        'pages_before': len(raw_pages),
+        'pages_after': len(selected),
+        'boilerplate_lines': removed_lines,
+        'empty_pages': len(raw_pages) - len(kept),
+        'over_budget_pages': len(kept) - len(selected),
+    }
@@ -0,0 +1,84 @@
+import os
+
+def load_config(app, overrides=None):
+    # Settings come from the environment (and .env); overrides win, e.g. in tests
+    app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL', 'sqlite:///quiz.db')
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['SECRET_KEY'] = os.getenv("SECRET_KEY", "dev-secret-key-change-in-production")
+    app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024
+    app.config['UPLOAD_SPOOL_MAX_BYTES'] = int(os.getenv('UPLOAD_SPOOL_MAX_BYTES', 2 * 1024 * 1024))  # larger uploads spill to a temp file
+    app.config['UPLOAD_STORE_DIR'] = os.getenv('UPLOAD_STORE_DIR', '')  # empty keeps no copy of uploads
+    app.config['EXTRACTION_CACHE_MAX_BYTES'] = int(os.getenv('EXTRACTION_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+    app.config['EXTRACTION_MAX_CHARS'] = int(os.getenv('EXTRACTION_MAX_CHARS', 100000))  # 0 disables the budget
+    app.config['PDF_PARALLEL_MIN_PAGES'] = int(os.getenv('PDF_PARALLEL_MIN_PAGES', 40))  # 0 keeps extraction in-process
+    app.config['PDF_PAGES_PER_BATCH'] = int(os.getenv('PDF_PAGES_PER_BATCH', 10))
+    app.config['EXTRACTION_WORKERS'] = int(os.getenv('EXTRACTION_WORKERS', 0)) or None  # defaults to the CPU count divided by WEB_CONCURRENCY
+    app.config['OCR_MAX_CONCURRENCY'] = int(os.getenv('OCR_MAX_CONCURRENCY', 2))
+    app.config['OCR_TIMEOUT_SECONDS'] = int(os.getenv('OCR_TIMEOUT_SECONDS', 30))
+    app.config['OCR_QUEUE_TIMEOUT_SECONDS'] = int(os.getenv('OCR_QUEUE_TIMEOUT_SECONDS', 30))
+    app.config['OCR_TARGET_DPI'] = int(os.getenv('OCR_TARGET_DPI', 300))
+    app.config['OCR_MAX_DIMENSION'] = int(os.getenv('OCR_MAX_DIMENSION', 2500))
+    app.config['JOB_WORKERS'] = int(os.getenv('JOB_WORKERS', 2))
+    app.config['JOB_QUEUE_SIZE'] = int(os.getenv('JOB_QUEUE_SIZE', 100))
+    app.config['JOB_RETENTION_SECONDS'] = int(os.getenv('JOB_RETENTION_SECONDS', 24 * 60 * 60))
+    app.config['JOB_EVENTS_POLL_SECONDS'] = float(os.getenv('JOB_EVENTS_POLL_SECONDS', 0.5))
+    app.config['JOB_EVENTS_TIMEOUT_SECONDS'] = int(os.getenv('JOB_EVENTS_TIMEOUT_SECONDS', 300))
+    app.config['JOB_HEARTBEAT_SECONDS'] = float(os.getenv('JOB_HEARTBEAT_SECONDS', 30))  # unfinished jobs silent for 3 beats count as interrupted
+    app.config['CHUNK_CHARS'] = int(os.getenv('CHUNK_CHARS', 8000))
+    app.config['CHUNK_OVERLAP_CHARS'] = int(os.getenv('CHUNK_OVERLAP_CHARS', 800))
+    app.config['GENERATION_CONCURRENCY'] = int(os.getenv('GENERATION_CONCURRENCY', 4))
+    app.config['DEFAULT_QUESTION_COUNT'] = int(os.getenv('DEFAULT_QUESTION_COUNT', 5))
+    app.config['MAX_QUESTION_COUNT'] = int(os.getenv('MAX_QUESTION_COUNT', 30))
+    app.config['CONDENSE_INPUT'] = os.getenv('CONDENSE_INPUT', 'true').lower() == 'true'
+    app.config['PROMPT_TOKEN_BUDGET'] = int(os.getenv('PROMPT_TOKEN_BUDGET', 8000))  # 0 disables the budget
+    app.config['GEMINI_API_KEY'] = os.getenv("GEMINI_API_KEY")
+    app.config['GEMINI_MODEL'] = os.getenv('GEMINI_MODEL', "gemini-2.5-flash-lite")
+    app.config['LLM_PROVIDER'] = os.getenv('LLM_PROVIDER', 'gemini')  # 'stub' for offline development and load tests
+    app.config['LLM_RATE_PER_SECOND'] = float(os.getenv('LLM_RATE_PER_SECOND', 5))  # 0 disables rate limiting
+    app.config['LLM_BURST'] = int(os.getenv('LLM_BURST', 10))
+    app.config['LLM_MAX_IN_FLIGHT'] = int(os.getenv('LLM_MAX_IN_FLIGHT', 8))
+    app.config['LLM_MAX_RETRIES'] = int(os.getenv('LLM_MAX_RETRIES', 3))
+    app.config['LLM_RETRY_BASE_SECONDS'] = float(os.getenv('LLM_RETRY_BASE_SECONDS', 1.0))
+    app.config['LLM_RETRY_MAX_SECONDS'] = float(os.getenv('LLM_RETRY_MAX_SECONDS', 20.0))
+    app.config['LLM_ACQUIRE_TIMEOUT_SECONDS'] = float(os.getenv('LLM_ACQUIRE_TIMEOUT_SECONDS', 60.0))
+    app.config['LLM_STUB_LATENCY_SECONDS'] = float(os.getenv('LLM_STUB_LATENCY_SECONDS', 1.0))
+    app.config['LLM_STUB_ERROR_RATE'] = float(os.getenv('LLM_STUB_ERROR_RATE', 0.0))
+    app.config['QUIZZES_PAGE_SIZE'] = int(os.getenv('QUIZZES_PAGE_SIZE', 50))
+    app.config['QUIZZES_MAX_PAGE_SIZE'] = int(os.getenv('QUIZZES_MAX_PAGE_SIZE', 200))
+    app.config['SEARCH_PAGE_SIZE'] = int(os.getenv('SEARCH_PAGE_SIZE', 20))
+    app.config['SEARCH_MAX_PAGE_SIZE'] = int(os.getenv('SEARCH_MAX_PAGE_SIZE', 50))
+    app.config['ANALYTICS_MAX_POINTS'] = int(os.getenv('ANALYTICS_MAX_POINTS', 500))
+    app.config['QUIZ_CACHE_MAX_ENTRIES'] = int(os.getenv('QUIZ_CACHE_MAX_ENTRIES', 1000))
+    app.config['SAVE_QUESTIONS_MAX_BATCH'] = int(os.getenv('SAVE_QUESTIONS_MAX_BATCH', 100))
+    app.config['DUPLICATE_THRESHOLD'] = float(os.getenv('DUPLICATE_THRESHOLD', 0.7))  # 0 disables near-duplicate checks
+    app.config['SINGLE_FLIGHT'] = os.getenv('SINGLE_FLIGHT', 'host')  # 'host', 'process' (threads of one worker only) or 'off'
+    app.config['SINGLE_FLIGHT_STORE'] = os.getenv('SINGLE_FLIGHT_STORE', '')  # SQLite lease file; empty = <instance folder>/singleflight.db
+    app.config['SINGLE_FLIGHT_LEASE_SECONDS'] = int(os.getenv('SINGLE_FLIGHT_LEASE_SECONDS', 300))
+    app.config['GENERATION_CACHE_TTL_SECONDS'] = int(os.getenv('GENERATION_CACHE_TTL_SECONDS', 7 * 24 * 60 * 60))
+    app.config['GENERATION_CACHE_MAX_ENTRIES'] = int(os.getenv('GENERATION_CACHE_MAX_ENTRIES', 5000))
+    app.config['QUERY_COUNT_HEADER'] = os.getenv('QUERY_COUNT_HEADER', 'false').lower() == 'true'
+    app.config['QUERY_WARN_THRESHOLD'] = int(os.getenv('QUERY_WARN_THRESHOLD', 0))
+    app.config['LOG_LEVEL'] = os.getenv('LOG_LEVEL', 'INFO')
+    app.config['LOG_FORMAT'] = os.getenv('LOG_FORMAT', 'text')  # 'json' for one JSON object per line
+    app.config['METRICS_ENABLED'] = os.getenv('METRICS_ENABLED', 'true').lower() == 'true'
+    app.config['METRICS_TOKEN'] = os.getenv('METRICS_TOKEN', '')  # when set, /metrics requires "Authorization: Bearer <token>"
+
+    app.config.update(overrides or {})
+
+    # Handle PostgreSQL URL format for production
+    if app.config['SQLALCHEMY_DATABASE_URI'].startswith('postgres://'):
+        app.config['SQLALCHEMY_DATABASE_URI'] = app.config['SQLALCHEMY_DATABASE_URI'].replace('postgres://', 'postgresql://', 1)
+
+    # Connection pool. Each gunicorn worker serves WEB_THREADS requests plus JOB_WORKERS background
+    # jobs, so pool size + overflow should cover that (gevent workers return connections while
+    # a request waits on Gemini, so only requests running queries count). Pre-ping and recycle drop connections the
+    # database or a proxy has closed while idle instead of failing the next request with them.
+    engine_options = {'pool_pre_ping': os.getenv('DB_POOL_PRE_PING', 'true').lower() == 'true'}
+    if app.config['SQLALCHEMY_DATABASE_URI'].startswith('postgresql'):
+        engine_options.update({
+            'pool_size': int(os.getenv('DB_POOL_SIZE', 5)),
+            'max_overflow': int(os.getenv('DB_MAX_OVERFLOW', 10)),
+            'pool_recycle': int(os.getenv('DB_POOL_RECYCLE_SECONDS', 1800)),
+            'pool_timeout': int(os.getenv('DB_POOL_TIMEOUT_SECONDS', 30)),
+        })
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', engine_options)
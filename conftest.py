@@ -0,0 +1,37 @@
+"""
+Shared fixtures. Every test app gets its own SQLite database and single-flight lease file under
+pytest's temporary directory, its own LLM client (see app.llm_client) and the stub LLM provider
+answering without delay.
+"""
+
+import pytest
+
+import app as quiz_app
+
+TEST_CONFIG = {
+    'LLM_PROVIDER': 'stub',
+    'LLM_STUB_LATENCY_SECONDS': 0,
+    'LLM_RATE_PER_SECOND': 0,
+    'WTF_CSRF_ENABLED': False
+}
+
+@pytest.fixture(scope='session')
+def make_app(tmp_path_factory):
+    # make_app(overrides) -> an app with its tables created; overrides replace TEST_CONFIG.
+    # Session-scoped so module-scoped fixtures can use it too.
+    def make(overrides=None):
+        directory = tmp_path_factory.mktemp('app')
+        app = quiz_app.create_app({
+            'SQLALCHEMY_DATABASE_URI': f"sqlite:///{directory / 'test.db'}",
+            'SINGLE_FLIGHT_STORE': str(directory / 'leases.db'),
+            **TEST_CONFIG,
+            **(overrides or {})
+        })
+        with app.app_context():
+            quiz_app.init_db()
+        return app
+    return make
+
+@pytest.fixture
+def app(make_app):
+    return make_app()
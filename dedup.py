@@ -0,0 +1,84 @@
+import hashlib
+import random
+import re
+import struct
+
+# Near-duplicate questions via MinHash + LSH banding. A question is reduced to a set of shingles
+# (the stemmed content words of its text and of its correct answer), the set to a
+# NUM_PERMUTATIONS-value MinHash signature, and the signature to BANDS bucket keys. Two questions
+# land in at least one common bucket with probability 1 - (1 - J^ROWS_PER_BAND)^BANDS for Jaccard
+# similarity J: about 0.64 at J = 0.5 and 0.99 at J = 0.7. Only questions sharing a bucket are
+# compared exactly, so a check looks at a handful of candidates instead of the whole question bank.
+
+NUM_PERMUTATIONS = 64
+BANDS = 16
+ROWS_PER_BAND = NUM_PERMUTATIONS // BANDS
+MERSENNE_PRIME = (1 << 61) - 1
+MAX_HASH = (1 << 32) - 1
+
+# Fixed seed: bucket keys are stored in the database and must not change between processes
+_rng = random.Random(20240601)
+PERMUTATIONS = tuple((_rng.randrange(1, MERSENNE_PRIME), _rng.randrange(0, MERSENNE_PRIME))
+                     for _ in range(NUM_PERMUTATIONS))
+
+# Function words that paraphrases swap freely ("Which of the following is..." vs "What is...")
+STOPWORDS = frozenset("""
+a an the of to in on at by for from with as and or but not no is are was were be been being
+do does did can could would should will may might must it its this that these those there their
+they them which what who whom whose when where why how following best most true correct statement
+""".split())
+
+WORD = re.compile(r"[a-z0-9]+")
+SUFFIXES = ('ing', 'ed', 'es', 's')
+
+def stem(word):
+    # Crude suffix stripping: "breaks", "breaking" and "broke" aren't unified, but the first two are
+    for suffix in SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            return word[:-len(suffix)]
+    return word
+
+def words(text):
+    return {stem(word) for word in WORD.findall(text.lower()) if (len(word) > 1 or word.isdigit()) and word not in STOPWORDS}
+
+def normalize(text):
+    return " ".join(text.lower().split())
+
+def shingles(question_text, correct_answer):
+    # Answer words are marked so "Paris" the answer and "Paris" in a question stay distinct.
+    # Text without content words ("Q?" ; "A") becomes one shingle of its normalized text, so
+    # exact repeats of it still share every bucket.
+    shingle_set = words(question_text) | {"=" + word for word in words(correct_answer)}
+    if not shingle_set:
+        return frozenset({f"~{normalize(question_text)}={normalize(correct_answer)}"})
+    return frozenset(shingle_set)
+
+def shingle_hash(shingle):
+    return int.from_bytes(hashlib.blake2b(shingle.encode('utf-8'), digest_size=4).digest(), 'big')
+
+def signature(shingle_set):
+    # One minimum per permutation h(x) = (a * x + b) mod p, truncated to 32 bits
+    hashes = [shingle_hash(shingle) for shingle in shingle_set]
+    if not hashes:
+        return None
+    return tuple(min(((a * value + b) % MERSENNE_PRIME) & MAX_HASH for value in hashes) for a, b in PERMUTATIONS)
+
+def band_keys(sig):
+    # One signed 64-bit key per band; the band number is hashed in so bands never collide
+    if sig is None:
+        return []
+    keys = []
+    for band in range(BANDS):
+        rows = sig[band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND]
+        digest = hashlib.blake2b(struct.pack(f'>B{ROWS_PER_BAND}I', band, *rows), digest_size=8).digest()
+        keys.append(int.from_bytes(digest, 'big', signed=True))
+    return keys
+
+def fingerprint(question_text, correct_answer):
+    # (shingles, bucket keys) for one question
+    shingle_set = shingles(question_text, correct_answer)
+    return shingle_set, band_keys(signature(shingle_set))
+
+def jaccard(a, b):
+    union = len(a | b)
+    return len(a & b) / union if union else 0.0
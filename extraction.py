@@ -0,0 +1,154 @@
+import atexit
+import logging
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from pypdf import PdfReader
+
+from chunking import PAGE_BREAK
+
+# Worker processes only import this module, so keep it free of Flask and app imports.
+
+# Pages stay recoverable (see chunking.split_pages); the form feed is just whitespace to the model
+PAGE_SEPARATOR = "\n" + PAGE_BREAK
+
+_pool = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+
+def default_workers():
+    # Every gunicorn worker (WEB_CONCURRENCY) gets its own pool; together they fill the CPUs once
+    return max((os.cpu_count() or 1) // max(int(os.getenv('WEB_CONCURRENCY', 1)), 1), 1)
+
+def get_pool(max_workers=None):
+    # One pool per server process, created on first use so each gunicorn worker gets its own after fork
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is None:
+            _pool_workers = max_workers or default_workers()
+            # spawn keeps children from inheriting the parent's DB connections and threads
+            _pool = ProcessPoolExecutor(max_workers=_pool_workers, mp_context=multiprocessing.get_context('spawn'))
+        return _pool
+
+def shutdown_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+atexit.register(shutdown_pool)
+
+def extract_page_batch(pdf_path, first_page, last_page):
+    # Runs in a worker process: parse the PDF and return the text of pages first_page..last_page
+    reader = PdfReader(pdf_path)
+    return [reader.pages[number - 1].extract_text() or "" for number in range(first_page, last_page + 1)]
+
+def spill_to_disk(source):
+    # Worker processes open the PDF by path, so a file object is copied to a named temp file
+    source.seek(0)
+    with tempfile.NamedTemporaryFile(suffix='.pdf', delete=False) as spilled:
+        shutil.copyfileobj(source, spilled)
+    return spilled.name
+
+def page_count(reader):
+    # From the page tree's /Count, without building the list of every page object
+    # (len(reader.pages)); falls back to that for files whose root entry is unusable
+    try:
+        return int(reader.trailer['/Root']['/Pages']['/Count'])
+    except (KeyError, TypeError, ValueError):
+        return len(reader.pages)
+
+def iter_pdf_pages(source, first_page=None, last_page=None, parallel_min_pages=0, batch_size=8, max_workers=None):
+    # Yield (page_number, text) for each page in the 1-based inclusive range, in page order.
+    # source is a path or a seekable binary file object. Ranges of at least parallel_min_pages
+    # pages are split into batches and extracted in the process pool; smaller ones (or
+    # parallel_min_pages=0) stay in-process.
+    reader = PdfReader(source)
+    count = page_count(reader)
+    start = max(first_page or 1, 1)
+    end = min(last_page or count, count)
+
+    if not parallel_min_pages or end - start + 1 < parallel_min_pages:
+        # Reading pages here builds the page list anyway; trust it over /Count
+        for number in range(start, min(end, len(reader.pages)) + 1):
+            yield number, reader.pages[number - 1].extract_text() or ""
+        return
+
+    if isinstance(source, (str, os.PathLike)):
+        pdf_path, temp_path = source, None
+    else:
+        pdf_path = temp_path = spill_to_disk(source)
+
+    # At most two batches per pool process are submitted ahead of the page being read, so a
+    # caller that stops early (its text budget is spent) leaves little work running behind it
+    window = deque()
+    number = start
+    try:
+        pool = get_pool(max_workers)
+        limit = 2 * _pool_workers
+        for batch_start in range(start, end + 1, batch_size):
+            window.append(pool.submit(extract_page_batch, pdf_path, batch_start, min(batch_start + batch_size - 1, end)))
+            if len(window) < limit:
+                continue
+            for text in window.popleft().result():
+                yield number, text
+                number += 1
+        while window:
+            for text in window.popleft().result():
+                yield number, text
+                number += 1
+    except BrokenProcessPool:
+        # A worker died (OOM kill, crash); replace the pool for later calls and finish in-process
+        logging.warning("PDF extraction pool broke, finishing %s in-process from page %d", pdf_path, number)
+        shutdown_pool()
+        for number in range(number, end + 1):
+            yield number, reader.pages[number - 1].extract_text() or ""
+    finally:
+        # Drop the queued batches nobody will read
+        for future in window:
+            future.cancel()
+        if temp_path:
+            # Batches still running keep their own handle open; unlinking is safe on POSIX
+            os.remove(temp_path)
+
+def read_pdf_text(source, first_page=None, last_page=None, max_chars=0, **pages_options):
+    # -> (text, pages read). Pulling pages stops once max_chars is spent; the model never sees
+    # the rest anyway. pages_options go to iter_pdf_pages. build-quiz-bank runs this whole in a
+    # pool worker, one file per worker, with the default parallel_min_pages=0.
+    pages = []
+    used = 0
+    pages_iter = iter_pdf_pages(source, first_page, last_page, **pages_options)
+    for _, page_text in pages_iter:
+        pages.append(page_text)
+        used += len(page_text) + len(PAGE_SEPARATOR)
+        if max_chars and used >= max_chars:
+            break
+    pages_iter.close()
+    text = PAGE_SEPARATOR.join(pages)
+    if max_chars:
+        text = text[:max_chars]
+    return text.strip(), len(pages)
+
+def read_pdf_text_in_pool(source, first_page=None, last_page=None, max_chars=0, max_workers=None):
+    # read_pdf_text run whole in a pool worker while the caller only waits on the result. gevent
+    # workers use this for every PDF: parsing in-process would stall all their other requests.
+    if isinstance(source, (str, os.PathLike)):
+        pdf_path, temp_path = source, None
+    else:
+        pdf_path = temp_path = spill_to_disk(source)
+    try:
+        return get_pool(max_workers).submit(read_pdf_text, pdf_path, first_page, last_page, max_chars).result()
+    except BrokenProcessPool:
+        logging.warning("PDF extraction pool broke, extracting %s in-process", pdf_path)
+        shutdown_pool()
+        return read_pdf_text(pdf_path, first_page, last_page, max_chars)
+    finally:
+        if temp_path:
+            os.remove(temp_path)
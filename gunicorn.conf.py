@@ -0,0 +1,12 @@
+# gunicorn reads this file from the working directory: gunicorn "app:create_app()".
+# Command-line flags still win over these settings. See serving.py for the two worker classes.
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv('WEB_CONCURRENCY', 1))
+
+# 'gthread' (one thread per request) or 'gevent' (one greenlet per request, for mostly
+# I/O-bound generation traffic; needs the gevent package)
+worker_class = os.getenv('WEB_WORKER_CLASS', 'gthread')
+threads = int(os.getenv('WEB_THREADS', 8))
+worker_connections = int(os.getenv('WEB_WORKER_CONNECTIONS', 1000))
@@ -0,0 +1,68 @@
+import numpy as np
+
+# Each attempt stores its answers as one byte per question, in question id order: the chosen
+# option index 0-3, or UNANSWERED. Questions are only ever appended to a quiz, so an attempt
+# recorded before later questions were added is a shorter prefix of the current order.
+UNANSWERED = 255
+OPTION_COUNT = 4
+
+def pack_responses(answers, question_count):
+    # Browser answers (list of option indexes or null) -> bytes of length question_count
+    packed = bytearray([UNANSWERED]) * question_count
+    for index, answer in enumerate((answers or [])[:question_count]):
+        if isinstance(answer, int) and not isinstance(answer, bool) and 0 <= answer < OPTION_COUNT:
+            packed[index] = answer
+    return bytes(packed)
+
+def response_matrix(responses, question_count):
+    # attempts x questions uint8 matrix plus a mask of which questions each attempt was shown
+    responses = [bytes(packed[:question_count]) for packed in responses]
+    lengths = np.fromiter((len(packed) for packed in responses), dtype=np.intp, count=len(responses))
+    presented = np.arange(question_count) < lengths[:, None]
+    # Row-major order of the presented cells is exactly the concatenation of the prefixes
+    matrix = np.full((len(responses), question_count), UNANSWERED, dtype=np.uint8)
+    matrix[presented] = np.frombuffer(b''.join(responses), dtype=np.uint8)
+    return matrix, presented
+
+def item_statistics(responses, answer_key):
+    # Classical item analysis over all attempts of a quiz, computed column-wise:
+    #   difficulty     share of attempts that answered the question correctly (p-value)
+    #   options        share of attempts choosing each option, the key included (distractor frequency)
+    #   discrimination correlation between getting this question right and the score on the
+    #                  rest of the quiz (corrected point-biserial); None when it is undefined
+    question_count = len(answer_key)
+    matrix, presented = response_matrix(responses, question_count)
+    shown = presented.sum(axis=0)
+    safe_shown = np.maximum(shown, 1)
+
+    key = np.asarray(answer_key, dtype=np.uint8)
+    correct = ((matrix == key) & presented).astype(np.float64)
+    difficulty = correct.sum(axis=0) / safe_shown
+
+    option_counts = np.stack([((matrix == option) & presented).sum(axis=0) for option in range(OPTION_COUNT)], axis=1)
+    unanswered = ((matrix == UNANSWERED) & presented).sum(axis=0)
+
+    # Rest score: the attempt's other correct answers, only where the question was shown
+    mask = presented.astype(np.float64)
+    rest = (correct.sum(axis=1, keepdims=True) - correct) * mask
+    mean_correct = difficulty
+    mean_rest = rest.sum(axis=0) / safe_shown
+    covariance = (correct * rest).sum(axis=0) / safe_shown - mean_correct * mean_rest
+    variance_correct = mean_correct - mean_correct ** 2
+    variance_rest = (rest * rest).sum(axis=0) / safe_shown - mean_rest ** 2
+    denominator = np.sqrt(np.clip(variance_correct * variance_rest, 0, None))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        discrimination = np.where(denominator > 1e-12, covariance / denominator, np.nan)
+
+    items = []
+    for index in range(question_count):
+        count = int(shown[index])
+        items.append({
+            'attempts': count,
+            'difficulty': round(float(difficulty[index]), 4) if count else None,
+            'discrimination': None if np.isnan(discrimination[index]) else round(float(discrimination[index]), 4),
+            'option_counts': option_counts[index].tolist(),
+            'option_frequency': [round(int(value) / count, 4) if count else None for value in option_counts[index]],
+            'unanswered': int(unanswered[index])
+        })
+    return items
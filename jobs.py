@@ -0,0 +1,82 @@
+import logging
+import queue
+import threading
+import time
+
+class JobRunner:
+    # In-process job queue served by a fixed number of daemon worker threads.
+    # Threads start on the first submit so each gunicorn worker gets its own after fork.
+    # recover() runs once before they start; heartbeat(job_ids) is called every
+    # heartbeat_seconds with the jobs this runner has queued or running, so other processes
+    # can tell them from jobs whose process died.
+
+    def __init__(self, handler, workers=2, max_queue=100, recover=None, heartbeat=None, heartbeat_seconds=30):
+        self.handler = handler
+        self.workers = workers
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.threads = []
+        self.lock = threading.Lock()
+        self.recover = recover
+        self.heartbeat = heartbeat
+        self.heartbeat_seconds = heartbeat_seconds
+        self.active = set()
+
+    def start(self):
+        with self.lock:
+            if self.threads:
+                return
+            if self.recover:
+                try:
+                    self.recover()
+                except Exception:
+                    logging.exception("Recovering interrupted jobs failed")
+            for number in range(self.workers):
+                thread = threading.Thread(target=self.work, name=f'job-worker-{number}', daemon=True)
+                thread.start()
+                self.threads.append(thread)
+            if self.heartbeat:
+                thread = threading.Thread(target=self.beat, name='job-heartbeat', daemon=True)
+                thread.start()
+                self.threads.append(thread)
+
+    def submit(self, job_id, payload):
+        # Returns False instead of blocking when the queue is full so the caller can shed load
+        self.start()
+        with self.lock:
+            self.active.add(job_id)
+        try:
+            self.queue.put_nowait((job_id, payload))
+        except queue.Full:
+            self.finished(job_id)
+            return False
+        return True
+
+    def pending(self):
+        return self.queue.qsize()
+
+    def finished(self, job_id):
+        with self.lock:
+            self.active.discard(job_id)
+
+    def work(self):
+        while True:
+            job_id, payload = self.queue.get()
+            try:
+                self.handler(job_id, payload)
+            except Exception:
+                logging.exception(f"Job {job_id} crashed")
+            finally:
+                self.finished(job_id)
+                self.queue.task_done()
+
+    def beat(self):
+        while True:
+            time.sleep(self.heartbeat_seconds)
+            with self.lock:
+                job_ids = list(self.active)
+            if not job_ids:
+                continue
+            try:
+                self.heartbeat(job_ids)
+            except Exception:
+                logging.exception("Job heartbeat failed")
@@ -0,0 +1,213 @@
+import hashlib
+import logging
+import random
+import re
+import threading
+import time
+
+import serving
+
+# Providers turn a prompt into text. LLMClient wraps one provider per server process with a
+# token-bucket rate limit, a cap on in-flight calls and jittered exponential backoff on
+# retryable errors (429s, 5xx, timeouts).
+
+class LLMBusyError(Exception):
+    # No rate-limit token or in-flight slot became free in time
+    pass
+
+class RetryableLLMError(Exception):
+    # Raised by providers for transient failures that are safe to retry
+    pass
+
+class GeminiProvider:
+    def __init__(self, api_key, model_name):
+        # Imported here so the stub backend and tooling don't pay for the Google client import
+        import google.generativeai as genai
+        from google.api_core import exceptions as google_exceptions
+
+        # The default gRPC transport blocks a gevent worker's event loop; REST goes through the
+        # patched sockets and lets other requests run while Gemini answers
+        genai.configure(api_key=api_key, transport='rest' if serving.cooperative() else None)
+        self.model_name = model_name
+        self.model = genai.GenerativeModel(model_name)
+        self.retryable = (
+            google_exceptions.TooManyRequests,
+            google_exceptions.ResourceExhausted,
+            google_exceptions.ServiceUnavailable,
+            google_exceptions.InternalServerError,
+            google_exceptions.DeadlineExceeded,
+        )
+
+    def generate(self, prompt):
+        try:
+            response = self.model.generate_content(prompt)
+        except self.retryable as e:
+            raise RetryableLLMError(str(e)) from e
+        return response.text if response and hasattr(response, 'text') else None
+
+    def stream(self, prompt):
+        try:
+            response = self.model.generate_content(prompt, stream=True)
+            for chunk in response:
+                try:
+                    text = chunk.text
+                except ValueError:
+                    # Chunks without text parts (e.g. only safety metadata)
+                    continue
+                yield text
+        except self.retryable as e:
+            raise RetryableLLMError(str(e)) from e
+
+class StubProvider:
+    # Deterministic offline backend for development and load tests. Builds well-formed questions
+    # from words in the study material after a configurable delay; error_rate injects seeded
+    # retryable failures to exercise the backoff path.
+
+    model_name = "stub"
+
+    def __init__(self, latency=1.0, error_rate=0.0, seed=0):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+
+    def fail_randomly(self):
+        with self.lock:
+            roll = self.random.random()
+        if roll < self.error_rate:
+            raise RetryableLLMError("stub: simulated 429")
+
+    def respond(self, prompt):
+        count_match = re.search(r"Generate (\d+)", prompt)
+        count = int(count_match.group(1)) if count_match else 5
+        material = prompt.split("STUDY MATERIAL:", 1)[-1]
+        words = sorted(set(re.findall(r"[A-Za-z]{5,}", material))) or ["material"]
+        seed = int(hashlib.sha256(material.encode('utf-8')).hexdigest(), 16)
+
+        questions = []
+        for number in range(count):
+            index = (seed + number * 7919) % len(words)
+            word = words[index]
+            before, after = words[index - 1], words[(index + 1) % len(words)]
+            answers = [word, "photosynthesis", "subduction", "equilibrium"]
+            correct = (seed + number) % 4
+            answers[0], answers[correct] = answers[correct], answers[0]
+            answers[correct] += "*"
+            questions.append(f"Which term comes between {before} and {after} in the study material? ; {', '.join(answers)}")
+        return " | ".join(questions)
+
+    def generate(self, prompt):
+        time.sleep(self.latency)
+        self.fail_randomly()
+        return self.respond(prompt)
+
+    def stream(self, prompt):
+        self.fail_randomly()
+        text = self.respond(prompt)
+        pieces = [text[i:i + 40] for i in range(0, len(text), 40)]
+        for piece in pieces:
+            time.sleep(self.latency / len(pieces))
+            yield piece
+
+class TokenBucket:
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, timeout):
+        # Block until a token is available; False if that would take longer than timeout
+        deadline = time.monotonic() + timeout
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return True
+                wait = (1 - self.tokens) / self.rate
+            if now + wait > deadline:
+                return False
+            time.sleep(wait)
+
+class LLMClient:
+    def __init__(self, provider, rate_per_second=5.0, burst=10, max_in_flight=8, max_retries=3,
+                 retry_base_seconds=1.0, retry_max_seconds=20.0, acquire_timeout=60.0):
+        self.provider = provider
+        self.model_name = provider.model_name
+        self.bucket = TokenBucket(rate_per_second, burst) if rate_per_second else None
+        self.slots = threading.BoundedSemaphore(max_in_flight)
+        self.max_retries = max_retries
+        self.retry_base_seconds = retry_base_seconds
+        self.retry_max_seconds = retry_max_seconds
+        self.acquire_timeout = acquire_timeout
+
+    def acquire(self):
+        if self.bucket and not self.bucket.acquire(self.acquire_timeout):
+            raise LLMBusyError("Question generation is busy, please try again shortly")
+        if not self.slots.acquire(timeout=self.acquire_timeout):
+            raise LLMBusyError("Question generation is busy, please try again shortly")
+
+    def backoff(self, attempt, error):
+        # Full jitter: sleep a random amount up to the exponential cap
+        delay = random.uniform(0, min(self.retry_max_seconds, self.retry_base_seconds * 2 ** attempt))
+        logging.warning(f"LLM call failed ({error}), retry {attempt + 1}/{self.max_retries} in {delay:.2f}s")
+        time.sleep(delay)
+
+    def generate(self, prompt):
+        for attempt in range(self.max_retries + 1):
+            self.acquire()
+            try:
+                return self.provider.generate(prompt)
+            except RetryableLLMError as e:
+                if attempt == self.max_retries:
+                    raise
+                error = e
+            finally:
+                self.slots.release()
+            self.backoff(attempt, error)
+
+    def stream(self, prompt):
+        # Retries only happen before the first chunk; after that the caller has already used output
+        for attempt in range(self.max_retries + 1):
+            self.acquire()
+            started = False
+            try:
+                for text in self.provider.stream(prompt):
+                    started = True
+                    yield text
+                return
+            except RetryableLLMError as e:
+                if started or attempt == self.max_retries:
+                    raise
+                error = e
+            finally:
+                self.slots.release()
+            self.backoff(attempt, error)
+
+def configured_model_name(config):
+    # Known from the config alone, without building a client or importing the provider SDK
+    return StubProvider.model_name if config['LLM_PROVIDER'] == 'stub' else config['GEMINI_MODEL']
+
+def create_client(config):
+    # Built from one app's config; the app keeps it (app.extensions['llm_client']) so every
+    # request of that app shares its rate limit and in-flight cap
+    if config['LLM_PROVIDER'] == 'stub':
+        provider = StubProvider(latency=config['LLM_STUB_LATENCY_SECONDS'], error_rate=config['LLM_STUB_ERROR_RATE'])
+    else:
+        if not config['GEMINI_API_KEY']:
+            logging.warning("GEMINI_API_KEY not found in environment variables")
+        provider = GeminiProvider(config['GEMINI_API_KEY'], config['GEMINI_MODEL'])
+    return LLMClient(
+        provider,
+        rate_per_second=config['LLM_RATE_PER_SECOND'],
+        burst=config['LLM_BURST'],
+        max_in_flight=config['LLM_MAX_IN_FLIGHT'],
+        max_retries=config['LLM_MAX_RETRIES'],
+        retry_base_seconds=config['LLM_RETRY_BASE_SECONDS'],
+        retry_max_seconds=config['LLM_RETRY_MAX_SECONDS'],
+        acquire_timeout=config['LLM_ACQUIRE_TIMEOUT_SECONDS']
+    )
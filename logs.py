@@ -0,0 +1,47 @@
+import json
+import logging
+import sys
+from datetime import datetime, timezone
+
+# Fields every LogRecord has; anything else came in through extra= and is logged as structured data
+RECORD_FIELDS = set(vars(logging.LogRecord('', 0, '', 0, '', None, None))) | {'message', 'asctime'}
+
+def record_fields(record):
+    return {key: value for key, value in vars(record).items() if key not in RECORD_FIELDS}
+
+class JSONFormatter(logging.Formatter):
+    # One JSON object per line, for log shippers
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            **record_fields(record)
+        }
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+class TextFormatter(logging.Formatter):
+    # Human-readable, with structured fields appended as key=value
+    def __init__(self):
+        super().__init__('%(asctime)s %(levelname)s %(name)s: %(message)s')
+
+    def format(self, record):
+        text = super().format(record)
+        fields = record_fields(record)
+        if fields:
+            text += ' ' + ' '.join(f"{key}={value}" for key, value in fields.items())
+        return text
+
+def configure_logging(level='INFO', fmt='text'):
+    # Idempotent: create_app() may run more than once per process (tests, CLI)
+    root = logging.getLogger()
+    handler = next((h for h in root.handlers if getattr(h, 'quizifai', False)), None)
+    if handler is None:
+        handler = logging.StreamHandler(sys.stderr)
+        handler.quizifai = True
+        root.addHandler(handler)
+    handler.setFormatter(JSONFormatter() if fmt == 'json' else TextFormatter())
+    root.setLevel(level.upper())
@@ -0,0 +1,52 @@
+import threading
+from collections import OrderedDict
+
+class LRUCache:
+    # Thread-safe in-process cache holding at most max_entries values, evicting the least
+    # recently used one. Each gunicorn worker has its own copy.
+
+    def __init__(self, max_entries=1000):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, is_current=None):
+        # is_current(value) -> False drops an entry that is out of date and counts a miss
+        with self.lock:
+            value = self.entries.get(key)
+            if value is not None and is_current and not is_current(value):
+                del self.entries[key]
+                value = None
+            if value is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        with self.lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def pop(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "entries": len(self.entries),
+                "max_entries": self.max_entries
+            }
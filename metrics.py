@@ -0,0 +1,216 @@
+import bisect
+import logging
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+# Prometheus-style counters, gauges and histograms rendered in the text exposition format for
+# /metrics. Like the cache stats, every gunicorn worker keeps its own values, so the numbers
+# start again from zero when a worker restarts and each scrape sees only the worker that answered.
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+CHARACTER_BUCKETS = (100, 1000, 5000, 10000, 25000, 50000, 100000, 250000, 1000000)
+PAGE_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500)
+TOKEN_BUCKETS = (250, 1000, 2500, 5000, 10000, 25000, 50000, 100000)
+BYTE_BUCKETS = (16 * 1024, 64 * 1024, 256 * 1024, 1024 ** 2, 4 * 1024 ** 2, 16 * 1024 ** 2)
+
+# Coarse input size label for stage timings: characters (bytes for uploads) -> band
+SIZE_BANDS = ((1000, 'xs'), (10000, 's'), (100000, 'm'), (1000000, 'l'))
+
+def size_band(amount):
+    if amount is None:
+        return 'none'
+    for limit, band in SIZE_BANDS:
+        if amount < limit:
+            return band
+    return 'xl'
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def format_labels(names, values, extra=()):
+    pairs = [f'{name}="{escape_label(value)}"' for name, value in list(zip(names, values)) + list(extra)]
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+def format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self.lock:
+            for labels, value in sorted(self.values.items()):
+                lines.extend(self.samples(labels, value))
+        return lines
+
+    def samples(self, labels, value):
+        return [f"{self.name}{format_labels(self.labelnames, labels)} {format_value(value)}"]
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self.key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+class Gauge(Metric):
+    kind = 'gauge'
+
+    def inc(self, amount=1, **labels):
+        key = self.key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value, **labels):
+        key = self.key(labels)
+        with self.lock:
+            self.values[key] = value
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, amount, **labels):
+        key = self.key(labels)
+        with self.lock:
+            counts, total = self.values.get(key, ([0] * (len(self.buckets) + 1), 0.0))
+            # Per-bucket counts; render() turns them into the cumulative le= series
+            counts[bisect.bisect_left(self.buckets, amount)] += 1
+            self.values[key] = (counts, total + amount)
+
+    def samples(self, labels, value):
+        counts, total = value
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (math.inf,), counts):
+            cumulative += count
+            le = (('le', format_value(float(bound))),)
+            lines.append(f"{self.name}_bucket{format_labels(self.labelnames, labels, le)} {cumulative}")
+        label_text = format_labels(self.labelnames, labels)
+        lines.append(f"{self.name}_sum{label_text} {format_value(total)}")
+        lines.append(f"{self.name}_count{label_text} {cumulative}")
+        return lines
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+REGISTRY = Registry()
+
+PROCESS_START_TIME = REGISTRY.register(Gauge(
+    'quizifai_process_start_time_seconds', "Unix time the worker process started"))
+PROCESS_START_TIME.set(round(time.time(), 3))
+
+HTTP_REQUEST_SECONDS = REGISTRY.register(Histogram(
+    'quizifai_http_request_seconds', "Time to produce a response (streamed bodies excluded)",
+    ('endpoint', 'method', 'status')))
+HTTP_REQUESTS_IN_FLIGHT = REGISTRY.register(Gauge(
+    'quizifai_http_requests_in_flight', "Requests this worker is currently handling"))
+
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    'quizifai_stage_seconds', "Time spent in each generation stage",
+    ('stage', 'kind', 'outcome', 'size')))
+STAGE_CHARACTERS = REGISTRY.register(Histogram(
+    'quizifai_stage_characters', "Characters handled by each stage", ('stage', 'kind'), CHARACTER_BUCKETS))
+STAGE_PAGES = REGISTRY.register(Histogram(
+    'quizifai_stage_pages', "PDF pages extracted", ('stage', 'kind'), PAGE_BUCKETS))
+STAGE_BYTES = REGISTRY.register(Histogram(
+    'quizifai_stage_bytes', "Upload sizes", ('stage', 'kind'), BYTE_BUCKETS))
+
+PROMPT_TOKENS = REGISTRY.register(Histogram(
+    'quizifai_prompt_tokens', "Estimated study material tokens before and after condensing",
+    ('kind', 'phase'), TOKEN_BUCKETS))
+
+JOB_QUEUE_DEPTH = REGISTRY.register(Gauge(
+    'quizifai_job_queue_depth', "Generation jobs waiting for a job worker thread"))
+
+COALESCED = REGISTRY.register(Counter(
+    'quizifai_coalesced_total', "Extractions and LLM calls served by an identical one already in flight", ('stage',)))
+
+GENERATIONS = REGISTRY.register(Counter(
+    'quizifai_generations_total', "Generation requests by input kind and outcome", ('kind', 'outcome')))
+
+# ============ STAGE SPANS ============
+
+_active = threading.local()
+
+@contextmanager
+def span(stage, **fields):
+    # Time one stage of a request or job. The yielded dict can be filled in as the stage learns
+    # more: kind (text/pdf/image), outcome (defaults to ok, error on an exception), characters,
+    # pages, bytes. annotate() reaches the innermost open span from code that has no handle on it.
+    record = {'kind': 'none', 'outcome': 'ok', **fields}
+    stack = _active.__dict__.setdefault('stack', [])
+    stack.append(record)
+    started = time.perf_counter()
+    try:
+        yield record
+    except GeneratorExit:
+        # A streamed response whose client went away
+        record['outcome'] = 'cancelled'
+        raise
+    except Exception:
+        if record['outcome'] == 'ok':
+            record['outcome'] = 'error'
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        # Streamed responses can close spans out of order, so match by identity
+        for index in range(len(stack) - 1, -1, -1):
+            if stack[index] is record:
+                del stack[index]
+                break
+        finish_span(stage, record, elapsed)
+
+def annotate(**fields):
+    stack = getattr(_active, 'stack', None)
+    if stack:
+        stack[-1].update(fields)
+
+def finish_span(stage, record, elapsed):
+    kind = record['kind']
+    characters, pages, size_bytes = record.get('characters'), record.get('pages'), record.get('bytes')
+    STAGE_SECONDS.observe(elapsed, stage=stage, kind=kind, outcome=record['outcome'],
+                          size=size_band(characters if characters is not None else size_bytes))
+    if characters is not None:
+        STAGE_CHARACTERS.observe(characters, stage=stage, kind=kind)
+    if pages is not None:
+        STAGE_PAGES.observe(pages, stage=stage, kind=kind)
+    if size_bytes is not None:
+        STAGE_BYTES.observe(size_bytes, stage=stage, kind=kind)
+    logging.debug(f"{stage} {record['outcome']} in {elapsed * 1000:.1f} ms",
+                  extra={'stage': stage, 'duration_ms': round(elapsed * 1000, 3), **record})
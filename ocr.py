@@ -0,0 +1,110 @@
+import io
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+from PIL import Image, ImageOps
+
+try:
+    import pytesseract
+except ImportError:
+    pytesseract = None
+
+# Tesseract parallelises a single page with OpenMP; with several jobs in flight that just
+# oversubscribes the CPU, so each process gets one thread and the pool provides the parallelism.
+os.environ.setdefault('OMP_THREAD_LIMIT', '1')
+
+_pool = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+
+def get_pool(max_workers=2):
+    # Each job runs exactly one Tesseract subprocess, so the pool size caps them per server process.
+    # The first call sizes the pool; asking for another size later is a configuration error.
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='ocr')
+            _pool_workers = max_workers
+        elif max_workers != _pool_workers:
+            raise ValueError(f"OCR pool already started with {_pool_workers} workers, not {max_workers}")
+        return _pool
+
+def otsu_threshold(histogram):
+    # Grey level that best separates a 256-bin histogram into foreground and background
+    total = sum(histogram)
+    weighted_total = sum(level * count for level, count in enumerate(histogram))
+    background = background_sum = 0
+    best_level, best_variance = 127, 0.0
+    for level, count in enumerate(histogram):
+        background += count
+        if background == 0:
+            continue
+        foreground = total - background
+        if foreground == 0:
+            break
+        background_sum += level * count
+        background_mean = background_sum / background
+        foreground_mean = (weighted_total - background_sum) / foreground
+        variance = background * foreground * (background_mean - foreground_mean) ** 2
+        if variance > best_variance:
+            best_level, best_variance = level, variance
+    return best_level
+
+def preprocess_image(image, target_dpi=300, max_dimension=2500):
+    # Phone photos arrive rotated via EXIF and far larger than Tesseract needs; normalise them
+    # to an upright, bounded-size, black-and-white image before OCR.
+    image = ImageOps.exif_transpose(image)
+
+    scale = 1.0
+    dpi = image.info.get('dpi')
+    if dpi and dpi[0] and dpi[0] > target_dpi:
+        scale = target_dpi / float(dpi[0])
+    longest = max(image.size) * scale
+    if max_dimension and longest > max_dimension:
+        scale *= max_dimension / longest
+    if scale < 1.0:
+        size = (max(int(image.width * scale), 1), max(int(image.height * scale), 1))
+        image = image.resize(size, Image.LANCZOS)
+
+    if image.mode in ('RGBA', 'LA', 'P'):
+        # Transparent screenshots would turn black when the alpha channel is dropped
+        rgba = image.convert('RGBA')
+        image = Image.new('RGBA', rgba.size, (255, 255, 255, 255))
+        image.alpha_composite(rgba)
+    image = image.convert('L')
+    threshold = otsu_threshold(image.histogram())
+    return image.point(lambda value: 255 if value > threshold else 0, mode='1')
+
+def read_image_bytes(source):
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, 'rb') as image_file:
+            return image_file.read()
+    source.seek(0)
+    return source.read()
+
+def run_ocr(data, timeout, target_dpi, max_dimension):
+    # Runs on a pool thread: decode, preprocess and OCR one image
+    with Image.open(io.BytesIO(data)) as image:
+        prepared = preprocess_image(image, target_dpi=target_dpi, max_dimension=max_dimension)
+    return pytesseract.image_to_string(prepared, timeout=timeout)
+
+def image_to_text(source, timeout=30, queue_timeout=30, max_workers=2, target_dpi=300, max_dimension=2500):
+    # OCR an image path or file object through the bounded pool. timeout limits the Tesseract run
+    # itself; queue_timeout limits how long the job may wait for a free slot under load. The
+    # bytes are read here: a job still running after we give up (cancel() cannot stop it, only
+    # pytesseract's own timeout does) must not read an upload the caller has already closed.
+    data = read_image_bytes(source)
+    future = get_pool(max_workers).submit(run_ocr, data, timeout, target_dpi, max_dimension)
+    try:
+        return future.result(timeout=queue_timeout + timeout)
+    except TimeoutError:
+        future.cancel()
+        logging.warning("OCR job timed out after %ss", queue_timeout + timeout)
+        raise Exception("Image text extraction timed out. Please try a smaller or clearer image.")
+    except RuntimeError as e:
+        # pytesseract kills the subprocess and raises RuntimeError when its own timeout expires
+        if 'timeout' in str(e).lower():
+            raise Exception("Image text extraction timed out. Please try a smaller or clearer image.")
+        raise
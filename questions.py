@@ -0,0 +1,96 @@
+import dedup
+
+# Gemini is asked for: Question? ; answer1, answer2, answer3*, answer4 | Next question? ; ...
+
+def parse_question(raw):
+    # Returns {"question", "answers", "correct_index"} or None when the text breaks the format
+    parts = [part.strip() for part in raw.split(';')]
+    if len(parts) != 2 or not parts[0]:
+        return None
+    answers = [answer.strip() for answer in parts[1].split(',')]
+    if len(answers) != 4:
+        return None
+
+    correct = [i for i, answer in enumerate(answers) if answer.endswith('*')]
+    if len(correct) != 1:
+        return None
+    answers[correct[0]] = answers[correct[0]][:-1].strip()
+    if not all(answers):
+        return None
+    return {"question": parts[0], "answers": answers, "correct_index": correct[0]}
+
+def parse_questions(ai_response):
+    questions = []
+    for raw in ai_response.split('|'):
+        question = parse_question(raw.strip())
+        if question:
+            questions.append(question)
+    return questions
+
+class QuestionStreamParser:
+    # Incremental parser for a streamed response: feed() text as it arrives and get back the
+    # questions completed so far. A question is complete once the following "|" arrives, or at close().
+
+    def __init__(self):
+        self.buffer = ""
+        self.accepted = 0
+        self.rejected = 0
+
+    def feed(self, text):
+        self.buffer += text
+        *complete, self.buffer = self.buffer.split('|')
+        return self.parse(complete)
+
+    def close(self):
+        remaining, self.buffer = [self.buffer], ""
+        return self.parse(remaining)
+
+    def parse(self, raws):
+        questions = []
+        for raw in raws:
+            raw = raw.strip()
+            if not raw:
+                continue
+            question = parse_question(raw)
+            if question:
+                questions.append(question)
+                self.accepted += 1
+            else:
+                self.rejected += 1
+        return questions
+
+def format_question(question):
+    answers = [answer + '*' if i == question['correct_index'] else answer
+               for i, answer in enumerate(question['answers'])]
+    return f"{question['question']} ; {', '.join(answers)}"
+
+def format_questions(questions):
+    return " | ".join(format_question(question) for question in questions)
+
+def question_shingles(question):
+    shingle_set, _ = dedup.fingerprint(question['question'], question['answers'][question['correct_index']])
+    return shingle_set
+
+def is_duplicate(shingle_set, seen, threshold):
+    # Same similarity as the saved-question check (dedup.jaccard), against the questions kept so far
+    return any(dedup.jaccard(shingle_set, other) >= threshold for other in seen)
+
+def merge_questions(question_lists, total, threshold=0.7):
+    # Take questions round-robin across chunks so every part of the material is represented,
+    # skipping near-duplicates produced by overlapping chunks, until total are collected.
+    # threshold=0 keeps duplicates.
+    merged = []
+    seen = []
+    rounds = max((len(questions) for questions in question_lists), default=0)
+    for position in range(rounds):
+        for questions in question_lists:
+            if len(merged) >= total:
+                return merged
+            if position >= len(questions):
+                continue
+            shingle_set = question_shingles(questions[position])
+            if threshold and is_duplicate(shingle_set, seen, threshold):
+                continue
+            seen.append(shingle_set)
+            merged.append(questions[position])
+    return merged
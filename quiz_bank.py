@@ -0,0 +1,76 @@
+import hashlib
+import json
+import os
+import tempfile
+from datetime import datetime
+
+from uploads import COPY_BUFFER_BYTES, SNIFF_BYTES, detect_file_type
+
+# Offline quiz-bank builds (flask --app app build-quiz-bank). The manifest is a JSON file mapping
+# the SHA-256 of each source file to how its build went, so a rerun skips files that are done,
+# even renamed or moved ones, and retries the ones that failed or were never reached.
+
+MANIFEST_VERSION = 1
+
+def hash_file(path):
+    # -> (sha256 hex digest, first SNIFF_BYTES bytes)
+    digest = hashlib.sha256()
+    head = b''
+    with open(path, 'rb') as source:
+        while True:
+            block = source.read(COPY_BUFFER_BYTES)
+            if not block:
+                break
+            if len(head) < SNIFF_BYTES:
+                head += block[:SNIFF_BYTES - len(head)]
+            digest.update(block)
+    return digest.hexdigest(), head
+
+def find_sources(directory):
+    # PDFs and images directly in directory, in name order, one per distinct content:
+    # [{"path", "file_type" ('pdf' | 'png' | 'jpeg'), "content_hash"}]
+    sources = []
+    seen = set()
+    for name in sorted(os.listdir(directory)):
+        path = os.path.join(directory, name)
+        if not os.path.isfile(path):
+            continue
+        content_hash, head = hash_file(path)
+        file_type = detect_file_type(name, head)
+        if file_type is None or content_hash in seen:
+            continue
+        seen.add(content_hash)
+        sources.append({"path": path, "file_type": file_type, "content_hash": content_hash})
+    return sources
+
+class Manifest:
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as manifest_file:
+                data = json.load(manifest_file)
+            if data.get('version') != MANIFEST_VERSION:
+                raise ValueError(f"{path} is not a version {MANIFEST_VERSION} quiz bank manifest")
+            self.entries = data['files']
+
+    def is_done(self, content_hash):
+        return self.entries.get(content_hash, {}).get('status') == 'done'
+
+    def record(self, content_hash, **fields):
+        # Saved after every file, so an interrupted build loses at most the files in flight
+        self.entries[content_hash] = {**fields, 'updated_at': datetime.utcnow().isoformat(timespec='seconds')}
+        self.save()
+
+    def save(self):
+        # Write a sibling temp file and rename it over the manifest: a crash never leaves half a file
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        descriptor, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(descriptor, 'w', encoding='utf-8') as temp_file:
+                json.dump({'version': MANIFEST_VERSION, 'files': self.entries}, temp_file, indent=2, sort_keys=True)
+            os.replace(temp_path, self.path)
+        except Exception:
+            os.remove(temp_path)
+            raise
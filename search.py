@@ -0,0 +1,144 @@
+import logging
+import re
+import sqlite3
+
+from sqlalchemy import bindparam, text
+
+# Full-text search over a user's quizzes and questions. Each quiz and question is one search
+# document whose id encodes both: 2 * question id for questions, 2 * quiz id + 1 for quizzes.
+# Documents hold quiz titles, question text and options; results are joined back to the real rows.
+#
+# SQLite: an FTS5 table ranked with bm25(). Every document carries its owner as a "u<user id>"
+# token, so a search intersects the user's posting list with the terms' and only matches their
+# documents. That posting list is still scanned, and bm25() uses statistics from the whole index,
+# other users' documents included. Postgres: a table of weighted tsvectors with a GIN index, ranked by ts_rank_cd.
+
+MAX_TERMS = 10
+# Shorter trailing words are matched whole: a one- or two-letter prefix expands to most of the vocabulary
+MIN_PREFIX_CHARS = 3
+DELETE_BATCH = 500
+
+def question_doc_id(question_id):
+    return question_id * 2
+
+def quiz_doc_id(quiz_id):
+    return quiz_id * 2 + 1
+
+def split_doc_id(doc_id):
+    # -> ('question' | 'quiz', row id)
+    return ('quiz', (doc_id - 1) // 2) if doc_id % 2 else ('question', doc_id // 2)
+
+def query_terms(query):
+    # Plain words only: whatever the user types never reaches the match syntax as operators
+    return re.findall(r"\w+", (query or "").lower())[:MAX_TERMS]
+
+def is_prefix(term):
+    return len(term) >= MIN_PREFIX_CHARS
+
+class SQLiteSearch:
+    name = 'fts5'
+
+    def create(self, session):
+        session.execute(text(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5("
+            "owner, title, question, options, tokenize = 'porter unicode61 remove_diacritics 2')"
+        ))
+
+    def drop(self, session):
+        # Dropping the virtual table removes its shadow tables too
+        session.execute(text("DROP TABLE IF EXISTS search_index"))
+
+    def is_empty(self, session):
+        return session.execute(text("SELECT rowid FROM search_index LIMIT 1")).first() is None
+
+    def add(self, session, documents):
+        if documents:
+            session.execute(text(
+                "INSERT INTO search_index (rowid, owner, title, question, options) "
+                "VALUES (:doc_id, 'u' || :user_id, :title, :question, :options)"
+            ), documents)
+
+    def remove(self, session, doc_ids):
+        statement = text("DELETE FROM search_index WHERE rowid IN :doc_ids").bindparams(bindparam('doc_ids', expanding=True))
+        for start in range(0, len(doc_ids), DELETE_BATCH):
+            session.execute(statement, {'doc_ids': doc_ids[start:start + DELETE_BATCH]})
+
+    def search(self, session, user_id, terms, limit, offset):
+        # All terms must match; the last one as a prefix so partial words find results
+        *words, last = terms
+        match = " ".join([f"owner : u{user_id}"] + [f'"{word}"' for word in words]
+                         + [f'"{last}" *' if is_prefix(last) else f'"{last}"'])
+        # bm25 weights per column: owner, title, question, options (lower scores rank first)
+        return session.execute(text(
+            "SELECT rowid, bm25(search_index, 0.0, 3.0, 2.0, 1.0) AS score FROM search_index "
+            "WHERE search_index MATCH :match ORDER BY score, rowid LIMIT :limit OFFSET :offset"
+        ), {'match': match, 'limit': limit, 'offset': offset}).all()
+
+class PostgresSearch:
+    name = 'tsvector'
+
+    def create(self, session):
+        session.execute(text(
+            "CREATE TABLE IF NOT EXISTS search_document ("
+            "doc_id BIGINT PRIMARY KEY, user_id INTEGER NOT NULL, document TSVECTOR NOT NULL)"
+        ))
+        session.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_search_document_document ON search_document USING GIN (document)"
+        ))
+        session.execute(text("CREATE INDEX IF NOT EXISTS ix_search_document_user_id ON search_document (user_id)"))
+
+    def drop(self, session):
+        session.execute(text("DROP TABLE IF EXISTS search_document"))
+
+    def is_empty(self, session):
+        return session.execute(text("SELECT doc_id FROM search_document LIMIT 1")).first() is None
+
+    def add(self, session, documents):
+        if documents:
+            session.execute(text(
+                "INSERT INTO search_document (doc_id, user_id, document) VALUES (:doc_id, :user_id, "
+                "setweight(to_tsvector('english', :title), 'A') || "
+                "setweight(to_tsvector('english', :question), 'B') || "
+                "setweight(to_tsvector('english', :options), 'C')) "
+                "ON CONFLICT (doc_id) DO UPDATE SET user_id = EXCLUDED.user_id, document = EXCLUDED.document"
+            ), documents)
+
+    def remove(self, session, doc_ids):
+        statement = text("DELETE FROM search_document WHERE doc_id IN :doc_ids").bindparams(bindparam('doc_ids', expanding=True))
+        for start in range(0, len(doc_ids), DELETE_BATCH):
+            session.execute(statement, {'doc_ids': doc_ids[start:start + DELETE_BATCH]})
+
+    def search(self, session, user_id, terms, limit, offset):
+        *words, last = terms
+        tsquery = " & ".join(words + [f"{last}:*" if is_prefix(last) else last])
+        return session.execute(text(
+            "SELECT doc_id, ts_rank_cd(document, query) AS score "
+            "FROM search_document, to_tsquery('english', :tsquery) AS query "
+            "WHERE user_id = :user_id AND document @@ query "
+            "ORDER BY score DESC, doc_id LIMIT :limit OFFSET :offset"
+        ), {'tsquery': tsquery, 'user_id': user_id, 'limit': limit, 'offset': offset}).all()
+
+_fts5_available = None
+
+def fts5_available():
+    # Checked once against an in-memory database: some SQLite builds leave FTS5 out
+    global _fts5_available
+    if _fts5_available is None:
+        connection = sqlite3.connect(':memory:')
+        try:
+            connection.execute("CREATE VIRTUAL TABLE probe USING fts5(body)")
+            _fts5_available = True
+        except sqlite3.OperationalError:
+            logging.warning("SQLite was built without FTS5 - search will not be available")
+            _fts5_available = False
+        finally:
+            connection.close()
+    return _fts5_available
+
+def backend_for(dialect_name):
+    # None when the database has no supported full-text index
+    if dialect_name == 'sqlite':
+        return SQLiteSearch() if fts5_available() else None
+    if dialect_name == 'postgresql':
+        return PostgresSearch()
+    return None
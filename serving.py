@@ -0,0 +1,17 @@
+import sys
+
+# Serving modes (see gunicorn.conf.py). The default gthread worker serves one request per thread,
+# so a worker handles at most WEB_THREADS generations at once, each thread idle while Gemini
+# answers. With WEB_WORKER_CLASS=gevent, gunicorn monkey-patches the standard library before
+# loading the app and runs every request on a greenlet: waiting on a socket, a lock or
+# time.sleep yields to the other requests, so one worker holds up to WEB_WORKER_CONNECTIONS
+# generations in flight. CPU-bound work still stalls every greenlet on the worker, so code that
+# parses or computes for long checks cooperative() and moves the work out of the process.
+
+def cooperative():
+    # True when running on a gevent-patched standard library (gunicorn -k gevent).
+    # gevent is never imported here: a worker that did not load it cannot be patched.
+    if 'gevent' not in sys.modules:
+        return False
+    from gevent import monkey
+    return monkey.is_module_patched('socket')
@@ -0,0 +1,262 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+# Coalesces identical concurrent work (extracting the same upload, generating from the same
+# text) so it runs once and every caller gets its result. Within a process, later callers of a
+# key wait on the first one. Across the gunicorn workers of one host, a small SQLite file holds a
+# lease per key: the worker holding it does the work and writes the result (or error) there, the
+# others poll for it. A lease that runs out (its worker died) is taken over by a waiting caller.
+#
+#     ticket = flights.begin(key)
+#     if not ticket.leading:
+#         result = ticket.wait()       # may take over the lease, making this caller the leader
+#     if ticket.leading:
+#         ... do the work, then ticket.finish(result), ticket.fail(error) or ticket.abandon()
+#
+# do(key, fn) wraps that for plain calls. Results must be JSON-serializable.
+
+class FlightError(Exception):
+    # The shared call failed with an exception that is not re-raised as its own type
+    pass
+
+class LeaseStore:
+    def __init__(self, path, lease_seconds=300, poll_seconds=0.05, max_poll_seconds=0.5, result_seconds=60):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.poll_seconds = poll_seconds
+        self.max_poll_seconds = max_poll_seconds
+        self.result_seconds = result_seconds
+        self.ready = False
+        self.ready_lock = threading.Lock()
+
+    def connect(self):
+        # One short-lived connection per call: cheap for SQLite and safe from any thread
+        if not self.ready:
+            with self.ready_lock:
+                if not self.ready:
+                    directory = os.path.dirname(os.path.abspath(self.path))
+                    os.makedirs(directory, exist_ok=True)
+                    with sqlite3.connect(self.path, timeout=10) as connection:
+                        connection.execute("PRAGMA journal_mode=WAL")
+                        connection.execute(
+                            "CREATE TABLE IF NOT EXISTS flight (key TEXT PRIMARY KEY, owner TEXT NOT NULL, "
+                            "status TEXT NOT NULL, expires_at REAL NOT NULL, result TEXT, error_type TEXT, error TEXT)"
+                        )
+                    self.ready = True
+        return sqlite3.connect(self.path, timeout=10, isolation_level=None)
+
+    def acquire(self, key):
+        # -> (owner token of the running flight, True if this caller now holds the lease).
+        # Finished rows only serve callers already waiting on them; a new caller starts over.
+        connection = self.connect()
+        try:
+            connection.execute("BEGIN IMMEDIATE")
+            row = connection.execute("SELECT owner, status, expires_at FROM flight WHERE key = ?", (key,)).fetchone()
+            now = time.time()
+            if row and row[1] == 'running' and row[2] > now:
+                connection.execute("COMMIT")
+                return row[0], False
+            owner = uuid.uuid4().hex
+            connection.execute(
+                "INSERT OR REPLACE INTO flight (key, owner, status, expires_at) VALUES (?, ?, 'running', ?)",
+                (key, owner, now + self.lease_seconds)
+            )
+            connection.execute("COMMIT")
+            return owner, True
+        except BaseException:
+            if connection.in_transaction:
+                connection.execute("ROLLBACK")
+            raise
+        finally:
+            connection.close()
+
+    def finish(self, key, owner, status, result=None, error=None):
+        # Kept result_seconds for the waiters to pick up, then cleared by a later finish
+        connection = self.connect()
+        try:
+            now = time.time()
+            connection.execute(
+                "UPDATE flight SET status = ?, expires_at = ?, result = ?, error_type = ?, error = ? "
+                "WHERE key = ? AND owner = ?",
+                (status, now + self.result_seconds, json.dumps(result) if status == 'done' else None,
+                 type(error).__name__ if error is not None else None, str(error) if error is not None else None,
+                 key, owner)
+            )
+            connection.execute("DELETE FROM flight WHERE expires_at < ?", (now,))
+        finally:
+            connection.close()
+
+    def release(self, key, owner):
+        # Give the lease up without a result; a waiter takes it over
+        connection = self.connect()
+        try:
+            connection.execute("DELETE FROM flight WHERE key = ? AND owner = ?", (key, owner))
+        finally:
+            connection.close()
+
+    def wait(self, key, owner):
+        # -> ('done', result) or ('failed', (error type name, message)) once owner's flight ends,
+        # None when its lease was given up or ran out
+        delay = self.poll_seconds
+        while True:
+            connection = self.connect()
+            try:
+                row = connection.execute(
+                    "SELECT owner, status, expires_at, result, error_type, error FROM flight WHERE key = ?", (key,)
+                ).fetchone()
+            finally:
+                connection.close()
+            if row is None or row[0] != owner:
+                return None
+            if row[1] == 'done':
+                return 'done', json.loads(row[3])
+            if row[1] == 'failed':
+                return 'failed', (row[4], row[5])
+            if row[2] <= time.time():
+                logging.warning(f"Single-flight lease on {key} ran out, taking over")
+                return None
+            time.sleep(delay)
+            delay = min(delay * 2, self.max_poll_seconds)
+
+class Flight:
+    # In-process state of one key: the first caller's outcome, handed to the threads waiting on it
+    def __init__(self):
+        self.done = threading.Event()
+        self.outcome = None  # ('done', result), ('failed', exception) or ('abandoned', None)
+
+class Ticket:
+    def __init__(self, flights, key):
+        self.flights = flights
+        self.key = key
+        self.join()
+
+    def join(self):
+        self.flight, self.local_leader = self.flights.join_local(self.key)
+        self.owner = None
+        self.leading = False
+        if self.local_leader:
+            if self.flights.store is None:
+                self.leading = True
+            else:
+                self.acquire()
+
+    def acquire(self):
+        # An unusable store only loses the coalescing across processes
+        try:
+            self.owner, self.leading = self.flights.store.acquire(self.key)
+        except (sqlite3.Error, OSError) as e:
+            logging.warning(f"Single-flight store unavailable ({e}), running {self.key} here")
+            self.owner, self.leading = None, True
+
+    def wait(self):
+        # Result of the caller doing the work; raises its error. Returns None with self.leading
+        # set when that caller gave up and this one has taken its place.
+        while True:
+            if self.local_leader:
+                # Another worker process holds the lease: poll for its result on behalf of every
+                # thread here waiting on this key
+                try:
+                    outcome = self.flights.store.wait(self.key, self.owner)
+                except (sqlite3.Error, OSError) as e:
+                    logging.warning(f"Single-flight store unavailable ({e}), running {self.key} here")
+                    self.owner, self.leading = None, True
+                    return None
+                if outcome is None:
+                    self.acquire()
+                    if self.leading:
+                        return None
+                    continue
+                status, value = outcome
+                if status == 'done':
+                    self.flights.settle(self.key, self.flight, ('done', value))
+                    return value
+                error = self.flights.rebuild_error(*value)
+                self.flights.settle(self.key, self.flight, ('failed', error))
+                raise error
+
+            self.flight.done.wait()
+            status, value = self.flight.outcome
+            if status == 'done':
+                return value
+            if status == 'failed':
+                raise value
+            # Abandoned: queue up again, possibly as the new leader
+            self.join()
+            if self.leading:
+                return None
+
+    def finish(self, result):
+        self.settle(('done', result), lambda store: store.finish(self.key, self.owner, 'done', result=result))
+
+    def fail(self, error):
+        self.settle(('failed', error), lambda store: store.finish(self.key, self.owner, 'failed', error=error))
+
+    def abandon(self):
+        # The leader stopped without an outcome (a streamed client went away): a waiter takes over
+        self.settle(('abandoned', None), lambda store: store.release(self.key, self.owner))
+
+    def settle(self, outcome, publish):
+        # Threads here are released even when the store write fails; waiters in other processes
+        # then take over once the lease runs out
+        try:
+            if self.owner is not None:
+                publish(self.flights.store)
+        except (sqlite3.Error, OSError) as e:
+            logging.warning(f"Single-flight store unavailable ({e}), {self.key} not shared with other workers")
+        finally:
+            self.flights.settle(self.key, self.flight, outcome)
+
+class SingleFlight:
+    def __init__(self, store=None, reraise=()):
+        # store: a LeaseStore shared with the other worker processes, or None for this process only.
+        # reraise: exception types a waiter in another process gets back as themselves, not FlightError.
+        self.store = store
+        self.reraise = {error_type.__name__: error_type for error_type in reraise}
+        self.flights = {}
+        self.lock = threading.Lock()
+
+    def begin(self, key):
+        return Ticket(self, key)
+
+    def do(self, key, fn):
+        # -> (fn() of whichever caller ran it, True if that was another caller)
+        ticket = self.begin(key)
+        if not ticket.leading:
+            result = ticket.wait()
+            if not ticket.leading:
+                return result, True
+        try:
+            result = fn()
+        except Exception as e:
+            ticket.fail(e)
+            raise
+        except BaseException:
+            ticket.abandon()
+            raise
+        ticket.finish(result)
+        return result, False
+
+    def join_local(self, key):
+        # -> (the key's in-process flight, True if this caller is its first)
+        with self.lock:
+            flight = self.flights.get(key)
+            if flight is None:
+                flight = self.flights[key] = Flight()
+                return flight, True
+            return flight, False
+
+    def settle(self, key, flight, outcome):
+        with self.lock:
+            if self.flights.get(key) is flight:
+                del self.flights[key]
+        flight.outcome = outcome
+        flight.done.set()
+
+    def rebuild_error(self, error_type, message):
+        error_class = self.reraise.get(error_type)
+        return error_class(message) if error_class else FlightError(message)
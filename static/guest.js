@@ -61,6 +61,18 @@ document.addEventListener('alpine:init', () => {
             }
         },
         
+        addQuestion(question) {
+            // Streamed questions are already validated by the server
+            this.questions.push({
+                id: this.questions.length,
+                text: question.question,
+                answers: question.answers,
+                correctAnswer: question.correct_index,
+                selectedAnswer: null,
+                showResult: false
+            });
+        },
+        
         selectAnswer(questionId, answerIndex) {
             const question = this.questions.find(q => q.id === questionId);
             if (question && !question.showResult) {
@@ -102,6 +114,51 @@ document.addEventListener('alpine:init', () => {
     }));
 });
 
+// Guests get the whole response in one request; background jobs are for signed-in users
+async function requestQuestions(formData) {
+    const response = await fetch('/generate-questions', {
+        method: 'POST',
+        body: formData
+    });
+    return response.json();
+}
+
+// Questions arrive as NDJSON, one line per question as soon as the server has validated it
+async function streamQuestions(formData, onQuestion) {
+    const response = await fetch('/generate-questions/stream', {
+        method: 'POST',
+        body: formData
+    });
+
+    if (!response.ok) {
+        const data = await response.json();
+        throw new Error(data.message || 'Failed to generate questions');
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        const lines = buffer.split('\n');
+        buffer = lines.pop();
+        for (const line of lines) {
+            if (!line.trim()) continue;
+            const event = JSON.parse(line);
+            if (event.type === 'question') {
+                onQuestion(event);
+            } else if (event.type === 'error') {
+                throw new Error(event.message);
+            } else if (event.type === 'done') {
+                return event;
+            }
+        }
+    }
+    throw new Error('Connection closed before generation finished');
+}
+
 document.addEventListener('DOMContentLoaded', function() {
     // Handle study form submission for guest users
     const studyForm = document.getElementById('study-form');
@@ -120,31 +177,40 @@ document.addEventListener('DOMContentLoaded', function() {
             
             try {
                 const formData = new FormData(studyForm);
-                
-                const response = await fetch('/generate-questions', {
-                    method: 'POST',
-                    body: formData
-                });
-                
-                const data = await response.json();
-                
-                if (data.status === 'success') {
-                    // Get Alpine component instance
-                    const appEl = document.getElementById('quiz-container');
-                    const app = Alpine.$data(appEl);
-                    
+                const appEl = document.getElementById('quiz-container');
+                const app = Alpine.$data(appEl);
+
+                if (formData.get('chunked')) {
+                    // Chunked generation merges everything at the end, so wait for the whole job
+                    const data = await requestQuestions(formData);
+                    if (data.status !== 'success') {
+                        throw new Error(data.message || 'Failed to generate questions');
+                    }
                     if (app) {
-                        // Parse questions and update the UI
                         await app.parseQuestions(data.ai_response);
-                        
-                        // Hide welcome section, show questions
                         app.switchToQuizView();
                     }
-                    
                 } else {
-                    throw new Error(data.message || 'Failed to generate questions');
+                    // Show the quiz view as soon as the first question arrives
+                    if (app) app.questions = [];
+                    let shown = false;
+                    const result = await streamQuestions(formData, (question) => {
+                        if (!app) return;
+                        app.addQuestion(question);
+                        if (!shown) {
+                            shown = true;
+                            if (loadingOverlay) {
+                                loadingOverlay.classList.add('d-none');
+                                loadingOverlay.classList.remove('d-flex');
+                            }
+                            app.switchToQuizView();
+                        }
+                    });
+                    if (result.count === 0) {
+                        throw new Error('No valid questions were generated. Please try again.');
+                    }
                 }
-                
+
             } catch (error) {
                 console.error('Error generating questions:', error);
                 alert('Error: ' + error.message);
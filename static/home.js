@@ -2,7 +2,10 @@ document.addEventListener('alpine:init', () => {
     Alpine.data('authenticatedQuizApp', () => ({
         questions: [],
         error: null,
+        notice: null,
         quizzes: [],
+        quizzesNextAfter: null,
+        loadingQuizzes: false,
         showQuizModal: false,
         selectedQuestionId: null,
         newQuizName: '',
@@ -12,14 +15,44 @@ document.addEventListener('alpine:init', () => {
             this.fetchQuizzes();
         },
 
-        fetchQuizzes() {
+        async fetchQuizzes() {
             console.log('Fetching quizzes...');
-            fetch('/api/quizzes')
-                .then(response => response.json())
-                .then(data => {
-                    console.log('Quizzes fetched:', data);
-                    this.quizzes = data;
-                });
+            // /api/quizzes is paginated: load the first page and the rest on demand (loadMoreQuizzes)
+            this.quizzes = [];
+            this.quizzesNextAfter = null;
+            await this.loadQuizPage('/api/quizzes');
+            console.log('Quizzes fetched:', this.quizzes);
+        },
+
+        async loadMoreQuizzes() {
+            if (!this.quizzesNextAfter || this.loadingQuizzes) return;
+            await this.loadQuizPage(`/api/quizzes?after=${this.quizzesNextAfter}`);
+        },
+
+        async loadQuizPage(url) {
+            this.loadingQuizzes = true;
+            try {
+                const response = await fetch(url);
+                this.quizzes.push(...await response.json());
+                this.quizzesNextAfter = response.headers.get('X-Next-After');
+            } finally {
+                this.loadingQuizzes = false;
+            }
+        },
+
+        async refreshQuiz(quizId) {
+            // Re-read only the quiz a save changed instead of reloading the list
+            const response = await fetch(`/api/quizzes/${quizId}`);
+            if (!response.ok) return;
+            const quiz = await response.json();
+            const index = this.quizzes.findIndex(q => q.id === quiz.id);
+            if (index !== -1) {
+                this.quizzes.splice(index, 1, quiz);
+            } else if (!this.quizzesNextAfter) {
+                // New quizzes have the highest id, so they go last; with pages still to
+                // load it will arrive with them instead
+                this.quizzes.push(quiz);
+            }
         },
 
         async parseQuestions(aiResponse) {
@@ -78,6 +111,18 @@ document.addEventListener('alpine:init', () => {
             }
         },
         
+        addQuestion(question) {
+            // Streamed questions are already validated by the server
+            this.questions.push({
+                id: this.questions.length,
+                text: question.question,
+                answers: question.answers,
+                correctAnswer: question.correct_index,
+                saving: false,
+                saved: false
+            });
+        },
+        
         openQuizModal(questionId) {
             console.log('Opening quiz modal for question:', questionId);
             this.selectedQuestionId = questionId;
@@ -106,8 +151,8 @@ document.addEventListener('alpine:init', () => {
                 const data = await response.json();
                 
                 if (data.status === 'success') {
-                    // Refresh quiz data to get the newly created quiz
-                    await this.fetchQuizzes();
+                    // Add the newly created quiz to the list
+                    await this.refreshQuiz(data.quiz_id);
                     
                     // Use the quiz_id returned from the API
                     await this.saveQuestion(data.quiz_id);
@@ -147,8 +192,9 @@ document.addEventListener('alpine:init', () => {
                 
                 if (data.status === 'success') {
                     question.saved = true;
-                    // Refresh quiz data to update question counts
-                    await this.fetchQuizzes();
+                    this.notice = data.warning || null;
+                    // Refresh the question count of the quiz it went to
+                    await this.refreshQuiz(data.quiz_id);
                     this.showQuizModal = false;
                 } else {
                     throw new Error(data.message || 'Failed to save question');
@@ -164,10 +210,41 @@ document.addEventListener('alpine:init', () => {
         },
         
         async saveAllQuestions() {
-            const unsavedQuestions = this.questions.filter(q => !q.saved);
+            // One request and one transaction for the whole set, saved to the default quiz
+            const unsavedQuestions = this.questions.filter(q => !q.saved && !q.saving);
+            if (unsavedQuestions.length === 0) return;
             
-            for (const question of unsavedQuestions) {
-                await this.saveQuestion(null); // Save to default quiz
+            unsavedQuestions.forEach(q => q.saving = true);
+            try {
+                const response = await fetch('/save-questions', {
+                    method: 'POST',
+                    headers: {
+                        'Content-Type': 'application/json',
+                    },
+                    body: JSON.stringify({
+                        questions: unsavedQuestions.map(q => ({
+                            question: q.text,
+                            answers: q.answers,
+                            correct_index: q.correctAnswer
+                        }))
+                    })
+                });
+                
+                const data = await response.json();
+                
+                if (data.status === 'success') {
+                    unsavedQuestions.forEach(q => q.saved = true);
+                    this.notice = data.warning || null;
+                    await this.refreshQuiz(data.quiz_id);
+                } else {
+                    throw new Error(data.message || 'Failed to save questions');
+                }
+                
+            } catch (error) {
+                console.error('Error saving questions:', error);
+                this.error = error.message;
+            } finally {
+                unsavedQuestions.forEach(q => q.saving = false);
             }
         }, 
 
@@ -194,8 +271,8 @@ document.addEventListener('alpine:init', () => {
                 const data = await response.json();
                 
                 if (data.status === 'success') {
-                    // Refresh quizzes list
-                    await this.fetchQuizzes();
+                    // Add the new quiz to the list
+                    await this.refreshQuiz(data.quiz_id);
                     
                     // Save to the new quiz
                     await this.saveQuestion(data.quiz_id);
@@ -220,6 +297,89 @@ document.addEventListener('alpine:init', () => {
     }));
 });
 
+// Question generation runs as a background job; progress arrives over Server-Sent Events
+async function requestQuestions(formData) {
+    const response = await fetch('/generate-questions?mode=job', {
+        method: 'POST',
+        body: formData
+    });
+
+    const data = await response.json();
+    if (data.status !== 'queued') return data;
+    return waitForJob(data);
+}
+
+function waitForJob(job) {
+    return new Promise((resolve, reject) => {
+        const fallBackToPolling = () => pollJob(job.status_url).then(resolve, reject);
+        if (!window.EventSource) {
+            fallBackToPolling();
+            return;
+        }
+
+        const source = new EventSource(job.events_url);
+        const finish = (event) => {
+            source.close();
+            resolve(JSON.parse(event.data));
+        };
+        source.addEventListener('done', finish);
+        source.addEventListener('failed', finish);
+        source.addEventListener('timeout', () => {
+            source.close();
+            fallBackToPolling();
+        });
+        source.onerror = () => {
+            source.close();
+            fallBackToPolling();
+        };
+    });
+}
+
+async function pollJob(statusUrl) {
+    while (true) {
+        const response = await fetch(statusUrl);
+        const data = await response.json();
+        if (data.status !== 'pending') return data;
+        await new Promise(resolve => setTimeout(resolve, 1000));
+    }
+}
+
+// Questions arrive as NDJSON, one line per question as soon as the server has validated it
+async function streamQuestions(formData, onQuestion) {
+    const response = await fetch('/generate-questions/stream', {
+        method: 'POST',
+        body: formData
+    });
+
+    if (!response.ok) {
+        const data = await response.json();
+        throw new Error(data.message || 'Failed to generate questions');
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        const lines = buffer.split('\n');
+        buffer = lines.pop();
+        for (const line of lines) {
+            if (!line.trim()) continue;
+            const event = JSON.parse(line);
+            if (event.type === 'question') {
+                onQuestion(event);
+            } else if (event.type === 'error') {
+                throw new Error(event.message);
+            } else if (event.type === 'done') {
+                return event;
+            }
+        }
+    }
+    throw new Error('Connection closed before generation finished');
+}
+
 document.addEventListener('DOMContentLoaded', function() {
     // Handle study form submission
     const studyForm = document.getElementById('study-form');
@@ -235,31 +395,43 @@ document.addEventListener('DOMContentLoaded', function() {
             
             try {
                 const formData = new FormData(studyForm);
-                
-                const response = await fetch('/generate-questions', {
-                    method: 'POST',
-                    body: formData
-                });
-                
-                const data = await response.json();
-                
-                if (data.status === 'success') {
-                    // Get Alpine component instance
-                    const appEl = document.getElementById('quiz-container');
-                    const app = Alpine.$data(appEl);
+                const appEl = document.getElementById('quiz-container');
+                const app = Alpine.$data(appEl);
 
+                if (formData.get('chunked')) {
+                    // Chunked generation merges everything at the end, so wait for the whole job
+                    const data = await requestQuestions(formData);
+                    if (data.status !== 'success') {
+                        throw new Error(data.message || 'Failed to generate questions');
+                    }
+                    if (!data.ai_response && data.duplicates_removed) {
+                        throw new Error('Every generated question is already in your question bank.');
+                    }
                     if (app) {
-                        // Parse questions and update the UI
                         await app.parseQuestions(data.ai_response);
-                        
-                        // Hide welcome section, show questions
                         window.dispatchEvent(new CustomEvent('show-quiz'));
                     }
-                    
                 } else {
-                    throw new Error(data.message || 'Failed to generate questions');
+                    // Show the quiz view as soon as the first question arrives
+                    if (app) app.questions = [];
+                    let shown = false;
+                    const result = await streamQuestions(formData, (question) => {
+                        if (!app) return;
+                        app.addQuestion(question);
+                        if (!shown) {
+                            shown = true;
+                            loadingOverlay.classList.add('d-none');
+                            loadingOverlay.classList.remove('d-flex');
+                            window.dispatchEvent(new CustomEvent('show-quiz'));
+                        }
+                    });
+                    if (result.count === 0) {
+                        throw new Error(result.duplicates_removed
+                            ? 'Every generated question is already in your question bank.'
+                            : 'No valid questions were generated. Please try again.');
+                    }
                 }
-                
+
             } catch (error) {
                 console.error('Error generating questions:', error);
                 alert('Error: ' + error.message);
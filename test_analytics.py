@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Analytics: submissions fold into one rollup row per user and quiz, even when they arrive
+together, and the progress chart switches to daily averages past ANALYTICS_MAX_POINTS.
+"""
+
+import json
+import re
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+import pytest
+
+import app as quiz_app
+from werkzeug.security import generate_password_hash
+
+PASSWORD = 'password123'
+CHART_DATA = re.compile(r'<div id="chart-data"[^>]*>\s*(.*?)\s*</div>', re.S)
+
+@pytest.fixture
+def quiz_id(app):
+    with app.app_context():
+        db = quiz_app.db
+        user = quiz_app.User(username='student', password=generate_password_hash(PASSWORD))
+        db.session.add(user)
+        db.session.flush()
+        quiz = quiz_app.Quiz(title='Glaciers', user_id=user.id)
+        db.session.add(quiz)
+        db.session.flush()
+        for number in range(2):
+            db.session.add(quiz_app.Question(quiz_id=quiz.id, question_text=f'Question {number}?', option_a='a',
+                                             option_b='b', option_c='c', option_d='d', correct_answer='A'))
+        db.session.commit()
+        return quiz.id
+
+def login(app):
+    client = app.test_client()
+    assert client.post('/login', data={'username': 'student', 'password': PASSWORD}).status_code == 302
+    return client
+
+def rollup(app, quiz_id):
+    with app.app_context():
+        row = quiz_app.QuizAttemptRollup.query.filter_by(quiz_id=quiz_id).one()
+        return row.attempt_count, row.percent_sum, row.best_percent
+
+def test_first_submissions_arriving_together_share_one_rollup(app, quiz_id):
+    clients = [login(app) for _ in range(6)]
+    # Three perfect scores, three half scores
+    answers = [[0, 0], [0, 1]] * 3
+
+    def submit(number):
+        return clients[number].post('/submit_quiz', json={'quiz_id': quiz_id, 'answers': answers[number]}).status_code
+
+    with ThreadPoolExecutor(max_workers=6) as pool:
+        assert list(pool.map(submit, range(6))) == [200] * 6
+    assert rollup(app, quiz_id) == (6, 450.0, 100.0)
+
+    clients[0].post('/submit_quiz', json={'quiz_id': quiz_id, 'answers': [1, 1]})
+    assert rollup(app, quiz_id) == (7, 450.0, 100.0)
+
+def chart_data(client, **params):
+    page = client.get('/analytics', query_string=params).get_data(as_text=True)
+    return json.loads(CHART_DATA.search(page).group(1))
+
+def test_progress_chart_uses_daily_averages_past_the_point_limit(app, quiz_id):
+    client = login(app)
+    for answers in ([0, 0], [0, 1], [1, 1]):
+        assert client.post('/submit_quiz', json={'quiz_id': quiz_id, 'answers': answers}).status_code == 200
+    with app.app_context():
+        first = quiz_app.QuizAttempt.query.order_by(quiz_app.QuizAttempt.id).first()
+        first.completed_at -= timedelta(days=1)
+        quiz_app.db.session.commit()
+        yesterday = first.completed_at.strftime('%Y-%m-%d')
+
+    points = chart_data(client)
+    assert [point['score'] for point in points] == [100.0, 50.0, 0.0]
+    assert points[0]['date'] == yesterday and points[0]['raw_score'] == '2/2'
+
+    app.config['ANALYTICS_MAX_POINTS'] = 2
+    points = chart_data(client, quiz_id=quiz_id)
+    assert [(point['score'], point['quiz_name']) for point in points] == [(100.0, '1 attempt'), (25.0, '2 attempts')]
+    assert points[0]['date'] == yesterday
+    assert points[1]['raw_score'] == 'daily average of 2'
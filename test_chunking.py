@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""
+Splitting study material into overlapping chunks for chunked generation.
+"""
+
+from chunking import PAGE_BREAK, split_into_chunks, split_pages
+
+def pages(*letters, size=30):
+    return [letter * size for letter in letters]
+
+def test_chunks_end_on_page_breaks_and_start_with_the_previous_tail():
+    a, b, c, d, e = pages('a', 'b', 'c', 'd', 'e')
+    chunks = split_into_chunks(PAGE_BREAK.join([a, b, c, d, e]), chunk_chars=100, overlap_chars=10)
+    # c would push the first chunk past 100 characters only once d joins, so d starts the second
+    assert chunks == ["\n".join([a, b, c]), "\n".join(['c' * 10, d, e])]
+    assert all(len(chunk) <= 100 for chunk in chunks)
+
+def test_every_chunk_after_the_first_repeats_the_overlap():
+    text = PAGE_BREAK.join(pages(*'abcdefghij'))
+    chunks = split_into_chunks(text, chunk_chars=70, overlap_chars=15)
+    # Two pages fit in the first chunk; after that the tail and one page fill each chunk
+    assert len(chunks) == 9
+    for previous, chunk in zip(chunks, chunks[1:]):
+        assert chunk.startswith(previous[-15:] + "\n")
+    # Nothing is lost: every page appears whole in some chunk
+    assert all(any(page in chunk for chunk in chunks) for page in pages(*'abcdefghij'))
+
+def test_without_overlap_pages_are_grouped_as_they_are():
+    a, b, c = pages('a', 'b', 'c', size=40)
+    assert split_into_chunks(PAGE_BREAK.join([a, b, c]), chunk_chars=90, overlap_chars=0) == ["\n".join([a, b]), c]
+
+def test_long_pages_are_cut_into_chunk_sized_pieces():
+    long_page = "x" * 250
+    chunks = split_into_chunks(long_page + PAGE_BREAK + "y" * 20, chunk_chars=100, overlap_chars=0)
+    assert chunks == ["x" * 100, "x" * 100, "x" * 50 + "\n" + "y" * 20]
+
+def test_text_without_page_breaks_splits_on_paragraphs():
+    text = "First paragraph.\n\nSecond paragraph.\n   \nThird paragraph."
+    assert split_pages(text) == ["First paragraph.", "Second paragraph.", "Third paragraph."]
+    assert split_pages(PAGE_BREAK.join(["One.\n\nStill one.", "  ", "Two."])) == ["One.\n\nStill one.", "Two."]
+    assert split_into_chunks(text, chunk_chars=35, overlap_chars=0) == [
+        "First paragraph.\nSecond paragraph.", "Third paragraph."]
+
+def test_short_and_empty_material():
+    assert split_into_chunks("Just one line.") == ["Just one line."]
+    assert split_into_chunks("") == []
+    assert split_into_chunks(PAGE_BREAK + "\n\n") == []
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Study material condensing: repeated slide headers and footers, page numbers and near-empty pages
+are dropped, and long material is fitted to the token budget by page instead of cut off.
+"""
+
+from chunking import PAGE_BREAK
+from condense import condense, estimate_tokens
+
+TOPICS = ["Glaciers carve U-shaped valleys and leave moraines of unsorted till behind",
+          "Subduction zones form deep ocean trenches and explosive volcanic arcs",
+          "Weathering breaks rocks apart while erosion carries the fragments away",
+          "Metamorphic rocks recrystallize under heat and pressure without melting"]
+
+def slide(number, body):
+    return f"5/24/2024\n{number}\nGEOL 1303 Physical Geology\n{body}\n  Dr. Rivera   |   Fall Term\n{number * 2 - 1} {number * 2}"
+
+def test_repeated_headers_footers_and_empty_pages_are_dropped():
+    pages = [slide(number, TOPICS[number % len(TOPICS)]) for number in range(1, 9)]
+    pages.insert(4, slide(5, "Questions?"))
+    condensed, report = condense(PAGE_BREAK.join(pages))
+
+    condensed_pages = condensed.split(PAGE_BREAK)
+    assert len(condensed_pages) == 8 and report['empty_pages'] == 1
+    # The running title and footer are kept once, dates and page or slide numbers not at all
+    assert condensed.count("GEOL 1303 Physical Geology") == 1
+    assert condensed.count("Dr. Rivera | Fall Term") == 1
+    assert "5/24/2024" not in condensed and "\n3\n" not in condensed and "5 6" not in condensed
+    assert all(topic in condensed for topic in TOPICS)
+    assert report['tokens_after'] < report['tokens_before']
+
+def test_budget_keeps_the_most_informative_pages_in_order():
+    # Recap slides only repeat words from the other pages
+    recaps = ["Recap: glaciers, subduction zones and weathering of rocks",
+              "Recap: erosion, volcanic arcs, metamorphic rocks and glaciers"]
+    pages = [TOPICS[0], recaps[0], TOPICS[1], TOPICS[2], recaps[1], TOPICS[3]]
+    budget = sum(estimate_tokens(topic) + 1 for topic in TOPICS)
+    condensed, report = condense(PAGE_BREAK.join(pages), budget)
+
+    assert condensed.split("\n" + PAGE_BREAK) == TOPICS
+    assert report['tokens_after'] <= budget
+    assert report['over_budget_pages'] == 2
+
+def test_pasted_text_keeps_short_paragraphs():
+    text = "Chapter 3\n\n" + "\n\n".join(TOPICS)
+    condensed, report = condense(text)
+    assert condensed.startswith("Chapter 3\n\n")
+    assert report['empty_pages'] == 0
+
+def test_generation_reports_token_counts(app):
+    app.config['PROMPT_TOKEN_BUDGET'] = 50
+    client = app.test_client()
+    material = PAGE_BREAK.join(slide(number, TOPICS[number % len(TOPICS)]) for number in range(1, 13))
+    response = client.post('/generate-questions', data={'study_material': material}).json
+    assert response['status'] == 'success'
+    assert response['input_tokens']['before'] == estimate_tokens(material)
+    assert 0 < response['input_tokens']['after'] <= 50
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Near-duplicate detection: saving warns about paraphrases of saved questions, and generation
+leaves out questions the user already has.
+"""
+
+
+import pytest
+
+import app as quiz_app
+import dedup
+from werkzeug.security import generate_password_hash
+
+PASSWORD = 'password123'
+
+SAVED = {'question': "Which process breaks down rocks at the Earth's surface?",
+         'answers': ['Erosion', 'Weathering', 'Deposition', 'Subduction'], 'correct_index': 1}
+PARAPHRASE = {'question': "What process is responsible for breaking down rocks at Earth's surface?",
+              'answers': ['Weathering', 'Melting', 'Erosion', 'Faulting'], 'correct_index': 0}
+UNRELATED = {'question': "What is the largest ocean on Earth?",
+             'answers': ['Atlantic', 'Indian', 'Pacific', 'Arctic'], 'correct_index': 2}
+
+@pytest.fixture
+def app(make_app):
+    app = make_app()
+    with app.app_context():
+        quiz_app.db.session.add(quiz_app.User(username='dupeuser', password=generate_password_hash(PASSWORD)))
+        quiz_app.db.session.commit()
+    return app
+
+@pytest.fixture
+def client(app):
+    client = app.test_client()
+    assert client.post('/login', data={'username': 'dupeuser', 'password': PASSWORD}).status_code == 302
+    return client
+
+def test_paraphrases_are_similar_and_unrelated_questions_are_not():
+    saved = dedup.fingerprint(SAVED['question'], SAVED['answers'][1])
+    paraphrase = dedup.fingerprint(PARAPHRASE['question'], PARAPHRASE['answers'][0])
+    unrelated = dedup.fingerprint(UNRELATED['question'], UNRELATED['answers'][2])
+    assert dedup.jaccard(saved[0], paraphrase[0]) >= 0.7
+    assert set(saved[1]) & set(paraphrase[1])
+    assert dedup.jaccard(saved[0], unrelated[0]) < 0.2
+    assert len(saved[1]) == dedup.BANDS
+
+def test_questions_without_content_words_compare_by_their_text():
+    terse = dedup.fingerprint("Q?", "A")
+    assert len(terse[1]) == dedup.BANDS
+    assert dedup.fingerprint("  q? ", "a") == terse
+    assert dedup.jaccard(terse[0], dedup.fingerprint("Q?", "B")[0]) == 0.0
+
+def test_merging_chunks_drops_paraphrases():
+    terse = {'question': "Q?", 'answers': ['A', 'B', 'C', 'D'], 'correct_index': 0}
+    merged = quiz_app.merge_questions([[SAVED, terse], [PARAPHRASE, dict(terse)], [UNRELATED]], 10)
+    assert merged == [SAVED, UNRELATED, terse]
+    assert len(quiz_app.merge_questions([[SAVED], [PARAPHRASE]], 10, threshold=0)) == 2
+
+def test_saving_a_paraphrase_warns(client):
+    first = client.post('/save-question', json=SAVED).json
+    assert first['status'] == 'success' and 'warning' not in first
+
+    second = client.post('/save-questions', json={'questions': [UNRELATED, PARAPHRASE]}).json
+    assert second['status'] == 'success'
+    assert len(second['question_ids']) == 2
+    assert second['duplicates'] == [{'position': 2, 'similar_to': {
+        'question_id': first['question_ids'][0], 'quiz_id': first['quiz_id'],
+        'similarity': second['duplicates'][0]['similar_to']['similarity']}}]
+
+def test_generation_drops_saved_questions(app, client):
+    material = ("Glaciers carve valleys while rivers deposit sediment across floodplains, "
+                "volcanic eruptions release magma, and tectonic plates shift continents. ") * 10
+    generated = client.post('/generate-questions', data={'study_material': material}).json
+    assert generated['duplicates_removed'] == 0
+    questions = quiz_app.parse_questions(generated['ai_response'])
+    client.post('/save-questions', json={'questions': questions[:2]})
+
+    again = client.post('/generate-questions', data={'study_material': material}).json
+    assert again['cached'] is True
+    assert again['duplicates_removed'] >= 2
+    assert len(quiz_app.parse_questions(again['ai_response'])) == len(questions) - again['duplicates_removed']
+
+def test_existing_questions_are_backfilled_and_deleted_with_their_quiz(app, client):
+    saved = client.post('/save-question', json=SAVED).json
+    with app.app_context():
+        db = quiz_app.db
+        db.session.execute(db.delete(quiz_app.QuestionBand))
+        db.session.commit()
+        quiz_app.init_db()
+        assert quiz_app.QuestionBand.query.filter_by(question_id=saved['question_ids'][0]).count() == dedup.BANDS
+
+    terse = {'question': "Q?", 'answers': ['A', 'B', 'C', 'D'], 'correct_index': 0}
+    repeated = client.post('/save-questions', json={'questions': [terse, terse]}).json
+    assert [duplicate['position'] for duplicate in repeated['duplicates']] == [2]
+
+    client.post(f"/delete-quiz/{saved['quiz_id']}")
+    with app.app_context():
+        assert quiz_app.QuestionBand.query.count() == 0
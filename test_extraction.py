@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+PDF extraction: pages come back in order from the process pool, page ranges and the character
+budget are honoured, only a bounded window of batches is submitted, and a broken pool falls
+back to extracting in-process.
+"""
+
+import os
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+import extraction
+
+SOURCE = os.path.join(os.path.dirname(__file__), 'static', 'files', 'Geol_1303_8-11_Study_Guide_1.pdf')
+
+@pytest.fixture(scope='module')
+def serial_pages():
+    return list(extraction.iter_pdf_pages(SOURCE))
+
+class InlinePool:
+    # Stands in for the process pool: runs each batch at submit time, or fails from broken_after on
+    def __init__(self, broken_after=None):
+        self.submitted = []
+        self.broken_after = broken_after
+
+    def submit(self, fn, *args):
+        self.submitted.append(args[1:])
+        future = Future()
+        if self.broken_after is not None and len(self.submitted) > self.broken_after:
+            future.set_exception(BrokenProcessPool("worker died"))
+        else:
+            future.set_result(fn(*args))
+        return future
+
+@pytest.fixture
+def inline_pool(monkeypatch):
+    def install(pool, workers=1):
+        monkeypatch.setattr(extraction, 'get_pool', lambda max_workers=None: pool)
+        monkeypatch.setattr(extraction, '_pool_workers', workers)
+        monkeypatch.setattr(extraction, 'shutdown_pool', lambda: None)
+        return pool
+    return install
+
+def test_pool_batches_come_back_in_page_order(serial_pages):
+    assert len(serial_pages) == 14
+    pooled = list(extraction.iter_pdf_pages(SOURCE, parallel_min_pages=1, batch_size=3, max_workers=2))
+    assert pooled == serial_pages
+
+def test_page_ranges(serial_pages):
+    assert [number for number, _ in extraction.iter_pdf_pages(SOURCE, 3, 5)] == [3, 4, 5]
+    assert [number for number, _ in extraction.iter_pdf_pages(SOURCE, 12)] == [12, 13, 14]
+    # Past the last page is clamped, in-process and in the pool
+    assert list(extraction.iter_pdf_pages(SOURCE, 13, 99)) == serial_pages[12:]
+    assert list(extraction.iter_pdf_pages(SOURCE, 13, 99, parallel_min_pages=1, batch_size=1)) == serial_pages[12:]
+
+def test_budget_stops_reading_pages(serial_pages):
+    budget = len(serial_pages[0][1]) + 10
+    text, pages = extraction.read_pdf_text(SOURCE, max_chars=budget)
+    assert pages == 2
+    assert len(text) <= budget
+    assert text.startswith(serial_pages[0][1].strip()[:50])
+
+def test_only_a_window_of_batches_is_submitted(serial_pages, inline_pool):
+    pool = inline_pool(InlinePool(), workers=1)
+    text, pages = extraction.read_pdf_text(SOURCE, max_chars=10, parallel_min_pages=1, batch_size=1)
+    assert pages == 1
+    # Two batches per pool process at most, not all 14
+    assert pool.submitted == [(1, 1), (2, 2)]
+
+    pool = inline_pool(InlinePool(), workers=2)
+    assert list(extraction.iter_pdf_pages(SOURCE, parallel_min_pages=1, batch_size=4)) == serial_pages
+    assert pool.submitted == [(1, 4), (5, 8), (9, 12), (13, 14)]
+
+def test_broken_pool_finishes_in_process(serial_pages, inline_pool, caplog):
+    inline_pool(InlinePool(broken_after=1), workers=2)
+    assert list(extraction.iter_pdf_pages(SOURCE, parallel_min_pages=1, batch_size=3)) == serial_pages
+    # The first batch came from the pool, pages 4 on from the fallback
+    assert "in-process from page 4" in caplog.text
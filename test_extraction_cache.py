@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Extraction cache: a second upload of the same bytes skips the extractor, a new extractor
+version misses, and the byte budget evicts the least recently used text.
+"""
+
+import os
+
+import pytest
+
+import app as quiz_app
+
+SOURCE = os.path.join(os.path.dirname(__file__), 'static', 'files', 'Geol_1303_8-11_Study_Guide_1.pdf')
+
+@pytest.fixture
+def extractions(monkeypatch):
+    # Every real PDF extraction, in call order
+    calls = []
+    extract = quiz_app.extract_text_from_pdf
+
+    def counted(source, **options):
+        calls.append(options)
+        return extract(source, **options)
+
+    monkeypatch.setattr(quiz_app, 'extract_text_from_pdf', counted)
+    return calls
+
+def upload(client, name='study-guide.pdf', **form):
+    with open(SOURCE, 'rb') as source:
+        response = client.post('/generate-questions', data={'file': (source, name), **form},
+                               content_type='multipart/form-data')
+    assert response.json['status'] == 'success', response.json
+    return response.json
+
+def cached_entries(app):
+    with app.app_context():
+        return quiz_app.ExtractionCache.query.order_by(quiz_app.ExtractionCache.id).all()
+
+def test_same_bytes_are_extracted_once(app, extractions):
+    client = app.test_client()
+    hits = quiz_app.extraction_cache_stats['hits']
+    first = upload(client)
+    # Another name, same bytes
+    second = upload(client, name='renamed.pdf')
+    assert len(extractions) == 1
+    assert second['ai_response'] == first['ai_response']
+    assert quiz_app.extraction_cache_stats['hits'] == hits + 1
+
+    [entry] = cached_entries(app)
+    assert entry.hit_count == 1 and entry.size_bytes == len(entry.text.encode('utf-8'))
+
+    # A page range is extracted (and cached) on its own
+    upload(client, pages='1-2')
+    assert len(extractions) == 2 and len(cached_entries(app)) == 2
+
+def test_a_new_extractor_version_misses(app, extractions, monkeypatch):
+    client = app.test_client()
+    upload(client)
+    version = quiz_app.pdf_extractor_version
+    monkeypatch.setattr(quiz_app, 'pdf_extractor_version', lambda page_range=None: version(page_range) + '-fixed')
+    upload(client)
+    assert len(extractions) == 2
+    assert [entry.extractor_version.endswith('-fixed') for entry in cached_entries(app)] == [False, True]
+
+def test_byte_budget_evicts_the_least_recently_used_text(app, monkeypatch):
+    monkeypatch.setattr(quiz_app, 'extraction_cache_unchecked', {'bytes': 0})
+    app.config['EXTRACTION_CACHE_MAX_BYTES'] = 1000
+
+    def extract(name):
+        with app.test_request_context():
+            return quiz_app.extract_with_cache(name * 64, 'test', lambda: name * 400)
+
+    extract('a')
+    extract('b')
+    # Reading a makes b the least recently used
+    assert extract('a') == 'a' * 400
+    extract('c')
+    assert [entry.content_hash[0] for entry in cached_entries(app)] == ['a', 'c']
+    assert sum(entry.size_bytes for entry in cached_entries(app)) <= 1000
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Generation cache: identical material is answered from the cache until its TTL runs out, fresh
+requests bypass it, and eviction keeps the table near GENERATION_CACHE_MAX_ENTRIES without
+counting it on every store.
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+import app as quiz_app
+
+MATERIAL = "Glaciers carve U-shaped valleys and leave moraines behind as they retreat. " * 20
+
+@pytest.fixture
+def app(make_app, monkeypatch):
+    monkeypatch.setattr(quiz_app, 'generation_cache_unchecked', {'stores': 0})
+    return make_app({'GENERATION_CACHE_MAX_ENTRIES': 3})
+
+def generate(client, material=MATERIAL, **form):
+    response = client.post('/generate-questions', data={'study_material': material, **form})
+    assert response.json['status'] == 'success'
+    return response.json
+
+def entries(app):
+    with app.app_context():
+        return quiz_app.GenerationCache.query.order_by(quiz_app.GenerationCache.id).all()
+
+def test_cached_until_the_ttl_runs_out(app):
+    client = app.test_client()
+    first = generate(client)
+    assert first['cached'] is False
+    assert generate(client)['cached'] is True
+    # Whitespace does not change the key
+    assert generate(client, MATERIAL.replace(" ", "  "))['cached'] is True
+    assert entries(app)[0].hit_count == 2
+
+    with app.app_context():
+        quiz_app.GenerationCache.query.update({'expires_at': datetime.utcnow() - timedelta(seconds=1)})
+        quiz_app.db.session.commit()
+    again = generate(client)
+    assert again['cached'] is False and again['ai_response'] == first['ai_response']
+    # The expired entry was refreshed in place
+    assert len(entries(app)) == 1 and entries(app)[0].expires_at > datetime.utcnow()
+
+def test_fresh_requests_skip_the_lookup_and_refresh_the_entry(app):
+    client = app.test_client()
+    generate(client)
+    stored_at = entries(app)[0].created_at
+    assert generate(client, fresh='1')['cached'] is False
+    entry = entries(app)[0]
+    assert entry.created_at > stored_at and entry.hit_count == 0
+    assert generate(client)['cached'] is True
+
+def store(app, number):
+    with app.app_context():
+        quiz_app.store_generation(f"key-{number}", f"response {number}")
+
+def test_least_recently_used_entries_go_past_the_limit(app):
+    for number in range(3):
+        store(app, number)
+    with app.app_context():
+        # Using the oldest entry makes the second one the least recently used
+        assert quiz_app.lookup_generation("key-0") == "response 0"
+    store(app, 3)
+    assert [entry.cache_key for entry in entries(app)] == ["key-0", "key-2", "key-3"]
+
+def test_eviction_waits_for_a_tenth_of_the_limit(app):
+    app.config['GENERATION_CACHE_MAX_ENTRIES'] = 20
+    with app.app_context():
+        expired = datetime.utcnow() - timedelta(seconds=1)
+        for number in range(25):
+            quiz_app.db.session.add(quiz_app.GenerationCache(cache_key=f"old-{number}", model_name="stub",
+                                                             ai_response="old", expires_at=expired))
+        quiz_app.db.session.commit()
+
+    # One store in: over the limit and full of expired rows, but not checked yet
+    store(app, 0)
+    assert len(entries(app)) == 26
+    # The second store is a tenth of 20: expired rows go with it, in the same commit
+    store(app, 1)
+    assert [entry.cache_key for entry in entries(app)] == ["key-0", "key-1"]
+    assert quiz_app.generation_cache_unchecked['stores'] == 0
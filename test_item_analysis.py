@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Item analysis against hand-computed values: difficulty, option frequencies and the corrected
+point-biserial discrimination, plus the one-byte-per-question response packing they read.
+"""
+
+import math
+
+from werkzeug.security import generate_password_hash
+
+import app as quiz_app
+from item_analysis import UNANSWERED, item_statistics, pack_responses, response_matrix
+
+KEY = [0, 1, 2]
+# Attempts scoring 3, 2, 1 and 0; the last one left the third question blank
+ANSWERS = [[0, 1, 2], [0, 1, 0], [0, 0, 3], [1, 0, None]]
+
+def test_pack_responses_keeps_valid_option_indexes_only():
+    assert pack_responses([2, None, 5, True, 0], 4) == bytes([2, UNANSWERED, UNANSWERED, UNANSWERED])
+    assert pack_responses([3, 1, 0], 2) == bytes([3, 1])
+    assert pack_responses(None, 2) == bytes([UNANSWERED, UNANSWERED])
+    assert pack_responses([], 0) == b''
+
+def test_response_matrix_reads_shorter_attempts_as_prefixes():
+    # The second attempt predates the third question; the third carries an extra byte
+    matrix, presented = response_matrix([bytes([1, 2, 3]), bytes([0, 1]), bytes([2, 2, 2, 2])], 3)
+    assert matrix.tolist() == [[1, 2, 3], [0, 1, UNANSWERED], [2, 2, 2]]
+    assert presented.tolist() == [[True] * 3, [True, True, False], [True] * 3]
+
+    packed = [pack_responses(answers, len(KEY)) for answers in ANSWERS]
+    matrix, _ = response_matrix(packed, len(KEY))
+    assert matrix.tolist() == [[0, 1, 2], [0, 1, 0], [0, 0, 3], [1, 0, UNANSWERED]]
+
+def test_statistics_match_hand_computed_values():
+    items = item_statistics([pack_responses(answers, len(KEY)) for answers in ANSWERS], KEY)
+    assert [item['attempts'] for item in items] == [4, 4, 4]
+    assert [item['difficulty'] for item in items] == [0.75, 0.5, 0.25]
+    assert [item['option_counts'] for item in items] == [[3, 1, 0, 0], [2, 2, 0, 0], [1, 0, 1, 1]]
+    assert items[2]['option_frequency'] == [0.25, 0.0, 0.25, 0.25]
+    assert [item['unanswered'] for item in items] == [0, 0, 1]
+
+    # Question 1: right = [1, 1, 1, 0], rest of quiz = [2, 1, 0, 0]
+    #   cov = 3/4 - 3/4 * 3/4 = 3/16, var(right) = 3/16, var(rest) = 5/4 - 9/16 = 11/16
+    #   r = (3/16) / sqrt(3/16 * 11/16) = sqrt(3/11)
+    # Question 2: right = [1, 1, 0, 0], rest = [2, 1, 1, 0]: cov = 1/4, variances 1/4 and 1/2, r = sqrt(1/2)
+    # Question 3: right = [1, 0, 0, 0], rest = [2, 2, 1, 0]: cov = 3/16, variances 3/16 and 11/16
+    assert [item['discrimination'] for item in items] == [
+        round(math.sqrt(3 / 11), 4), round(math.sqrt(1 / 2), 4), round(math.sqrt(3 / 11), 4)]
+
+def test_a_single_attempt_has_no_discrimination():
+    items = item_statistics([pack_responses([0, 0, 2], 3)], KEY)
+    assert [item['difficulty'] for item in items] == [1.0, 0.0, 1.0]
+    assert [item['discrimination'] for item in items] == [None, None, None]
+    assert items[1]['option_frequency'] == [1.0, 0.0, 0.0, 0.0]
+
+def test_zero_variance_questions_have_no_discrimination():
+    # Everyone gets question 1 right and question 4 wrong; questions 2 and 3 separate the attempts
+    key = [0, 1, 2, 3]
+    answers = [[0, 1, 2, 0], [0, 1, 0, 0], [0, 0, 0, 0]]
+    items = item_statistics([pack_responses(row, 4) for row in answers], key)
+    assert [item['difficulty'] for item in items] == [1.0, 0.6667, 0.3333, 0.0]
+    assert items[0]['discrimination'] is None and items[3]['discrimination'] is None
+    # Question 2: right = [1, 1, 0], rest = [2, 1, 1]: cov = 1 - 8/9, both variances 2/9, r = 1/2
+    # Question 3: right = [1, 0, 0], rest = [2, 2, 1]: cov = 2/3 - 5/9, both variances 2/9, r = 1/2
+    assert items[1]['discrimination'] == 0.5 and items[2]['discrimination'] == 0.5
+
+    # Uncorrelated is 0, not undefined. Question 2: right = [1, 0, 0, 1], rest = [2, 2, 1, 1]
+    answers = [[0, 1, 2, 0], [0, 0, 2, 0], [0, 0, 0, 0], [0, 1, 0, 0]]
+    assert item_statistics([pack_responses(row, 4) for row in answers], key)[1]['discrimination'] == 0.0
+
+    # Without question 3, question 2's rest score is a constant 1: undefined as well
+    items = item_statistics([pack_responses([row[0], row[1], row[3]], 3) for row in answers], [0, 1, 3])
+    assert [item['discrimination'] for item in items] == [None, None, None]
+
+def test_questions_added_after_every_attempt_have_no_statistics():
+    items = item_statistics([bytes([0, 1]), bytes([1, 1])], KEY)
+    assert items[2] == {'attempts': 0, 'difficulty': None, 'discrimination': None,
+                        'option_counts': [0, 0, 0, 0], 'option_frequency': [None] * 4, 'unanswered': 0}
+    assert items[0]['attempts'] == 2 and items[0]['difficulty'] == 0.5
+    assert item_statistics([], KEY)[0]['attempts'] == 0
+
+def test_submitted_answers_round_trip_through_the_database(app):
+    with app.app_context():
+        db = quiz_app.db
+        user = quiz_app.User(username='teacher', password=generate_password_hash('password123'))
+        db.session.add(user)
+        db.session.flush()
+        quiz = quiz_app.Quiz(title='Rocks', user_id=user.id)
+        db.session.add(quiz)
+        db.session.flush()
+        for number, correct in enumerate('ABC'):
+            db.session.add(quiz_app.Question(quiz_id=quiz.id, question_text=f'Question {number}?', option_a='a',
+                                             option_b='b', option_c='c', option_d='d', correct_answer=correct))
+        db.session.commit()
+        quiz_id = quiz.id
+
+    client = app.test_client()
+    client.post('/login', data={'username': 'teacher', 'password': 'password123'})
+    for answers in ANSWERS:
+        assert client.post('/submit_quiz', json={'quiz_id': quiz_id, 'answers': answers}).status_code == 200
+    with app.app_context():
+        stored = quiz_app.db.session.scalars(
+            quiz_app.db.select(quiz_app.QuizAttempt.responses).order_by(quiz_app.QuizAttempt.id)).all()
+    assert stored == [pack_responses(answers, 3) for answers in ANSWERS]
+
+    stats = client.get(f'/api/quiz/{quiz_id}/item-stats').json
+    assert stats['attempts'] == 4
+    assert [item['difficulty'] for item in stats['items']] == [0.75, 0.5, 0.25]
+    assert [item['discrimination'] for item in stats['items']] == [0.5222, 0.7071, 0.5222]
+    assert [item['correct_index'] for item in stats['items']] == KEY
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Generation jobs: the queued -> generating -> done/failed lifecycle, owner-only access, event
+streams that end with the job, and jobs left behind by a dead process being failed.
+"""
+
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pytest
+from werkzeug.security import generate_password_hash
+
+import app as quiz_app
+from jobs import JobRunner
+
+PASSWORD = 'password123'
+MATERIAL = "Glaciers carve U-shaped valleys and leave moraines behind as they retreat. " * 20
+
+@pytest.fixture
+def app(make_app):
+    app = make_app({'JOB_EVENTS_POLL_SECONDS': 0.02, 'JOB_EVENTS_TIMEOUT_SECONDS': 5})
+    with app.app_context():
+        for username in ('owner', 'intruder'):
+            quiz_app.db.session.add(quiz_app.User(username=username, password=generate_password_hash(PASSWORD)))
+        quiz_app.db.session.commit()
+    return app
+
+@pytest.fixture
+def gate(monkeypatch):
+    # Holds every job in the generating stage until set
+    release = threading.Event()
+    generate = quiz_app.run_generation
+
+    def gated_generation(spec, progress=None):
+        progress('generating')
+        assert release.wait(timeout=5)
+        return generate(spec)
+
+    monkeypatch.setattr(quiz_app, 'run_generation', gated_generation)
+    return release
+
+def login(app, username):
+    client = app.test_client()
+    assert client.post('/login', data={'username': username, 'password': PASSWORD}).status_code == 302
+    return client
+
+def start_job(client):
+    response = client.post('/generate-questions', data={'study_material': MATERIAL, 'mode': 'job'})
+    assert response.status_code == 202
+    return response.json
+
+def wait_for(client, job, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        data = client.get(job['status_url']).json
+        if data['status'] != 'pending':
+            return data
+        time.sleep(0.02)
+    raise AssertionError(f"job still pending: {data}")
+
+def test_job_moves_through_its_stages_to_done(app, gate):
+    client = login(app, 'owner')
+    job = start_job(client)
+    assert job['status'] == 'queued'
+
+    deadline = time.monotonic() + 5
+    while client.get(job['status_url']).json['stage'] != 'generating':
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+    assert client.get(job['status_url']).json == {'job_id': job['job_id'], 'stage': 'generating', 'status': 'pending'}
+
+    gate.set()
+    done = wait_for(client, job)
+    assert done['stage'] == 'done' and done['status'] == 'success'
+    assert quiz_app.parse_questions(done['ai_response'])
+
+    saved = client.post(f"/jobs/{job['job_id']}/save").json
+    assert saved['status'] == 'success' and saved['question_ids']
+
+def test_failed_job_reports_its_error(app, monkeypatch):
+    def failing_generation(spec, progress=None):
+        progress('extracting')
+        raise quiz_app.GenerationInputError("No text could be extracted")
+
+    monkeypatch.setattr(quiz_app, 'run_generation', failing_generation)
+    client = login(app, 'owner')
+    failed = wait_for(client, start_job(client))
+    assert failed['stage'] == 'failed'
+    assert failed['status'] == 'error' and failed['message'] == "No text could be extracted"
+
+def test_only_the_owner_can_see_a_job(app):
+    owner = login(app, 'owner')
+    job = start_job(owner)
+    wait_for(owner, job)
+
+    intruder = login(app, 'intruder')
+    for path in (job['status_url'], job['events_url']):
+        response = intruder.get(path)
+        assert response.status_code == 404
+        assert response.json == {'status': 'error', 'message': "Job not found"}
+    assert intruder.post(f"/jobs/{job['job_id']}/save").status_code == 404
+    assert intruder.get('/jobs/no-such-job').status_code == 404
+
+    # Signed out: sent to the login page like the other account routes
+    guest = app.test_client()
+    assert guest.get(job['status_url']).status_code == 302
+    assert guest.get(job['events_url']).status_code == 302
+
+def test_guests_are_answered_synchronously(app):
+    response = app.test_client().post('/generate-questions', data={'study_material': MATERIAL, 'mode': 'job'})
+    assert response.status_code == 200
+    assert response.json['status'] == 'success'
+    with app.app_context():
+        assert quiz_app.GenerationJob.query.count() == 0
+
+def test_event_stream_ends_once_the_job_finishes(app, gate):
+    client = login(app, 'owner')
+    job = start_job(client)
+    threading.Timer(0.2, gate.set).start()
+
+    started = time.monotonic()
+    body = client.get(job['events_url']).get_data(as_text=True)
+    events = [line.split(': ', 1)[1] for line in body.splitlines() if line.startswith('event: ')]
+    assert events[-1] == 'done' and 'timeout' not in events
+    assert events.index('generating') < events.index('done')
+    assert time.monotonic() - started < 4
+
+    # A finished job's stream is a single event
+    assert client.get(job['events_url']).get_data(as_text=True).count('event: ') == 1
+
+def add_job(app, status, age_seconds):
+    with app.app_context():
+        owner = quiz_app.User.query.filter_by(username='owner').one()
+        job = quiz_app.GenerationJob(id=f'{status}{age_seconds}', user_id=owner.id, status=status,
+                                     updated_at=datetime.utcnow() - timedelta(seconds=age_seconds))
+        quiz_app.db.session.add(job)
+        quiz_app.db.session.commit()
+        return job.id
+
+def job_status(app, job_id):
+    with app.app_context():
+        job = quiz_app.db.session.get(quiz_app.GenerationJob, job_id)
+        return job.status, job.error
+
+def test_starting_a_runner_fails_jobs_nobody_is_running(app):
+    # Heartbeats every 30 seconds: silent for over 90 means the process running it is gone
+    abandoned = add_job(app, 'generating', 600)
+    queued = add_job(app, 'queued', 120)
+    recent = add_job(app, 'extracting', 10)
+    finished = add_job(app, 'done', 600)
+
+    app.extensions['generation_jobs'].start()
+    assert job_status(app, abandoned) == ('failed', quiz_app.JOB_INTERRUPTED_MESSAGE)
+    assert job_status(app, queued)[0] == 'failed'
+    # Possibly still running in another server process
+    assert job_status(app, recent) == ('extracting', None)
+    assert job_status(app, finished) == ('done', None)
+
+def test_polling_an_abandoned_job_fails_it(app):
+    client = login(app, 'owner')
+    job_id = add_job(app, 'generating', 600)
+    body = client.get(f'/jobs/{job_id}/events').get_data(as_text=True)
+    assert body.startswith('event: failed\n') and body.count('event: ') == 1
+
+    job_id = add_job(app, 'queued', 600)
+    assert client.get(f'/jobs/{job_id}').json['message'] == quiz_app.JOB_INTERRUPTED_MESSAGE
+
+def test_heartbeats_keep_queued_and_running_jobs_fresh():
+    started, release = threading.Event(), threading.Event()
+    beats = []
+
+    def handler(job_id, payload):
+        started.set()
+        release.wait(timeout=5)
+
+    runner = JobRunner(handler, workers=1, heartbeat=beats.append, heartbeat_seconds=0.02)
+    runner.submit('running', None)
+    runner.submit('waiting', None)
+    assert started.wait(timeout=5)
+    time.sleep(0.1)
+    assert sorted(beats[-1]) == ['running', 'waiting']
+
+    release.set()
+    deadline = time.monotonic() + 5
+    while runner.active:
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+    count = len(beats)
+    time.sleep(0.1)
+    # Nothing left to vouch for
+    assert len(beats) == count
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+LLMClient: jittered exponential backoff on retryable errors only, the token bucket's rate, and
+the cap on in-flight calls. A fake clock stands in for time so nothing here actually sleeps.
+"""
+
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+import llm
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        # The stub's own zero latency is not a wait worth recording
+        if seconds:
+            self.sleeps.append(seconds)
+            self.now += seconds
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(llm, 'time', SimpleNamespace(monotonic=clock.monotonic, sleep=clock.sleep))
+    return clock
+
+@pytest.fixture
+def jitter(monkeypatch):
+    # Full jitter picks uniformly up to the cap; always take the cap so delays are exact
+    bounds = []
+
+    def uniform(low, high):
+        bounds.append((low, high))
+        return high
+
+    monkeypatch.setattr(llm.random, 'uniform', uniform)
+    return bounds
+
+class ScriptedProvider(llm.StubProvider):
+    # The stub, failing with the given errors (in order) before it answers
+    def __init__(self, *errors):
+        super().__init__(latency=0)
+        self.errors = list(errors)
+        self.calls = 0
+
+    def fail_randomly(self):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+
+PROMPT = "Generate 2 questions. STUDY MATERIAL: Glaciers carve valleys and deposit moraines."
+
+def client(provider, **options):
+    settings = {'rate_per_second': 0, 'max_in_flight': 1, 'max_retries': 4, 'retry_base_seconds': 1.0,
+                'retry_max_seconds': 5.0, 'acquire_timeout': 0}
+    return llm.LLMClient(provider, **{**settings, **options})
+
+def test_retryable_errors_back_off_exponentially_up_to_the_cap(clock, jitter):
+    provider = ScriptedProvider(*[llm.RetryableLLMError("429")] * 5)
+    with pytest.raises(llm.RetryableLLMError):
+        client(provider).generate(PROMPT)
+    # One first try and max_retries retries, with a backoff between each
+    assert provider.calls == 5
+    assert jitter == [(0, 1.0), (0, 2.0), (0, 4.0), (0, 5.0)]
+    assert clock.sleeps == [1.0, 2.0, 4.0, 5.0]
+
+def test_a_retry_that_succeeds_returns_the_answer(clock, jitter):
+    provider = ScriptedProvider(llm.RetryableLLMError("503"), llm.RetryableLLMError("timeout"))
+    llm_client = client(provider)
+    assert llm_client.generate(PROMPT) == provider.respond(PROMPT)
+    assert provider.calls == 3 and clock.sleeps == [1.0, 2.0]
+    # Every attempt gave its in-flight slot back, or this would be busy
+    assert llm_client.generate(PROMPT) == provider.respond(PROMPT)
+
+def test_other_errors_are_not_retried(clock, jitter):
+    provider = ScriptedProvider(ValueError("bad request"))
+    llm_client = client(provider)
+    with pytest.raises(ValueError):
+        llm_client.generate(PROMPT)
+    assert provider.calls == 1 and clock.sleeps == [] and jitter == []
+    assert llm_client.generate(PROMPT)
+
+def test_streams_retry_only_before_the_first_chunk(clock, jitter):
+    provider = ScriptedProvider(llm.RetryableLLMError("429"))
+    assert "".join(client(provider).stream(PROMPT)) == provider.respond(PROMPT)
+    assert provider.calls == 2 and clock.sleeps[0] == 1.0
+
+    class FailsMidStream(llm.StubProvider):
+        def stream(self, prompt):
+            yield "Partial question"
+            raise llm.RetryableLLMError("connection reset")
+
+    chunks = client(FailsMidStream(latency=0)).stream(PROMPT)
+    assert next(chunks) == "Partial question"
+    with pytest.raises(llm.RetryableLLMError):
+        next(chunks)
+
+def test_the_bucket_releases_calls_at_its_rate_after_the_burst(clock):
+    bucket = llm.TokenBucket(rate=2, capacity=3)
+    granted = []
+    for _ in range(6):
+        assert bucket.acquire(timeout=10)
+        granted.append(clock.now)
+    assert granted == [0.0, 0.0, 0.0, 0.5, 1.0, 1.5]
+
+    # Refills while idle, but never beyond its capacity
+    clock.now += 60
+    for _ in range(3):
+        assert bucket.acquire(timeout=0)
+    assert not bucket.acquire(timeout=0.4)
+    # Giving up does not wait out the timeout
+    assert clock.now == 61.5
+
+def test_an_empty_bucket_makes_the_client_busy(clock):
+    llm_client = client(llm.StubProvider(latency=0), rate_per_second=1, burst=1, acquire_timeout=0.5)
+    assert llm_client.generate(PROMPT)
+    with pytest.raises(llm.LLMBusyError):
+        llm_client.generate(PROMPT)
+    clock.now += 1
+    assert llm_client.generate(PROMPT)
+
+def test_in_flight_calls_are_capped():
+    release = threading.Event()
+    entered = threading.Semaphore(0)
+    lock = threading.Lock()
+    state = {'running': 0, 'peak': 0}
+
+    class Blocking(llm.StubProvider):
+        def generate(self, prompt):
+            with lock:
+                state['running'] += 1
+                state['peak'] = max(state['peak'], state['running'])
+            entered.release()
+            release.wait(timeout=5)
+            with lock:
+                state['running'] -= 1
+            return "answer"
+
+    llm_client = client(Blocking(latency=0), max_in_flight=2, acquire_timeout=0.05)
+    threads = [threading.Thread(target=llm_client.generate, args=(PROMPT,)) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    assert entered.acquire(timeout=5) and entered.acquire(timeout=5)
+
+    # Both slots are taken: a third call gives up after acquire_timeout instead of running
+    with pytest.raises(llm.LLMBusyError):
+        llm_client.generate(PROMPT)
+    release.set()
+    for thread in threads:
+        thread.join(timeout=5)
+    assert state['peak'] == 2
+    # Finished calls free their slots
+    assert llm_client.generate(PROMPT) == "answer"
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+/metrics: generation stages are timed and exported in the Prometheus text format. The cache
+stats endpoints share its access rules.
+"""
+
+import re
+from datetime import datetime, timedelta
+
+import pytest
+
+import app as quiz_app
+import metrics
+
+def sample(text, name, **labels):
+    # Value of the first sample of name whose labels include the given ones
+    for line in text.splitlines():
+        match = re.match(r'(\w+)(?:\{(.*)\})? (\S+)$', line)
+        if not match or match.group(1) != name:
+            continue
+        found = dict(re.findall(r'(\w+)="([^"]*)"', match.group(2) or ''))
+        if all(found.get(key) == value for key, value in labels.items()):
+            return float(match.group(3))
+    return None
+
+def test_generation_stages_are_exported(app):
+    client = app.test_client()
+    before = client.get('/metrics').get_data(as_text=True)
+    generated = sample(before, 'quizifai_generations_total', kind='text', outcome='ok') or 0
+
+    response = client.post('/generate-questions', data={'study_material': 'Glaciers carve valleys. ' * 50})
+    assert response.json['status'] == 'success'
+
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert response.mimetype == 'text/plain'
+    text = response.get_data(as_text=True)
+    assert sample(text, 'quizifai_generations_total', kind='text', outcome='ok') == generated + 1
+    for stage in ('prompt', 'llm', 'db_commit', 'total'):
+        assert sample(text, 'quizifai_stage_seconds_count', stage=stage) >= 1, stage
+    assert sample(text, 'quizifai_stage_characters_count', stage='total', kind='text') >= 1
+    assert sample(text, 'quizifai_http_request_seconds_count',
+                  endpoint='/generate-questions', method='POST', status='200') >= 1
+
+def test_metrics_token(app):
+    app.config['METRICS_TOKEN'] = 'scrape-secret'
+    client = app.test_client()
+    assert client.get('/metrics').status_code == 401
+    assert client.get('/metrics', headers={'Authorization': 'Bearer scrape-secret'}).status_code == 200
+
+@pytest.mark.parametrize('path', ['/api/quiz-cache/stats', '/api/extraction-cache/stats',
+                                  '/api/generation-cache/stats'])
+def test_cache_stats_follow_the_metrics_rules(app, path):
+    client = app.test_client()
+    assert client.get(path).status_code == 200
+    app.config['METRICS_TOKEN'] = 'scrape-secret'
+    assert client.get(path).status_code == 401
+    assert client.get(path, headers={'Authorization': 'Bearer scrape-secret'}).status_code == 200
+    app.config['METRICS_ENABLED'] = False
+    assert client.get(path, headers={'Authorization': 'Bearer scrape-secret'}).status_code == 404
+
+def test_extraction_cache_is_summed_only_after_a_tenth_of_the_limit(app, monkeypatch):
+    monkeypatch.setattr(quiz_app, 'extraction_cache_unchecked', {'bytes': 0})
+    app.config['EXTRACTION_CACHE_MAX_BYTES'] = 1000
+    with app.app_context():
+        start = datetime.utcnow()
+        for number in range(12):
+            quiz_app.db.session.add(quiz_app.ExtractionCache(
+                content_hash=f'{number:064d}', extractor_version='test', text='x', size_bytes=100,
+                last_used_at=start + timedelta(seconds=number)))
+        quiz_app.db.session.commit()
+
+        # 1200 bytes stored, but the 99 bytes added so far are not worth a check
+        quiz_app.evict_extraction_cache(99)
+        assert quiz_app.ExtractionCache.query.count() == 12
+        # Another byte reaches a tenth of the limit: the two oldest entries go
+        quiz_app.evict_extraction_cache(1)
+        remaining = quiz_app.ExtractionCache.query.order_by(quiz_app.ExtractionCache.last_used_at).all()
+        assert [entry.content_hash for entry in remaining] == [f'{number:064d}' for number in range(2, 12)]
+        assert quiz_app.extraction_cache_unchecked['bytes'] == 0
+
+def test_histogram_buckets_are_cumulative():
+    histogram = metrics.Histogram('test_seconds', "Test", ('stage',), buckets=(0.1, 1))
+    for amount in (0.05, 0.5, 0.5, 5):
+        histogram.observe(amount, stage='x')
+    text = "\n".join(histogram.render())
+    assert sample(text, 'test_seconds_bucket', le='0.1') == 1
+    assert sample(text, 'test_seconds_bucket', le='1.0') == 3
+    assert sample(text, 'test_seconds_bucket', le='+Inf') == 4
+    assert sample(text, 'test_seconds_count') == 4
+    assert sample(text, 'test_seconds_sum') == pytest.approx(6.05)
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+OCR preprocessing (thresholding, EXIF rotation, downscaling) and the bounded OCR pool's
+timeout path. Tesseract itself is replaced, so these run without the binary.
+"""
+
+import io
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+from PIL import Image
+
+import ocr
+
+def image_file(image, format='PNG', **params):
+    buffer = io.BytesIO()
+    image.save(buffer, format=format, **params)
+    buffer.seek(0)
+    return buffer
+
+def test_otsu_threshold_splits_two_grey_levels():
+    histogram = [0] * 256
+    histogram[20] = 100
+    histogram[200] = 300
+    # Every split between the two levels separates them equally well; the first one wins
+    assert ocr.otsu_threshold(histogram) == 20
+
+    histogram[60] = 100
+    # Background 20 and 60 (mean 40) against 200: between-class variance is highest at 60
+    assert ocr.otsu_threshold(histogram) == 60
+    assert ocr.otsu_threshold([0] * 128 + [10] + [0] * 127) == 127
+
+def test_preprocess_rotates_by_exif_and_binarizes():
+    image = Image.new('RGB', (40, 20), 'white')
+    image.paste((30, 30, 30), (0, 0, 20, 20))
+    exif = image.getexif()
+    exif[0x0112] = 6  # stored sideways: rotate 90 degrees clockwise to display
+    with Image.open(image_file(image, 'JPEG', exif=exif.tobytes(), quality=95)) as photo:
+        prepared = ocr.preprocess_image(photo)
+    assert prepared.size == (20, 40)
+    assert prepared.mode == '1'
+    # The dark half ends up on top, the light half below
+    assert prepared.getpixel((10, 5)) == 0 and prepared.getpixel((10, 35)) == 255
+
+def test_preprocess_downscales_by_dpi_and_size():
+    with Image.open(image_file(Image.new('L', (1200, 600), 255), dpi=(600, 600))) as scan:
+        assert ocr.preprocess_image(scan, target_dpi=300).size == (600, 300)
+    with Image.open(image_file(Image.new('L', (5000, 1000), 255))) as photo:
+        assert ocr.preprocess_image(photo, max_dimension=2500).size == (2500, 500)
+    with Image.open(image_file(Image.new('L', (800, 400), 255))) as small:
+        assert ocr.preprocess_image(small).size == (800, 400)
+
+def test_timed_out_job_never_reads_the_closed_upload(monkeypatch):
+    finished = threading.Event()
+    preprocess = ocr.preprocess_image
+
+    def slow_preprocess(image, **options):
+        time.sleep(0.3)
+        return preprocess(image, **options)
+
+    def recognise(image, timeout):
+        finished.set()
+        return "text"
+
+    monkeypatch.setattr(ocr, 'preprocess_image', slow_preprocess)
+    monkeypatch.setattr(ocr, 'pytesseract', SimpleNamespace(image_to_string=recognise))
+    upload = image_file(Image.new('L', (100, 50), 255))
+    with pytest.raises(Exception, match="timed out"):
+        ocr.image_to_text(upload, timeout=0.05, queue_timeout=0)
+    # The request closes its upload right away; the job still running works from its own copy
+    upload.close()
+    assert finished.wait(timeout=5)
+
+def test_pool_size_is_fixed_by_the_first_call():
+    pool = ocr.get_pool(2)
+    assert ocr.get_pool(2) is pool
+    with pytest.raises(ValueError):
+        ocr.get_pool(3)
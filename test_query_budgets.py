@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Query budgets for the main routes: each route must stay within a fixed number of SQL queries,
+and that number must not grow with the amount of data the user has (no N+1 queries).
+"""
+
+
+import pytest
+
+import app as quiz_app
+from werkzeug.security import generate_password_hash
+
+PASSWORD = 'password123'
+
+# (method, url, json body, max queries). {quiz_id} is one of the user's quizzes.
+# Flask-Login's user lookup is one of the queries on every logged-in route.
+QUERY_BUDGETS = [
+    ('GET', '/home', None, 1),
+    ('GET', '/quizzes', None, 2),
+    ('GET', '/api/quizzes', None, 2),
+    ('GET', '/api/quizzes/{quiz_id}', None, 2),
+    ('GET', '/take-quiz/{quiz_id}', None, 2),
+    ('GET', '/api/quiz/{quiz_id}', None, 3),
+    ('GET', '/api/quiz/{quiz_id}/item-stats', None, 4),
+    ('GET', '/analytics', None, 6),
+    ('GET', '/analytics?quiz_id={quiz_id}', None, 6),
+    ('POST', '/submit_quiz', {'quiz_id': '{quiz_id}', 'answers': [0, 1, 2]}, 5),
+    ('POST', '/save-questions', {'quiz_id': '{quiz_id}', 'questions': [
+        {'question': f'Question {i}?', 'answers': ['a', 'b', 'c', 'd'], 'correct_index': i % 4} for i in range(5)
+    ]}, 7),  # includes the near-duplicate lookup and the duplicate and search index inserts
+    ('GET', '/api/search?q=question', None, 3),
+]
+
+def seed_user(username, quiz_count, questions_per_quiz, attempts_per_quiz):
+    db = quiz_app.db
+    user = quiz_app.User(username=username, password=generate_password_hash(PASSWORD))
+    db.session.add(user)
+    db.session.flush()
+    for number in range(quiz_count):
+        quiz = quiz_app.Quiz(title=f'Quiz {number}', user_id=user.id)
+        db.session.add(quiz)
+        db.session.flush()
+        for index in range(questions_per_quiz):
+            db.session.add(quiz_app.Question(
+                quiz_id=quiz.id, question_text=f'Question {index}?',
+                option_a='a', option_b='b', option_c='c', option_d='d', correct_answer='A'
+            ))
+        for score in range(attempts_per_quiz):
+            attempt = quiz_app.QuizAttempt(user_id=user.id, quiz_id=quiz.id,
+                                           score=score % (questions_per_quiz + 1),
+                                           total_questions=questions_per_quiz)
+            db.session.add(attempt)
+            db.session.flush()
+            quiz_app.record_attempt_rollup(attempt)
+    db.session.commit()
+    return quiz.id
+
+def logged_in_client(app, username):
+    client = app.test_client()
+    response = client.post('/login', data={'username': username, 'password': PASSWORD})
+    assert response.status_code == 302
+    return client
+
+@pytest.fixture(scope='module')
+def app(make_app):
+    return make_app({'QUERY_COUNT_HEADER': True})
+
+@pytest.fixture(scope='module')
+def clients(app):
+    with app.app_context():
+        small_quiz = seed_user('smalluser', quiz_count=1, questions_per_quiz=3, attempts_per_quiz=1)
+        large_quiz = seed_user('largeuser', quiz_count=40, questions_per_quiz=15, attempts_per_quiz=5)
+        quiz_app.backfill_search_index()
+    return {
+        'small': (logged_in_client(app, 'smalluser'), small_quiz),
+        'large': (logged_in_client(app, 'largeuser'), large_quiz),
+    }
+
+def fill(value, quiz_id):
+    if isinstance(value, str):
+        return quiz_id if value == '{quiz_id}' else value.replace('{quiz_id}', str(quiz_id))
+    if isinstance(value, dict):
+        return {key: fill(item, quiz_id) for key, item in value.items()}
+    return value
+
+def query_count(client, quiz_id, method, url, body):
+    response = client.open(fill(url, quiz_id), method=method, json=fill(body, quiz_id))
+    assert response.status_code == 200, response.get_data(as_text=True)
+    return int(response.headers['X-Query-Count'])
+
+@pytest.mark.parametrize('method, url, body, budget', QUERY_BUDGETS, ids=[f'{m} {u}' for m, u, _, _ in QUERY_BUDGETS])
+def test_route_stays_within_query_budget(clients, method, url, body, budget):
+    counts = {size: query_count(client, quiz_id, method, url, body) for size, (client, quiz_id) in clients.items()}
+    assert counts['large'] <= budget, f"{method} {url} ran {counts['large']} queries, budget is {budget}"
+    assert counts['large'] == counts['small'], f"{method} {url} query count grows with data: {counts}"
+
+def test_hot_queries_have_indexes(app):
+    with app.app_context():
+        inspector = quiz_app.db.inspect(quiz_app.db.engine)
+        indexes = {index['name'] for table in ('quiz', 'question', 'quiz_attempt')
+                   for index in inspector.get_indexes(table)}
+    assert {'ix_quiz_user_id_id', 'ix_question_quiz_id_id', 'ix_quiz_attempt_user_quiz_completed',
+            'ix_quiz_attempt_user_completed'} <= indexes
+
+def test_unchanged_quiz_payload_is_revalidated_from_cache(clients):
+    client, quiz_id = clients['small']
+    first = client.get(f'/api/quiz/{quiz_id}')
+    etag = first.headers['ETag']
+
+    revalidated = client.get(f'/api/quiz/{quiz_id}', headers={'If-None-Match': etag})
+    assert revalidated.status_code == 304
+    # User lookup plus the quiz version check; the questions come from the cache
+    assert int(revalidated.headers['X-Query-Count']) == 2
+
+    client.post('/save-questions', json={'quiz_id': quiz_id, 'questions': [
+        {'question': 'Added later?', 'answers': ['a', 'b', 'c', 'd'], 'correct_index': 2}
+    ]})
+    changed = client.get(f'/api/quiz/{quiz_id}', headers={'If-None-Match': etag})
+    assert changed.status_code == 200
+    assert changed.headers['ETag'] != etag
+    assert changed.json['questions'][-1]['question_text'] == 'Added later?'
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Parsing generated questions ("Question? ; a, b, c*, d | ..."), as a whole and incrementally
+while the response streams in, and merging the questions of several chunks.
+"""
+
+from questions import QuestionStreamParser, merge_questions, parse_questions
+
+RESPONSE = ("What carves U-shaped valleys? ; Rivers, Glaciers*, Wind, Waves | "
+            "Which rock forms from cooled lava? ; Basalt*, Marble, Shale, Slate | "
+            "What is {x} in 2 * x = 6? ; 2, 3*, 4, 6")
+
+def stream(chunks):
+    parser = QuestionStreamParser()
+    arrivals = [parser.feed(chunk) for chunk in chunks]
+    arrivals.append(parser.close())
+    return parser, arrivals
+
+def test_questions_split_across_chunks_arrive_once_complete():
+    chunks = [RESPONSE[start:start + 7] for start in range(0, len(RESPONSE), 7)]
+    parser, arrivals = stream(chunks)
+    assert [question for arrived in arrivals for question in arrived] == parse_questions(RESPONSE)
+    # A question is handed out in the chunk holding the "|" that ends it, never earlier
+    first_end = RESPONSE.index('|')
+    assert [len(arrived) for arrived in arrivals[:first_end // 7]] == [0] * (first_end // 7)
+    assert len(arrivals[first_end // 7]) == 1
+    assert (parser.accepted, parser.rejected) == (3, 0)
+
+def test_one_character_at_a_time_matches_the_whole_response():
+    _, arrivals = stream(list(RESPONSE))
+    assert [question for arrived in arrivals for question in arrived] == parse_questions(RESPONSE)
+
+def test_asterisks_and_braces_inside_the_text_are_not_delimiters():
+    _, arrivals = stream([RESPONSE])
+    last = arrivals[-1][0]
+    assert last == {"question": "What is {x} in 2 * x = 6?", "answers": ['2', '3', '4', '6'], "correct_index": 1}
+    # Only a trailing asterisk marks the answer
+    assert parse_questions("Pick one ; a*b, c, d*, e") == [
+        {"question": "Pick one", "answers": ['a*b', 'c', 'd', 'e'], "correct_index": 2}]
+
+def test_malformed_questions_are_skipped_and_counted():
+    malformed = [
+        "Three answers? ; a, b*, c",
+        "Two marked? ; a*, b*, c, d",
+        "None marked? ; a, b, c, d",
+        "No separator a, b*, c, d",
+        "Too; many ; a, b*, c, d",
+        " ; a, b*, c, d",
+        "Blank answer? ; a, *, c, d",
+    ]
+    response = " | ".join(malformed[:4] + [RESPONSE] + malformed[4:]) + " |  | "
+    parser, arrivals = stream([response[:40], response[40:]])
+    assert [question for arrived in arrivals for question in arrived] == parse_questions(RESPONSE)
+    # Empty pieces between separators are neither
+    assert (parser.accepted, parser.rejected) == (3, len(malformed))
+
+def test_the_last_question_needs_no_trailing_separator():
+    parser = QuestionStreamParser()
+    assert parser.feed("Which gas do plants take in? ; Oxygen, Carbon dioxide*, Helium, Argon") == []
+    assert [question['question'] for question in parser.close()] == ["Which gas do plants take in?"]
+    assert parser.close() == []
+
+def test_a_stream_cut_off_mid_question_drops_the_partial_one():
+    cut = RESPONSE[:RESPONSE.index('Basalt') + 3]
+    parser, arrivals = stream([cut])
+    assert [question['question'] for arrived in arrivals for question in arrived] == ["What carves U-shaped valleys?"]
+    assert (parser.accepted, parser.rejected) == (1, 1)
+
+def question(topic):
+    return {"question": f"What causes {topic}?", "answers": [f"{topic} source", 'b', 'c', 'd'], "correct_index": 0}
+
+def topics(questions):
+    return [q['question'][len("What causes "):-1] for q in questions]
+
+def test_merge_takes_questions_round_robin_across_chunks():
+    chunks = [[question('glaciers'), question('erosion'), question('tides')],
+              [question('earthquakes')],
+              [question('volcanoes'), question('monsoons')]]
+    assert topics(merge_questions(chunks, 10)) == ['glaciers', 'earthquakes', 'volcanoes', 'erosion', 'monsoons', 'tides']
+    # The total cuts the last round short rather than dropping whole chunks
+    assert topics(merge_questions(chunks, 4)) == ['glaciers', 'earthquakes', 'volcanoes', 'erosion']
+    assert merge_questions([], 5) == [] and merge_questions([[], []], 5) == []
+
+def test_merge_keeps_the_first_copy_of_an_overlap_question():
+    # Overlapping chunks all asked about the boundary, with different distractors
+    repeat = {"question": "What causes glaciers?", "answers": ['glaciers source', 'x', 'y', 'z'], "correct_index": 0}
+    chunks = [[question('erosion'), question('glaciers')],
+              [repeat, question('tides')],
+              [question('glaciers'), question('monsoons')]]
+    merged = merge_questions(chunks, 4)
+    assert topics(merged) == ['erosion', 'glaciers', 'tides', 'monsoons']
+    # The copy taken is the one from the earliest round, then the earliest chunk
+    assert merged[1] is repeat
+    # Skipped duplicates do not count toward the total
+    assert len(merge_questions(chunks, 10)) == 4
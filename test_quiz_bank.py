@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+flask build-quiz-bank: one quiz per PDF in a directory, written straight to the database, with a
+manifest so a rerun only picks up what is new or failed.
+"""
+
+import json
+import os
+import shutil
+
+import pytest
+
+import app as quiz_app
+from werkzeug.security import generate_password_hash
+
+SOURCE = os.path.join(os.path.dirname(__file__), 'static', 'files', '2-Line-of-Reasoning-Examples.pdf')
+
+@pytest.fixture
+def app(make_app):
+    app = make_app()
+    with app.app_context():
+        quiz_app.db.session.add(quiz_app.User(username='teacher', password=generate_password_hash('password123')))
+        quiz_app.db.session.commit()
+    return app
+
+def build(app, directory, manifest):
+    return app.test_cli_runner().invoke(args=['build-quiz-bank', directory, '--user', 'teacher',
+                                              '--questions', '4', '--manifest', manifest, '--workers', '1'])
+
+def test_build_is_resumable(app, tmp_path):
+    directory = str(tmp_path)
+    manifest = os.path.join(directory, 'manifest', 'teacher.json')
+    shutil.copy(SOURCE, os.path.join(directory, 'Line_of_Reasoning.pdf'))
+    with open(os.path.join(directory, 'notes.txt'), 'w') as notes:
+        notes.write("not a PDF or an image")
+    with open(os.path.join(directory, 'broken.pdf'), 'wb') as broken:
+        broken.write(b'%PDF-1.4 truncated')
+
+    result = build(app, directory, manifest)
+    assert result.exit_code == 1, result.output
+    assert "2 files, 0 already built, 2 to build" in result.output
+    with open(manifest) as manifest_file:
+        entries = json.load(manifest_file)['files']
+    statuses = {os.path.basename(entry['path']): entry['status'] for entry in entries.values()}
+    assert statuses == {'Line_of_Reasoning.pdf': 'done', 'broken.pdf': 'failed'}
+
+    with app.app_context():
+        quiz = quiz_app.Quiz.query.one()
+        assert quiz.title == 'Line of Reasoning'
+        assert quiz_app.Question.query.filter_by(quiz_id=quiz.id).count() == 4
+        assert quiz_app.QuestionBand.query.count() > 0
+
+    # The finished file is skipped, even renamed; only the failed one is tried again
+    os.rename(os.path.join(directory, 'Line_of_Reasoning.pdf'), os.path.join(directory, 'renamed.pdf'))
+    result = build(app, directory, manifest)
+    assert "2 files, 1 already built, 1 to build" in result.output
+    with app.app_context():
+        assert quiz_app.Quiz.query.count() == 1
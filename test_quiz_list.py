@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+/api/quizzes keyset pagination: pages split on the cursor without gaps or repeats, the order
+holds when creation times tie, bad cursors fall back to the first page, and /api/quizzes/<id>
+refreshes a single entry.
+"""
+
+from datetime import datetime
+
+import pytest
+from werkzeug.security import generate_password_hash
+
+import app as quiz_app
+
+PASSWORD = 'password123'
+
+@pytest.fixture
+def app(make_app):
+    app = make_app({'QUIZZES_PAGE_SIZE': 2, 'QUIZZES_MAX_PAGE_SIZE': 3})
+    with app.app_context():
+        for username in ('owner', 'other'):
+            quiz_app.db.session.add(quiz_app.User(username=username, password=generate_password_hash(PASSWORD)))
+        quiz_app.db.session.commit()
+    return app
+
+def login(app, username):
+    client = app.test_client()
+    assert client.post('/login', data={'username': username, 'password': PASSWORD}).status_code == 302
+    return client
+
+def create_quizzes(client, *titles):
+    return [client.post('/create-quiz', data={'title': title}).json['quiz_id'] for title in titles]
+
+def page(client, query=''):
+    response = client.get(f'/api/quizzes{query}')
+    assert response.status_code == 200
+    return [quiz['id'] for quiz in response.json], response.headers.get('X-Next-After')
+
+def all_pages(client):
+    ids, after = page(client)
+    while after:
+        more, after = page(client, f'?after={after}')
+        ids += more
+    return ids
+
+def test_pages_split_on_the_cursor(app):
+    client = login(app, 'owner')
+    quiz_ids = create_quizzes(client, 'One', 'Two', 'Three', 'Four', 'Five')
+
+    assert page(client) == (quiz_ids[:2], str(quiz_ids[1]))
+    assert page(client, f'?after={quiz_ids[1]}') == (quiz_ids[2:4], str(quiz_ids[3]))
+    # The last page has no cursor
+    assert page(client, f'?after={quiz_ids[3]}') == (quiz_ids[4:], None)
+    # A page that ends exactly on the last quiz has none either
+    assert page(client, f'?after={quiz_ids[2]}') == (quiz_ids[3:], None)
+    assert page(client, f'?after={quiz_ids[4]}') == ([], None)
+
+    response = client.get('/api/quizzes?limit=3')
+    assert response.headers['Link'] == f'</api/quizzes?after={quiz_ids[2]}&limit=3>; rel="next"'
+
+def test_order_is_stable_when_timestamps_tie(app):
+    owner, other = login(app, 'owner'), login(app, 'other')
+    quiz_ids = []
+    for number in range(3):
+        quiz_ids += create_quizzes(owner, f'Mine {number}a', f'Mine {number}b')
+        create_quizzes(other, f'Theirs {number}')
+    with app.app_context():
+        quiz_app.Quiz.query.update({'created_at': datetime(2024, 1, 1)})
+        quiz_app.db.session.commit()
+
+    assert all_pages(owner) == quiz_ids
+
+    # A quiz created while paging lands after the cursor, never repeating or skipping one
+    first, after = page(owner)
+    quiz_ids += create_quizzes(owner, 'Late')
+    rest, after = page(owner, f'?after={after}')
+    while after:
+        more, after = page(owner, f'?after={after}')
+        rest += more
+    assert first + rest == quiz_ids
+
+@pytest.mark.parametrize('query', ['?after=abc', '?after=', '?after=0', '?after=-4', '?after=1.5'])
+def test_a_bad_cursor_starts_from_the_first_page(app, query):
+    client = login(app, 'owner')
+    quiz_ids = create_quizzes(client, 'One', 'Two', 'Three')
+    assert page(client, query) == (quiz_ids[:2], str(quiz_ids[1]))
+
+def test_limit_is_clamped(app):
+    client = login(app, 'owner')
+    quiz_ids = create_quizzes(client, 'One', 'Two', 'Three', 'Four')
+    assert page(client, '?limit=100')[0] == quiz_ids[:3]
+    assert page(client, '?limit=-1')[0] == quiz_ids[:1]
+    assert page(client, '?limit=x')[0] == quiz_ids[:2]
+
+def test_a_single_quiz_can_be_refreshed(app):
+    owner = login(app, 'owner')
+    [quiz_id] = create_quizzes(owner, 'Rocks')
+    assert owner.get(f'/api/quizzes/{quiz_id}').json == {'id': quiz_id, 'title': 'Rocks', 'question_count': 0}
+
+    owner.post('/save-question', json={'quiz_id': quiz_id, 'question': "What breaks rocks down?",
+                                       'answers': ['Erosion', 'Weathering', 'Deposition', 'Subduction'],
+                                       'correct_index': 1})
+    assert owner.get(f'/api/quizzes/{quiz_id}').json['question_count'] == 1
+
+    assert login(app, 'other').get(f'/api/quizzes/{quiz_id}').status_code == 404
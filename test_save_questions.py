@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+/save-question and /save-questions: a batch is validated as a whole, saved in one transaction, and
+only ever into a quiz the user owns.
+"""
+
+import pytest
+
+import app as quiz_app
+from werkzeug.security import generate_password_hash
+
+PASSWORD = 'password123'
+
+def question(text, answers=('Erosion', 'Weathering', 'Deposition', 'Subduction'), correct_index=1):
+    return {'question': text, 'answers': list(answers), 'correct_index': correct_index}
+
+@pytest.fixture
+def app(make_app):
+    app = make_app({'DUPLICATE_THRESHOLD': 0, 'SAVE_QUESTIONS_MAX_BATCH': 3})
+    with app.app_context():
+        for username in ('owner', 'intruder'):
+            quiz_app.db.session.add(quiz_app.User(username=username, password=generate_password_hash(PASSWORD)))
+        quiz_app.db.session.commit()
+    return app
+
+def login(app, username):
+    client = app.test_client()
+    assert client.post('/login', data={'username': username, 'password': PASSWORD}).status_code == 302
+    return client
+
+def counts(app):
+    with app.app_context():
+        return quiz_app.Quiz.query.count(), quiz_app.Question.query.count()
+
+def test_batch_is_saved_in_order_into_the_given_quiz(app):
+    client = login(app, 'owner')
+    quiz_id = client.post('/create-quiz', data={'title': 'Rocks'}).json['quiz_id']
+    response = client.post('/save-questions', json={'quiz_id': quiz_id, 'questions': [
+        question("What breaks rocks down?"), question("What moves sediment?", correct_index=0)]})
+    assert response.status_code == 200
+    body = response.json
+    assert body['quiz_id'] == quiz_id and body['message'] == "2 questions saved!"
+    with app.app_context():
+        saved = [quiz_app.db.session.get(quiz_app.Question, question_id) for question_id in body['question_ids']]
+        assert [(q.question_text, q.correct_answer) for q in saved] == [
+            ("What breaks rocks down?", 'B'), ("What moves sediment?", 'A')]
+
+@pytest.mark.parametrize('payload, message', [
+    ({}, "No questions to save"),
+    ({'questions': []}, "No questions to save"),
+    ({'questions': {'question': "Not a list?"}}, "No questions to save"),
+    ({'questions': [question(f"Question {n}?") for n in range(4)]}, "At most 3 questions can be saved at once"),
+    ({'questions': [question("Fine?"), question("Three answers?", answers=('a', 'b', 'c'))]},
+     "Invalid question at position 2"),
+    ({'questions': [question("Fine?"), question("Out of range?", correct_index=4)]}, "Invalid question at position 2"),
+    ({'questions': [question("Boolean index?", correct_index=True)]}, "Invalid question at position 1"),
+    ({'questions': [question("   ")]}, "Invalid question at position 1"),
+    ({'questions': [question("Blank answer?", answers=('a', ' ', 'c', 'd'))]}, "Invalid question at position 1"),
+    ({'questions': [question("Long answer?", answers=('a' * 201, 'b', 'c', 'd'))]}, "Invalid question at position 1"),
+    ({'questions': ["What is this?"]}, "Invalid question at position 1"),
+])
+def test_invalid_batches_save_nothing(app, payload, message):
+    client = login(app, 'owner')
+    response = client.post('/save-questions', json=payload)
+    assert response.status_code == 400
+    assert response.json == {'status': 'error', 'message': message}
+    # Not even the "My Questions" quiz a valid batch without quiz_id would have created
+    assert counts(app) == (0, 0)
+
+def test_another_users_quiz_is_not_found(app):
+    quiz_id = login(app, 'owner').post('/create-quiz', data={'title': 'Private'}).json['quiz_id']
+    intruder = login(app, 'intruder')
+    for path, payload in (('/save-questions', {'quiz_id': quiz_id, 'questions': [question("Sneaky?")]}),
+                          ('/save-question', {'quiz_id': quiz_id, **question("Sneaky?")}),
+                          ('/save-questions', {'quiz_id': quiz_id + 100, 'questions': [question("Missing?")]})):
+        response = intruder.post(path, json=payload)
+        assert response.status_code == 404
+        assert response.json == {'status': 'error', 'message': "Quiz not found"}
+    assert counts(app) == (1, 0)
+
+def test_unknown_job_is_not_found(app):
+    response = login(app, 'owner').post('/jobs/no-such-job/save')
+    assert response.status_code == 404
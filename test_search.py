@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+/api/search: ranked, paginated full-text search over a user's quizzes and questions, kept in
+step with saves and deletes.
+"""
+
+
+import pytest
+
+import app as quiz_app
+from werkzeug.security import generate_password_hash
+
+PASSWORD = 'password123'
+
+def question(text, answers=('Erosion', 'Weathering', 'Deposition', 'Subduction'), correct_index=1):
+    return {'question': text, 'answers': list(answers), 'correct_index': correct_index}
+
+@pytest.fixture
+def app(make_app):
+    app = make_app({'DUPLICATE_THRESHOLD': 0})
+    with app.app_context():
+        for username in ('searcher', 'someoneelse'):
+            quiz_app.db.session.add(quiz_app.User(username=username, password=generate_password_hash(PASSWORD)))
+        quiz_app.db.session.commit()
+        if quiz_app.search_backend() is None:
+            pytest.skip("this SQLite build has no FTS5")
+    return app
+
+def login(app, username):
+    client = app.test_client()
+    assert client.post('/login', data={'username': username, 'password': PASSWORD}).status_code == 302
+    return client
+
+def search(client, query, **params):
+    response = client.get('/api/search', query_string={'q': query, **params})
+    assert response.status_code == 200
+    return response.json
+
+def test_ranked_prefix_search_over_titles_questions_and_options(app):
+    client = login(app, 'searcher')
+    quiz_id = client.post('/create-quiz', data={'title': 'Glaciers and ice sheets'},
+                          headers={'Content-Type': 'application/x-www-form-urlencoded'}).json['quiz_id']
+    client.post('/save-questions', json={'quiz_id': quiz_id, 'questions': [
+        question("How do glaciers carve U-shaped valleys?"),
+        question("Which ocean is the deepest?", answers=('Pacific', 'Atlantic', 'Glacial lake', 'Arctic')),
+        question("What drives plate tectonics?"),
+    ]})
+
+    results = search(client, 'glac')['results']
+    assert [result['type'] for result in results] == ['quiz', 'question', 'question']
+    assert results[0]['title'] == 'Glaciers and ice sheets'
+    # Question text outranks a match in the options
+    assert results[1]['question_text'] == "How do glaciers carve U-shaped valleys?"
+    assert results[2]['options'][2] == 'Glacial lake'
+
+    assert [r['question_text'] for r in search(client, 'valleys carved')['results']] == \
+        ["How do glaciers carve U-shaped valleys?"]
+    assert search(client, '"); DROP TABLE quiz; --')['results'] == []
+    assert search(client, '')['results'] == []
+
+def test_results_are_paginated_and_private(app):
+    client = login(app, 'searcher')
+    client.post('/save-questions', json={'questions': [question(f"Sediment question {n}?") for n in range(25)]})
+
+    first = search(client, 'sediment', limit=10)
+    second = search(client, 'sediment', limit=10, page=3)
+    assert len(first['results']) == 10 and first['has_more']
+    assert len(second['results']) == 5 and not second['has_more']
+
+    assert search(login(app, 'someoneelse'), 'sediment')['results'] == []
+
+def test_deleting_a_quiz_removes_it_from_the_index(app):
+    client = login(app, 'searcher')
+    saved = client.post('/save-questions', json={'questions': [question("Where do fjords form?")]}).json
+    assert len(search(client, 'fjords')['results']) == 1
+
+    client.post(f"/delete-quiz/{saved['quiz_id']}")
+    assert search(client, 'fjords')['results'] == []
+    with app.app_context():
+        assert quiz_app.search_backend().is_empty(quiz_app.db.session)
+
+def test_reset_database_starts_with_an_empty_index(app):
+    client = login(app, 'searcher')
+    client.post('/save-questions', json={'questions': [question("Where do fjords form?")]})
+    with app.app_context():
+        quiz_app.drop_search_index()
+        quiz_app.db.drop_all()
+        quiz_app.init_db()
+        quiz_app.db.session.add(quiz_app.User(username='searcher', password=generate_password_hash(PASSWORD)))
+        quiz_app.db.session.commit()
+
+    # The new question reuses the old one's id; a stale document would still match "fjords"
+    client = login(app, 'searcher')
+    client.post('/save-questions', json={'questions': [question("What shapes a drumlin?")]})
+    assert search(client, 'fjords')['results'] == []
+    assert len(search(client, 'drumlin')['results']) == 1
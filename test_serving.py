@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+gevent serving mode: generations waiting on the LLM overlap on one worker, and PDFs are parsed
+in the extraction pool instead of on the worker's event loop.
+"""
+
+import os
+import subprocess
+import sys
+
+import pytest
+
+import serving
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+SOURCE = os.path.join(ROOT, 'static', 'files', '2-Line-of-Reasoning-Examples.pdf')
+
+# Runs in a fresh interpreter: patching this one would change every other test
+SCRIPT = """
+from gevent import monkey
+monkey.patch_all()
+
+import sys, time
+import gevent
+import app as quiz_app
+import serving
+
+def main():
+    assert serving.cooperative()
+    app = quiz_app.create_app({{
+        'SQLALCHEMY_DATABASE_URI': 'sqlite:///{database}',
+        'SINGLE_FLIGHT_STORE': '{leases}',
+        'LLM_PROVIDER': 'stub',
+        'LLM_STUB_LATENCY_SECONDS': 0.5,
+        'LLM_RATE_PER_SECOND': 0,
+        'LLM_MAX_IN_FLIGHT': 100,
+        'WTF_CSRF_ENABLED': False
+    }})
+    with app.app_context():
+        quiz_app.init_db()
+
+    def generate(number):
+        material = f"Request {{number}}: glaciers carve valleys while rivers deposit sediment. " * 10
+        return app.test_client().post('/generate-questions', data={{'study_material': material}}).json
+
+    def upload():
+        with open('{source}', 'rb') as pdf:
+            return app.test_client().post('/generate-questions', data={{'file': (pdf, 'notes.pdf')}}).json
+
+    started = time.perf_counter()
+    jobs = [gevent.spawn(generate, number) for number in range(20)] + [gevent.spawn(upload)]
+    gevent.joinall(jobs, raise_error=True)
+    assert all(job.value['status'] == 'success' for job in jobs), [job.value for job in jobs]
+    print(round(time.perf_counter() - started, 2))
+
+if __name__ == '__main__':
+    main()
+"""
+
+def test_generations_overlap_on_a_gevent_worker(tmp_path):
+    pytest.importorskip('gevent')
+    assert not serving.cooperative()
+    script = tmp_path / 'serve.py'
+    script.write_text(SCRIPT.format(database=tmp_path / 'serving.db', leases=tmp_path / 'leases.db', source=SOURCE))
+    result = subprocess.run([sys.executable, str(script)], cwd=ROOT, capture_output=True, text=True,
+                            env={**os.environ, 'PYTHONPATH': ROOT})
+    assert result.returncode == 0, result.stderr
+    # 21 stub calls of 0.5s each, one after another, would take over 10s
+    assert float(result.stdout.strip().splitlines()[-1]) < 5
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Single-flight coalescing: identical generation requests in flight together share one extraction
+and one LLM call, within a worker and across workers through the SQLite lease file.
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import app as quiz_app
+import llm
+from singleflight import FlightError, LeaseStore, SingleFlight
+
+MATERIAL = "Glaciers carve valleys while rivers deposit sediment across wide floodplains. " * 20
+
+@pytest.fixture
+def app(make_app):
+    return make_app({'LLM_STUB_LATENCY_SECONDS': 0.3})
+
+def count_llm_calls(monkeypatch):
+    calls = []
+    generate = llm.StubProvider.generate
+    def counted(provider, prompt):
+        calls.append(prompt)
+        return generate(provider, prompt)
+    monkeypatch.setattr(llm.StubProvider, 'generate', counted)
+    return calls
+
+def test_identical_concurrent_requests_share_one_llm_call(app, monkeypatch):
+    calls = count_llm_calls(monkeypatch)
+
+    def generate(_):
+        return app.test_client().post('/generate-questions', data={'study_material': MATERIAL}).json
+
+    with ThreadPoolExecutor(max_workers=6) as pool:
+        responses = list(pool.map(generate, range(6)))
+    assert len(calls) == 1
+    assert all(response['status'] == 'success' for response in responses)
+    assert len({response['ai_response'] for response in responses}) == 1
+
+    # Asking for a fresh set still goes to the model
+    app.test_client().post('/generate-questions', data={'study_material': MATERIAL, 'fresh': 'true'})
+    assert len(calls) == 2
+
+def two_workers(tmp_path, **options):
+    # Two SingleFlight instances sharing a lease file behave like two gunicorn workers
+    path = str(tmp_path / 'leases.db')
+    return (SingleFlight(LeaseStore(path, **options), reraise=(ValueError,)),
+            SingleFlight(LeaseStore(path, **options), reraise=(ValueError,)))
+
+def test_workers_share_results_and_errors_through_the_lease_file(tmp_path):
+    first, second = two_workers(tmp_path)
+    started = threading.Event()
+
+    def slow(value):
+        started.set()
+        time.sleep(0.2)
+        return value
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        leader = pool.submit(first.do, 'key', lambda: slow(['result']))
+        started.wait()
+        follower = pool.submit(second.do, 'key', lambda: slow(['other']))
+        assert leader.result() == (['result'], False)
+        assert follower.result() == (['result'], True)
+
+    def failing():
+        started.set()
+        time.sleep(0.2)
+        raise ValueError("bad input")
+
+    started.clear()
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        leader = pool.submit(first.do, 'error', failing)
+        started.wait()
+        follower = pool.submit(second.do, 'error', lambda: 'unused')
+        with pytest.raises(ValueError, match="bad input"):
+            leader.result()
+        with pytest.raises(ValueError, match="bad input"):
+            follower.result()
+
+    # Types not listed in reraise come back as FlightError
+    ticket = first.begin('typed')
+    follower = ThreadPoolExecutor(max_workers=1).submit(second.do, 'typed', lambda: 'unused')
+    time.sleep(0.1)
+    ticket.fail(KeyError('gone'))
+    with pytest.raises(FlightError):
+        follower.result()
+
+def test_a_dead_leader_is_taken_over(tmp_path):
+    first, second = two_workers(tmp_path, lease_seconds=0.3)
+    ticket = first.begin('key')
+    assert ticket.leading
+    # The leader never finishes (its worker died): the follower runs the work once the lease runs out
+    assert second.do('key', lambda: 'recovered') == ('recovered', False)
+
+    # A leader that gives up (a streamed client went away) hands over right away
+    ticket = first.begin('stream')
+    waiter = ThreadPoolExecutor(max_workers=1).submit(second.do, 'stream', lambda: 'taken over')
+    time.sleep(0.1)
+    ticket.abandon()
+    assert waiter.result(timeout=2) == ('taken over', False)
+
+def test_waiting_on_the_llm_does_not_commit_pending_changes(app):
+    with app.app_context():
+        quiz_app.db.session.add(quiz_app.User(username='half-built', password='x'))
+        ai_response, cached = quiz_app.generate_with_cache(MATERIAL)
+        assert ai_response and not cached
+        assert quiz_app.User.query.filter_by(username='half-built').count() == 0
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+Worker startup must not import the extraction, OCR, LLM client or NumPy stacks, or touch the
+database; those load on first use (see benchmarks/bench_import_time.py for timings).
+"""
+
+import os
+import subprocess
+import sys
+
+LAZY_MODULES = ['pypdf', 'PIL', 'pytesseract', 'numpy', 'google.generativeai', 'extraction', 'ocr', 'item_analysis']
+
+def test_create_app_leaves_heavy_modules_unloaded(tmp_path):
+    database = tmp_path / 'startup.db'
+    script = (
+        "import sys, app\n"
+        f"app.create_app({{'SQLALCHEMY_DATABASE_URI': 'sqlite:///{database}'}})\n"
+        f"print(','.join(name for name in {LAZY_MODULES!r} if name in sys.modules))\n"
+    )
+    result = subprocess.run([sys.executable, '-c', script], cwd=os.path.dirname(os.path.abspath(__file__)),
+                            capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == ''
+    # Schema creation is the init-db command's job, not the worker's
+    assert not database.exists()
+
+def test_each_app_builds_its_own_llm_client(tmp_path):
+    import app as quiz_app
+
+    first, second = (quiz_app.create_app({'SQLALCHEMY_DATABASE_URI': f'sqlite:///{tmp_path / name}.db',
+                                          'LLM_PROVIDER': 'stub', 'LLM_STUB_LATENCY_SECONDS': latency})
+                     for name, latency in (('first', 0.1), ('second', 0.2)))
+    with first.app_context():
+        # Cache keys only need the configured model name, not a client
+        quiz_app.generation_cache_key("Glaciers carve valleys.")
+        assert first.extensions['llm_client'] is None
+        assert quiz_app.llm_client().provider.latency == 0.1
+    with second.app_context():
+        assert quiz_app.llm_client().provider.latency == 0.2
+
+def test_init_db_command_creates_the_schema(tmp_path):
+    import app as quiz_app
+
+    database = tmp_path / 'deploy.db'
+    app = quiz_app.create_app({'SQLALCHEMY_DATABASE_URI': f'sqlite:///{database}'})
+    result = app.test_cli_runner().invoke(args=['init-db'])
+    assert result.exit_code == 0
+    assert result.output == "Database is up to date\n"
+    with app.app_context():
+        assert quiz_app.User.query.count() == 0
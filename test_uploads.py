@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Uploads: spooled in memory up to a threshold and spilled to a temp file above it, typed by their
+leading bytes before their extension, and empty ones turned away before extraction.
+"""
+
+import hashlib
+import io
+
+import pytest
+
+import app as quiz_app
+import uploads
+from uploads import detect_file_type, spool_upload
+
+PDF = b'%PDF-1.4\n' + b'0' * 200
+PNG = b'\x89PNG\r\n\x1a\n' + b'0' * 200
+JPEG = b'\xff\xd8\xff\xe0' + b'0' * 200
+
+class Unseekable(io.BytesIO):
+    # A stream that can only be read forwards, like a raw socket
+    def seekable(self):
+        return False
+
+@pytest.mark.parametrize('size, rolled', [(0, False), (100, False), (101, True), (5000, True)])
+def test_unseekable_uploads_spill_to_disk_only_above_the_threshold(size, rolled):
+    data = bytes(range(256)) * (size // 256) + bytes(range(size % 256))
+    spooled, content_hash, spooled_size, head = spool_upload(Unseekable(data), 100)
+    with spooled:
+        assert spooled._rolled is rolled
+        assert spooled_size == size
+        assert content_hash == hashlib.sha256(data).hexdigest()
+        assert head == data[:uploads.SNIFF_BYTES]
+        # Positioned at the start and holding every byte, wherever it lives
+        assert spooled.tell() == 0 and spooled.read() == data
+
+def test_seekable_uploads_are_read_in_place():
+    data = PDF * 20
+    stream = io.BytesIO(data)
+    stream.seek(50)
+    upload, content_hash, size, head = spool_upload(stream, 100)
+    # No copy: the same stream, hashed from the start and rewound
+    assert upload is stream and upload.tell() == 0
+    assert size == len(data) and content_hash == hashlib.sha256(data).hexdigest()
+    assert head == data[:uploads.SNIFF_BYTES]
+
+def test_requests_spool_files_at_the_configured_threshold(make_app):
+    app = make_app({'UPLOAD_SPOOL_MAX_BYTES': 100})
+    with app.test_request_context('/generate-questions', method='POST',
+                                  data={'file': (io.BytesIO(PDF), 'notes.pdf')}):
+        file = quiz_app.request.files['file']
+        stream = file.stream
+        assert stream._max_size == 100 and stream._rolled
+        spec = quiz_app.parse_generation_request()
+        assert spec['upload'] is stream and spec['kind'] == 'pdf'
+        # Closing the request's files leaves the upload open for a job thread
+        quiz_app.request.close()
+        assert spec['upload'].read() == PDF
+        quiz_app.close_upload(spec)
+        assert stream.closed
+
+def test_head_is_collected_across_copy_blocks(monkeypatch):
+    monkeypatch.setattr(uploads, 'COPY_BUFFER_BYTES', 100)
+    data = PDF * 20
+    spooled, content_hash, size, head = spool_upload(io.BytesIO(data), 1 << 20)
+    with spooled:
+        assert head == data[:uploads.SNIFF_BYTES] and len(head) == uploads.SNIFF_BYTES
+        assert size == len(data) and content_hash == hashlib.sha256(data).hexdigest()
+
+def test_a_failing_stream_is_not_swallowed():
+    class Broken(io.BytesIO):
+        def read(self, size=-1):
+            raise OSError("client went away")
+
+    for broken in (Broken(), type('BrokenUnseekable', (Broken, Unseekable), {})()):
+        with pytest.raises(OSError, match="client went away"):
+            spool_upload(broken, 100)
+
+@pytest.mark.parametrize('filename, head, file_type', [
+    ('notes.pdf', PDF, 'pdf'),
+    ('scan.png', PNG, 'png'),
+    ('photo.jpg', JPEG, 'jpeg'),
+    # The bytes win over a misleading extension
+    ('notes.pdf', PNG, 'png'),
+    ('photo.png', JPEG, 'jpeg'),
+    ('scan.jpg', PDF, 'pdf'),
+    ('download', PDF, 'pdf'),
+    # PDF readers allow junk before the header, within the first 1024 bytes
+    ('notes.pdf', b'\r\n' * 100 + PDF, 'pdf'),
+    ('notes.bin', b'x' * 1024 + PDF, None),
+    # Unrecognised bytes fall back to the last extension only
+    ('SCAN.JPEG', b'not an image', 'jpeg'),
+    ('notes.pdf.exe', b'MZ', None),
+    ('notes.txt', b'plain text', None),
+    (None, b'plain text', None),
+])
+def test_file_type_comes_from_the_bytes_first(filename, head, file_type):
+    assert detect_file_type(filename, head) == file_type
+
+def test_empty_upload():
+    spooled, content_hash, size, head = spool_upload(io.BytesIO(b''), 100)
+    with spooled:
+        assert (size, head, content_hash) == (0, b'', hashlib.sha256(b'').hexdigest())
+    # Nothing to sniff, so the extension alone would call it a PDF
+    assert detect_file_type('notes.pdf', head) == 'pdf'
+
+@pytest.mark.parametrize('content, filename, message', [
+    (b'', 'notes.pdf', "The uploaded file is empty"),
+    (b'plain text', 'notes.txt', "Unsupported file type"),
+])
+def test_rejected_uploads(app, content, filename, message):
+    response = app.test_client().post('/generate-questions', data={'file': (io.BytesIO(content), filename)},
+                                      content_type='multipart/form-data')
+    assert response.status_code == 400
+    assert response.json == {'status': 'error', 'message': message}
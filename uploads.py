@@ -0,0 +1,99 @@
+import hashlib
+import logging
+import os
+import shutil
+import tempfile
+
+# Uploads arrive already spooled by werkzeug (see app.SpooledUploadRequest): held in memory up to a
+# threshold, spilled to an anonymous temp file above it, and gone as soon as it is closed. They are
+# hashed and sniffed in place; nothing is copied again and nothing lands in static/.
+
+# Leading bytes of each accepted type
+SIGNATURES = [
+    (b'%PDF-', 'pdf'),
+    (b'\x89PNG\r\n\x1a\n', 'png'),
+    (b'\xff\xd8\xff', 'jpeg'),
+]
+EXTENSIONS = {'.pdf': 'pdf', '.png': 'png', '.jpg': 'jpeg', '.jpeg': 'jpeg'}
+SNIFF_BYTES = 1024
+COPY_BUFFER_BYTES = 64 * 1024
+
+def sniff_file_type(head):
+    for signature, file_type in SIGNATURES:
+        if head.startswith(signature):
+            return file_type
+    # PDF readers accept a header anywhere in the first 1024 bytes
+    if b'%PDF-' in head[:SNIFF_BYTES]:
+        return 'pdf'
+    return None
+
+def detect_file_type(filename, head):
+    # The content decides; the real (last) extension is only a fallback for unrecognised bytes
+    return sniff_file_type(head) or EXTENSIONS.get(os.path.splitext(filename or '')[1].lower())
+
+def seekable(stream):
+    try:
+        return stream.seekable()
+    except (AttributeError, ValueError):
+        return False
+
+def scan_upload(stream, sink=None):
+    # One pass over stream: (sha256 hex digest, size, first SNIFF_BYTES bytes), writing to sink if given
+    digest = hashlib.sha256()
+    head = b''
+    size = 0
+    while True:
+        block = stream.read(COPY_BUFFER_BYTES)
+        if not block:
+            break
+        if len(head) < SNIFF_BYTES:
+            head += block[:SNIFF_BYTES - len(head)]
+        digest.update(block)
+        if sink is not None:
+            sink.write(block)
+        size += len(block)
+    return digest.hexdigest(), size, head
+
+def spool_upload(stream, max_memory_bytes):
+    # Returns (file positioned at 0, sha256 hex digest, size, first SNIFF_BYTES bytes).
+    # A seekable stream is hashed where it is and rewound; only one that can't seek is copied
+    # into a SpooledTemporaryFile on the way.
+    if seekable(stream):
+        stream.seek(0)
+        content_hash, size, head = scan_upload(stream)
+        stream.seek(0)
+        return stream, content_hash, size, head
+    spooled = tempfile.SpooledTemporaryFile(max_size=max_memory_bytes)
+    try:
+        content_hash, size, head = scan_upload(stream, spooled)
+    except Exception:
+        spooled.close()
+        raise
+    spooled.seek(0)
+    return spooled, content_hash, size, head
+
+def store_upload(store_dir, content_hash, file_type, source):
+    # Opt-in retention: keep one copy per distinct content at <store>/<ab>/<hash>.<type>.
+    # Identical uploads from different users share a file instead of colliding on a name.
+    directory = os.path.join(store_dir, content_hash[:2])
+    path = os.path.join(directory, f"{content_hash}.{file_type}")
+    if os.path.exists(path):
+        return path
+    position = source.tell()
+    source.seek(0)
+    partial_path = None
+    try:
+        os.makedirs(directory, exist_ok=True)
+        with tempfile.NamedTemporaryFile(dir=directory, delete=False) as partial:
+            partial_path = partial.name
+            shutil.copyfileobj(source, partial, COPY_BUFFER_BYTES)
+        # Atomic, so concurrent identical uploads never see a half-written file
+        os.replace(partial_path, path)
+    except OSError as e:
+        logging.error(f"Could not store upload {content_hash}: {e}")
+        if partial_path and os.path.exists(partial_path):
+            os.remove(partial_path)
+        return None
+    finally:
+        source.seek(position)
+    return path